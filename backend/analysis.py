@@ -0,0 +1,204 @@
+"""Running one analysis: capture, diff against the previous run, AI report and storage, with progress published on the job's channel"""
+
+from typing import Dict, Any, Optional
+from datetime import datetime
+import uuid
+import time
+from urllib.parse import urlparse
+import logging
+
+from config import CAPTURE_PREVIEW_LOGS, CAPTURE_PREVIEW_REQUESTS, CRAWL_MAX_DEPTH, CRAWL_MAX_PAGES
+from database import db
+from models import AnalysisRequest, AnalysisResult
+from backplane import broadcast_hub
+from llm import analyze_with_ai
+from diffing import analyze_changes_with_ai, diff_analyses, full_report, load_previous_analysis
+from capture import capture_website_data
+from storage import capture_store
+
+logger = logging.getLogger(__name__)
+
+async def run_analysis(request: AnalysisRequest, job_id: Optional[str] = None,
+                       metrics: Optional[Dict[str, float]] = None) -> AnalysisResult:
+    """Capture a website, run the AI analysis and store the result.
+
+    With a ``job_id`` the capture is published on the job's channel as soon as it is
+    done and the AI report streams there token by token. Stage timings (ms since the
+    start) are recorded in ``metrics``.
+    """
+    # Generate unique analysis ID
+    analysis_id = str(uuid.uuid4())
+    start = time.monotonic()
+    if metrics is None:
+        metrics = {}
+    
+    # Perform browser automation and data collection
+    crawl = None
+    if request.mode == "crawl":
+        crawl = {
+            "max_pages": max(1, min(request.max_pages or 10, CRAWL_MAX_PAGES)),
+            "max_depth": max(0, min(request.max_crawl_depth or 0, CRAWL_MAX_DEPTH))
+        }
+    browser_data = await capture_website_data(
+        str(request.url),
+        request.depth,
+        crawl=crawl,
+        profile=request.profile or "full"
+    )
+    metrics["capture_ms"] = round((time.monotonic() - start) * 1000, 1)
+    
+    on_delta = None
+    if job_id:
+        await publish_capture(job_id, browser_data)
+        channel = job_channel(job_id)
+        
+        def on_delta(delta: str):
+            if "first_token_ms" not in metrics:
+                metrics["first_token_ms"] = round((time.monotonic() - start) * 1000, 1)
+            broadcast_hub.publish_delta(channel, {"type": "analysis_token", "job_id": job_id}, delta)
+    
+    # Diff against the previous analysis of the same URL
+    diff = None
+    previous = None
+    try:
+        previous = await load_previous_analysis(str(request.url))
+    except Exception as e:
+        logger.warning(f"Failed to load previous analysis of {request.url}: {e}")
+    if previous:
+        diff = diff_analyses(previous, browser_data)
+    
+    # Perform AI analysis, only on the changes when the previous report still applies
+    prompt_stats: Dict[str, Any] = {}
+    incremental = None
+    ai_report = None
+    previous_report = full_report(previous) if previous and request.incremental else None
+    if previous_report and not diff["changed"]:
+        ai_analysis = ai_report = previous_report
+        incremental = {"base_id": previous["id"], "llm": "skipped"}
+        if on_delta:
+            on_delta(ai_analysis)
+    elif previous_report:
+        changes = await analyze_changes_with_ai(
+            request.openrouter_api_key,
+            diff,
+            previous_report,
+            str(request.url),
+            use_cache=not request.bypass_cache,
+            on_delta=on_delta,
+            prompt_stats=prompt_stats
+        )
+        ai_analysis = f"{changes}\n\n---\n\n{previous_report}"
+        if on_delta:
+            on_delta(ai_analysis[len(changes):])
+        if changes.startswith("AI change analysis failed"):
+            # Without ai_report the next run of this URL falls back to a full analysis
+            incremental = {"base_id": previous["id"], "llm": "failed"}
+        else:
+            ai_report = previous_report
+            incremental = {"base_id": previous["id"], "llm": "changes"}
+    else:
+        ai_analysis = await analyze_with_ai(
+            request.openrouter_api_key,
+            browser_data,
+            str(request.url),
+            use_cache=not request.bypass_cache,
+            on_delta=on_delta,
+            prompt_stats=prompt_stats
+        )
+    metrics["ai_ms"] = round((time.monotonic() - start) * 1000 - metrics["capture_ms"], 1)
+    if prompt_stats:
+        # Kept with the analysis so prompt size can be compared against LLM latency
+        prompt_stats["ai_ms"] = metrics["ai_ms"]
+        browser_data["page_info"]["prompt_budget"] = prompt_stats
+        metrics["prompt_tokens"] = prompt_stats["prompt_tokens"]
+    
+    # Write the full capture out of line; the document keeps a preview and summary
+    network_requests = browser_data["network_requests"]
+    console_logs = browser_data["console_logs"]
+    try:
+        capture = await capture_store.save(analysis_id, str(request.url), browser_data)
+        network_requests = [
+            {key: value for key, value in req.items() if key not in ("headers", "response_headers")}
+            for req in network_requests[:CAPTURE_PREVIEW_REQUESTS]
+        ]
+        console_logs = console_logs[:CAPTURE_PREVIEW_LOGS]
+    except Exception as e:
+        logger.error(f"Failed to store capture, keeping it inline: {e}")
+        capture = None
+    
+    # Process and structure the results
+    result = AnalysisResult(
+        id=analysis_id,
+        url=str(request.url),
+        timestamp=datetime.utcnow(),
+        network_requests=network_requests,
+        console_logs=console_logs,
+        capture=capture,
+        host=urlparse(str(request.url)).hostname,
+        page_info=browser_data["page_info"],
+        tech_stack=browser_data["tech_stack"],
+        api_endpoints=browser_data["api_endpoints"],
+        api_map=browser_data.get("api_map", []),
+        ai_analysis=ai_analysis,
+        security_observations=browser_data["security_observations"],
+        diff=diff,
+        incremental=incremental,
+        ai_report=ai_report
+    )
+    
+    # Store in database
+    await db.analyses.insert_one(result.dict())
+    metrics["total_ms"] = round((time.monotonic() - start) * 1000, 1)
+    
+    return result
+
+def job_channel(job_id: str) -> str:
+    return f"job:{job_id}"
+
+def capture_preview(browser_data: Dict[str, Any]) -> Dict[str, Any]:
+    """The part of a capture worth showing while the AI report is still being written"""
+    return {
+        "page_info": browser_data.get("page_info", {}),
+        "tech_stack": browser_data.get("tech_stack", []),
+        "api_endpoints": browser_data.get("api_endpoints", []),
+        "api_map": browser_data.get("api_map", []),
+        "security_observations": browser_data.get("security_observations", []),
+        "request_count": len(browser_data.get("network_requests", [])),
+        "console_log_count": len(browser_data.get("console_logs", [])),
+        "network_requests": [
+            {key: value for key, value in req.items() if key not in ("headers", "response_headers")}
+            for req in browser_data.get("network_requests", [])[:CAPTURE_PREVIEW_REQUESTS]
+        ],
+        "console_logs": browser_data.get("console_logs", [])[:CAPTURE_PREVIEW_LOGS]
+    }
+
+async def publish_capture(job_id: str, browser_data: Dict[str, Any]):
+    """Send the capture to the job's stream and keep it on the job for late subscribers"""
+    preview = capture_preview(browser_data)
+    broadcast_hub.publish(
+        {"type": "analysis_capture", "job_id": job_id, "capture": preview},
+        session_id=job_channel(job_id),
+        subscribers_only=True
+    )
+    try:
+        await db.analysis_jobs.update_one({"id": job_id}, {"$set": {"stage": "ai", "capture_preview": preview}})
+    except Exception as e:
+        logger.warning(f"Failed to store capture preview for job {job_id}: {e}")
+
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of an analysis job document"""
+    return {
+        "job_id": job["id"],
+        "url": job["url"],
+        "depth": job["depth"],
+        "priority": job.get("priority", 0),
+        "mode": job.get("mode", "single"),
+        "status": job["status"],
+        "stage": job.get("stage"),
+        "metrics": job.get("metrics"),
+        "analysis_id": job.get("analysis_id"),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat() if job.get("created_at") else None,
+        "started_at": job["started_at"].isoformat() if job.get("started_at") else None,
+        "finished_at": job["finished_at"].isoformat() if job.get("finished_at") else None
+    }
@@ -0,0 +1,195 @@
+"""API endpoint inference: path-template clustering and sampled response schemas"""
+
+from typing import List, Dict, Any, Optional
+import itertools
+from urllib.parse import urlparse
+
+from config import (
+    ENDPOINT_SCHEMA_MAX_DEPTH, ENDPOINT_SCHEMA_MAX_ITEMS, ENDPOINT_SCHEMA_MAX_PROPERTIES,
+    ENDPOINT_VARIABLE_THRESHOLD
+)
+from endpoints import ID_SEGMENT_PATTERN, is_api_request, strip_query
+
+def mongo_safe_key(key: str) -> str:
+    # Response bodies can have keys Mongo won't store; use the usual full-width stand-ins
+    return key.replace(".", "．").replace("$", "＄", 1) if "." in key or key.startswith("$") else key
+
+def infer_schema(value: Any, depth: int = 0) -> Dict[str, Any]:
+    """A compact JSON-schema-like description of one JSON value"""
+    if value is None:
+        return {"type": "null"}
+    if isinstance(value, bool):
+        return {"type": "boolean"}
+    if isinstance(value, int):
+        return {"type": "integer"}
+    if isinstance(value, float):
+        return {"type": "number"}
+    if isinstance(value, str):
+        return {"type": "string"}
+    if depth >= ENDPOINT_SCHEMA_MAX_DEPTH:
+        return {"type": "array" if isinstance(value, list) else "object"}
+    if isinstance(value, list):
+        items = None
+        for item in value[:ENDPOINT_SCHEMA_MAX_ITEMS]:
+            items = merge_schemas(items, infer_schema(item, depth + 1))
+        return {"type": "array", "items": items} if items else {"type": "array"}
+    if isinstance(value, dict):
+        if value and all(ID_SEGMENT_PATTERN.fullmatch(str(key)) for key in value):
+            # Maps keyed by id describe one record shape, not a property per id
+            values = None
+            for item in itertools.islice(value.values(), ENDPOINT_SCHEMA_MAX_ITEMS):
+                values = merge_schemas(values, infer_schema(item, depth + 1))
+            return {"type": "object", "additionalProperties": values}
+        properties = {
+            mongo_safe_key(str(key)): infer_schema(item, depth + 1)
+            for key, item in itertools.islice(value.items(), ENDPOINT_SCHEMA_MAX_PROPERTIES)
+        }
+        return {"type": "object", "properties": properties, "required": sorted(properties)}
+    return {"type": "string"}
+
+def merge_schemas(left: Optional[Dict[str, Any]], right: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Combine two schemas so the result describes values of either"""
+    if left is None or right is None:
+        return left or right
+    left_types = left["type"] if isinstance(left["type"], list) else [left["type"]]
+    right_types = right["type"] if isinstance(right["type"], list) else [right["type"]]
+    types = sorted(set(left_types) | set(right_types))
+    merged: Dict[str, Any] = {"type": types[0] if len(types) == 1 else types}
+    
+    if "items" in left or "items" in right:
+        merged["items"] = merge_schemas(left.get("items"), right.get("items"))
+    if "additionalProperties" in left or "additionalProperties" in right:
+        merged["additionalProperties"] = merge_schemas(left.get("additionalProperties"), right.get("additionalProperties"))
+    if "properties" in left or "properties" in right:
+        left_properties, right_properties = left.get("properties", {}), right.get("properties", {})
+        properties = dict(left_properties)
+        for key, schema in right_properties.items():
+            if len(properties) >= ENDPOINT_SCHEMA_MAX_PROPERTIES and key not in properties:
+                break
+            properties[key] = merge_schemas(properties.get(key), schema)
+        merged["properties"] = properties
+        # Required only if every sampled object had it
+        if "properties" in left and "properties" in right:
+            merged["required"] = sorted(set(left.get("required", [])) & set(right.get("required", [])))
+        else:
+            merged["required"] = left.get("required", right.get("required", []))
+    return merged
+
+class ApiMap:
+    """Clusters API requests into endpoint templates with a trie over path segments.
+
+    Id-like segments (numbers, UUIDs, long hex) go straight to a ``:id`` child. When a
+    node collects more than ``variable_threshold`` distinct literal children they are
+    folded into a single ``:param`` child, so slugs and other free-form values don't
+    create an endpoint each. Each endpoint keeps counts, statuses, query parameter
+    names and a schema merged from sampled JSON bodies, so the map grows with the
+    number of distinct endpoints rather than with the number of requests.
+    """
+    
+    def __init__(self, variable_threshold: int):
+        self.variable_threshold = variable_threshold
+        self.hosts: Dict[str, Dict[str, Any]] = {}
+    
+    @staticmethod
+    def _node() -> Dict[str, Any]:
+        return {"children": {}, "endpoints": {}, "collapsed": False}
+    
+    def add(self, record: Dict[str, Any]):
+        parsed = urlparse(record.get("url", ""))
+        node = self.hosts.setdefault(parsed.netloc, self._node())
+        for segment in parsed.path.split("/")[1:]:
+            if ID_SEGMENT_PATTERN.fullmatch(segment):
+                segment = ":id"
+            elif node["collapsed"] and segment not in node["children"]:
+                segment = ":param"
+            child = node["children"].get(segment)
+            if child is None:
+                child = node["children"][segment] = self._node()
+                self._maybe_collapse(node)
+                # Collapsing may have folded the new child away
+                child = node["children"].get(segment) or node["children"][":param"]
+            node = child
+        
+        method = (record.get("method") or "GET").upper()
+        endpoint = node["endpoints"].get(method)
+        if endpoint is None:
+            endpoint = node["endpoints"][method] = {
+                "count": 0, "status": {}, "content_type": "", "query": set(), "schema": None,
+                "samples": 0, "example": strip_query(record.get("url", ""))
+            }
+        endpoint["count"] += 1
+        status = str(record.get("status", 0))
+        endpoint["status"][status] = endpoint["status"].get(status, 0) + 1
+        endpoint["content_type"] = endpoint["content_type"] or (record.get("response_type") or "").split(";", 1)[0].strip()
+        if parsed.query:
+            endpoint["query"].update(pair.partition("=")[0] for pair in parsed.query.split("&") if pair)
+        if record.get("response_schema"):
+            endpoint["schema"] = merge_schemas(endpoint["schema"], record["response_schema"])
+            endpoint["samples"] += 1
+    
+    def _maybe_collapse(self, node: Dict[str, Any]):
+        literals = [segment for segment in node["children"] if not segment.startswith(":")]
+        if len(literals) <= self.variable_threshold:
+            return
+        target = node["children"].setdefault(":param", self._node())
+        for segment in literals:
+            self._merge(target, node["children"].pop(segment))
+        node["collapsed"] = True
+    
+    def _merge(self, target: Dict[str, Any], source: Dict[str, Any]):
+        for segment, child in source["children"].items():
+            if segment in target["children"]:
+                self._merge(target["children"][segment], child)
+            else:
+                target["children"][segment] = child
+        if source["collapsed"] or target["collapsed"]:
+            target["collapsed"] = True
+            # Anything literal left under a collapsed node belongs in its :param child
+            for segment in [segment for segment in target["children"] if not segment.startswith(":")]:
+                self._merge(target["children"].setdefault(":param", self._node()), target["children"].pop(segment))
+        else:
+            self._maybe_collapse(target)
+        for method, endpoint in source["endpoints"].items():
+            existing = target["endpoints"].get(method)
+            if existing is None:
+                target["endpoints"][method] = endpoint
+                continue
+            existing["count"] += endpoint["count"]
+            for status, count in endpoint["status"].items():
+                existing["status"][status] = existing["status"].get(status, 0) + count
+            existing["content_type"] = existing["content_type"] or endpoint["content_type"]
+            existing["query"] |= endpoint["query"]
+            existing["schema"] = merge_schemas(existing["schema"], endpoint["schema"])
+            existing["samples"] += endpoint["samples"]
+    
+    def endpoints(self) -> List[Dict[str, Any]]:
+        """The API map, one entry per method and endpoint template"""
+        result = []
+        stack = [(host, node) for host, node in self.hosts.items()]
+        while stack:
+            template, node = stack.pop()
+            for method, endpoint in node["endpoints"].items():
+                entry = {
+                    "method": method,
+                    "template": template or "/",
+                    "count": endpoint["count"],
+                    "status": endpoint["status"],
+                    "content_type": endpoint["content_type"],
+                    "query": sorted(endpoint["query"]),
+                    "example": endpoint["example"]
+                }
+                if endpoint["schema"]:
+                    entry["schema"] = endpoint["schema"]
+                    entry["samples"] = endpoint["samples"]
+                result.append(entry)
+            stack.extend((f"{template}/{segment}", child) for segment, child in node["children"].items())
+        return sorted(result, key=lambda entry: (entry["template"], entry["method"]))
+
+def infer_api_map(network_requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    api_map = ApiMap(ENDPOINT_VARIABLE_THRESHOLD)
+    for record in network_requests:
+        if record.get("blocked") or not is_api_request(record.get("url", ""), record.get("resource_type", ""),
+                                                       record.get("response_type") or ""):
+            continue
+        api_map.add(record)
+    return api_map.endpoints()
@@ -0,0 +1,444 @@
+"""Fan-out of live-monitoring messages to websocket clients, shared across workers by a backplane"""
+
+from fastapi import WebSocket
+from typing import List, Dict, Any, Optional
+from abc import ABC, abstractmethod
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from datetime import datetime
+import uuid
+import asyncio
+import json
+import itertools
+from collections import OrderedDict
+import logging
+
+from config import (
+    LIVE_BACKPLANE, LIVE_BACKPLANE_COLLECTION, LIVE_BACKPLANE_SIZE_MB, WS_BROADCAST_INTERVAL,
+    WS_SEND_QUEUE_SIZE, WS_SEND_TIMEOUT
+)
+from database import db
+
+logger = logging.getLogger(__name__)
+
+class BroadcastClient:
+    """One websocket connection, its subscriptions and its bounded send queue"""
+
+    __slots__ = ("websocket", "subscriptions", "queue", "dropped", "ready", "task")
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.subscriptions: Optional[set] = None  # None receives every session
+        # Keyed by coalesce key, or by a unique sequence number for messages that can't coalesce
+        self.queue: "OrderedDict[Any, str]" = OrderedDict()
+        self.dropped = 0
+        self.ready = asyncio.Event()
+        self.task = None
+
+class BroadcastHub:
+    """Fan-out of live-monitoring messages to websocket clients.
+
+    Live events are staged per session and, every ``interval`` seconds, merged into one
+    ``live_events`` message that is serialized once and handed to the backplane with any
+    other staged messages. Every worker receives the batch from the backplane and appends
+    the payloads to the queue of each interested local client, so ingest never waits on a
+    socket and clients see events ingested by any worker. Messages published with
+    ``subscribers_only`` (e.g. analysis job streams on ``job:<id>`` channels) skip clients
+    that haven't subscribed to the channel, and can also be consumed in-process through
+    ``listen()``. Every client has its own writer
+    task; when its queue is full the oldest message that can't coalesce is dropped (the
+    client is told how many it missed), and a client whose sends stall for longer than
+    ``send_timeout`` is disconnected.
+    """
+
+    # Writers woken per event loop iteration during a broadcast tick
+    FANOUT_SLICE = 50
+
+    def __init__(self, backplane: "LiveBackplane", queue_size: int, send_timeout: float, interval: float):
+        self.backplane = backplane
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        self.interval = interval
+        self._clients: set = set()
+        self._firehose: set = set()
+        self._by_session: Dict[str, set] = {}
+        self._staged: Dict[str, List[Dict[str, Any]]] = {}
+        # (channel, coalesce key, payload, subscribers only) envelopes waiting for the next
+        # tick, or open text-delta dicts that are still being appended to
+        self._staged_messages: List[Any] = []
+        self._listeners: Dict[str, set] = {}
+        self._staged_event = asyncio.Event()
+        self._seq = itertools.count()
+        self._task = None
+        self._stats = {
+            "published": 0,
+            "enqueued": 0,
+            "coalesced": 0,
+            "dropped": 0,
+            "slow_disconnects": 0
+        }
+
+    async def start(self):
+        await self.backplane.start(self.deliver)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._staged_event.wait()
+            # Let events from concurrent requests pile up into one message per session
+            await asyncio.sleep(self.interval)
+            self._staged_event.clear()
+            staged, self._staged = self._staged, {}
+            staged_messages, self._staged_messages = self._staged_messages, []
+            envelopes = [
+                [entry["channel"], None, json.dumps({**entry["fields"], "delta": "".join(entry["parts"])}), True]
+                if isinstance(entry, dict) else entry
+                for entry in staged_messages
+            ]
+            for session_id, events in staged.items():
+                if len(events) == 1:
+                    message = {"type": "live_event", "sessionId": session_id, "event": events[0]}
+                else:
+                    message = {"type": "live_events", "sessionId": session_id, "events": events}
+                envelopes.append([session_id, None, json.dumps(message, default=str)])
+            self._stats["published"] += len(envelopes)
+            try:
+                await self.backplane.publish(envelopes)
+            except Exception as e:
+                logger.error(f"Failed to publish {len(envelopes)} live messages: {e}")
+
+    async def deliver(self, envelopes: List[list]):
+        """Queue backplane messages for the interested local clients.
+
+        Writers are woken in slices so request handlers can run in between.
+        """
+        woken = 0
+        for session_id, coalesce_key, payload, *flags in envelopes:
+            subscribers_only = bool(flags and flags[0])
+            if session_id is None:
+                clients = list(self._clients)
+            elif subscribers_only:
+                clients = list(self._by_session.get(session_id, ()))
+            else:
+                clients = list(self._firehose | self._by_session.get(session_id, set()))
+            for queue in self._listeners.get(session_id, ()):
+                if queue.full():
+                    # Slow in-process consumers lose the oldest message, like websocket clients
+                    queue.get_nowait()
+                queue.put_nowait(payload)
+            for client in clients:
+                if client in self._clients:
+                    self._enqueue(client, payload, coalesce_key)
+                    woken += 1
+                    if woken % self.FANOUT_SLICE == 0:
+                        await asyncio.sleep(0)
+
+    def connect(self, websocket: WebSocket) -> BroadcastClient:
+        client = BroadcastClient(websocket)
+        self._clients.add(client)
+        self._firehose.add(client)
+        client.task = asyncio.create_task(self._writer(client))
+        return client
+
+    def disconnect(self, client: BroadcastClient):
+        if client not in self._clients:
+            return
+        self._clients.discard(client)
+        self._set_subscriptions(client, set())
+        self._firehose.discard(client)
+        if client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    def handle_message(self, client: BroadcastClient, data: str):
+        """Apply a subscription request sent by the client"""
+        try:
+            message = json.loads(data)
+            action = message.get("action")
+            session_ids = {str(s) for s in message.get("sessionIds", [])}
+        except (ValueError, AttributeError, TypeError):
+            self._send_to(client, {"type": "error", "detail": "Invalid message"})
+            return
+
+        if action == "subscribe":
+            self._set_subscriptions(client, (client.subscriptions or set()) | session_ids)
+        elif action == "unsubscribe":
+            self._set_subscriptions(client, (client.subscriptions or set()) - session_ids)
+        elif action == "subscribe_all":
+            self._set_subscriptions(client, None)
+        else:
+            # Anything else (e.g. keep-alive pings) is ignored
+            return
+        self._send_to(client, {
+            "type": "subscriptions",
+            "sessionIds": None if client.subscriptions is None else sorted(client.subscriptions)
+        })
+
+    def _set_subscriptions(self, client: BroadcastClient, session_ids: Optional[set]):
+        for session_id in client.subscriptions or ():
+            subscribers = self._by_session.get(session_id)
+            if subscribers is not None:
+                subscribers.discard(client)
+                if not subscribers:
+                    del self._by_session[session_id]
+        client.subscriptions = session_ids
+        if session_ids is None:
+            self._firehose.add(client)
+            return
+        self._firehose.discard(client)
+        for session_id in session_ids:
+            self._by_session.setdefault(session_id, set()).add(client)
+
+    def _has_listeners(self, session_id: Optional[str], subscribers_only: bool = False) -> bool:
+        if self.backplane.shared:
+            # Clients may be attached to another worker
+            return True
+        if session_id is None:
+            return bool(self._clients)
+        if session_id in self._by_session or session_id in self._listeners:
+            return True
+        return not subscribers_only and bool(self._firehose)
+
+    def listen(self, channel: str) -> asyncio.Queue:
+        """Receive the payloads published to ``channel`` in-process (e.g. for SSE)"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._listeners.setdefault(channel, set()).add(queue)
+        return queue
+
+    def unlisten(self, channel: str, queue: asyncio.Queue):
+        listeners = self._listeners.get(channel)
+        if listeners is not None:
+            listeners.discard(queue)
+            if not listeners:
+                del self._listeners[channel]
+
+    def publish_delta(self, channel: str, fields: Dict[str, Any], delta: str):
+        """Stage a chunk of streamed text; consecutive chunks merge into one message per tick"""
+        if not self._has_listeners(channel, subscribers_only=True):
+            return
+        last = self._staged_messages[-1] if self._staged_messages else None
+        if isinstance(last, dict) and last["channel"] == channel:
+            last["parts"].append(delta)
+        else:
+            self._staged_messages.append({"channel": channel, "fields": fields, "parts": [delta]})
+        self._staged_event.set()
+
+    def publish_events(self, session_id: str, events: List[Dict[str, Any]]):
+        """Stage live events for the next broadcast tick"""
+        if not self._has_listeners(session_id):
+            return
+        self._staged.setdefault(session_id, []).extend(events)
+        self._staged_event.set()
+
+    def publish(self, message: Dict[str, Any], session_id: Optional[str] = None,
+                coalesce_key: Optional[str] = None, subscribers_only: bool = False):
+        """Stage a message for every client interested in ``session_id`` (all clients if None)"""
+        if not self._has_listeners(session_id, subscribers_only):
+            return
+        self._staged_messages.append([session_id, coalesce_key, json.dumps(message, default=str), subscribers_only])
+        self._staged_event.set()
+
+    def _send_to(self, client: BroadcastClient, message: Dict[str, Any]):
+        self._enqueue(client, json.dumps(message, default=str), None)
+
+    def _enqueue(self, client: BroadcastClient, payload: str, coalesce_key: Optional[str]):
+        queue = client.queue
+        if coalesce_key is not None and coalesce_key in queue:
+            # Replace the stale message in place so it keeps its position
+            queue[coalesce_key] = payload
+            self._stats["coalesced"] += 1
+            return
+        if len(queue) >= self.queue_size:
+            victim = next((key for key in queue if isinstance(key, int)), None)
+            if victim is None:
+                queue.popitem(last=False)
+            else:
+                del queue[victim]
+            client.dropped += 1
+            self._stats["dropped"] += 1
+        queue[coalesce_key if coalesce_key is not None else next(self._seq)] = payload
+        self._stats["enqueued"] += 1
+        client.ready.set()
+
+    async def _writer(self, client: BroadcastClient):
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                while client.queue:
+                    if client.dropped:
+                        notice = json.dumps({"type": "dropped", "count": client.dropped})
+                        client.dropped = 0
+                        await asyncio.wait_for(client.websocket.send_text(notice), self.send_timeout)
+                    _, payload = client.queue.popitem(last=False)
+                    await asyncio.wait_for(client.websocket.send_text(payload), self.send_timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self._stats["slow_disconnects"] += 1
+                logger.warning(f"Disconnecting websocket client stalled for {self.send_timeout}s")
+            self.disconnect(client)
+            try:
+                await client.websocket.close()
+            except Exception:
+                pass
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.backplane.stop()
+        clients = list(self._clients)
+        for client in clients:
+            self.disconnect(client)
+        await asyncio.gather(*[c.task for c in clients if c.task], return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "clients": len(self._clients),
+            "subscribed_clients": len(self._clients) - len(self._firehose),
+            "queued_messages": sum(len(c.queue) for c in self._clients),
+            "staged_events": sum(len(events) for events in self._staged.values()),
+            "backplane": self.backplane.stats()
+        }
+
+class LiveBackplane(ABC):
+    """Carries broadcast batches between the workers serving live monitoring"""
+
+    name = "base"
+    # Whether other processes may have websocket clients attached
+    shared = False
+
+    @abstractmethod
+    async def start(self, deliver):
+        """Start passing batches published by any worker to ``deliver``"""
+
+    @abstractmethod
+    async def publish(self, envelopes: List[list]):
+        """Send a batch to every worker, this one included"""
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+class LocalBackplane(LiveBackplane):
+    """In-process backplane for a single worker"""
+
+    name = "local"
+
+    def __init__(self):
+        self._deliver = None
+
+    async def start(self, deliver):
+        self._deliver = deliver
+
+    async def publish(self, envelopes: List[list]):
+        if self._deliver and envelopes:
+            await self._deliver(envelopes)
+
+class MongoBackplane(LiveBackplane):
+    """Backplane shared by every worker through a tailable cursor on a capped collection.
+
+    Each broadcast tick inserts one document; every worker, including the one that wrote
+    it, tails the collection and delivers the batch to its own clients. Capped collections
+    need no replica set (unlike change streams) and trim themselves.
+    """
+
+    name = "mongo"
+    shared = True
+
+    def __init__(self, collection: str, size_bytes: int):
+        self.collection = collection
+        self.size_bytes = size_bytes
+        self.worker_id = str(uuid.uuid4())
+        self._deliver = None
+        self._task = None
+        self._last_id = None
+        self._stats = {
+            "batches_published": 0,
+            "batches_received": 0,
+            "tail_restarts": 0
+        }
+
+    async def start(self, deliver):
+        self._deliver = deliver
+        if self._task is None:
+            self._task = asyncio.create_task(self._tail())
+
+    async def _prepare(self):
+        try:
+            await db.create_collection(self.collection, capped=True, size=self.size_bytes)
+        except CollectionInvalid:
+            pass  # already exists
+        latest = await db[self.collection].find_one(sort=[("$natural", -1)])
+        if latest is None:
+            # A tailable cursor on an empty capped collection dies immediately
+            result = await db[self.collection].insert_one({"origin": None, "envelopes": []})
+            return result.inserted_id
+        return latest["_id"]
+
+    async def _tail(self):
+        backoff = 1
+        while True:
+            try:
+                if self._last_id is None:
+                    self._last_id = await self._prepare()
+                # Ids from other nodes aren't strictly ordered, so a restart may skip a
+                # batch written in the same second; live updates are best effort anyway
+                cursor = db[self.collection].find(
+                    {"_id": {"$gt": self._last_id}},
+                    cursor_type=CursorType.TAILABLE_AWAIT
+                )
+                while cursor.alive:
+                    async for doc in cursor:
+                        self._last_id = doc["_id"]
+                        self._stats["batches_received"] += 1
+                        if doc.get("envelopes"):
+                            await self._deliver(doc["envelopes"])
+                    backoff = 1
+                self._stats["tail_restarts"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["tail_restarts"] += 1
+                logger.error(f"Live backplane tail failed: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    async def publish(self, envelopes: List[list]):
+        if not envelopes:
+            return
+        await db[self.collection].insert_one({
+            "origin": self.worker_id,
+            "created_at": datetime.utcnow(),
+            "envelopes": envelopes
+        })
+        self._stats["batches_published"] += 1
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name, "worker_id": self.worker_id, **self._stats}
+
+def create_live_backplane() -> LiveBackplane:
+    if LIVE_BACKPLANE == "mongo":
+        return MongoBackplane(LIVE_BACKPLANE_COLLECTION, LIVE_BACKPLANE_SIZE_MB * 1024 * 1024)
+    return LocalBackplane()
+
+broadcast_hub = BroadcastHub(
+    backplane=create_live_backplane(),
+    queue_size=WS_SEND_QUEUE_SIZE,
+    send_timeout=WS_SEND_TIMEOUT,
+    interval=WS_BROADCAST_INTERVAL
+)
@@ -0,0 +1,905 @@
+"""Page capture: the warm browser pool, network recording, settle detection, capture profiles and crawling"""
+
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import asyncio
+from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
+import json
+import time
+from collections import deque
+from urllib.parse import urlparse, urldefrag
+import logging
+
+from config import (
+    BROWSER_HEALTH_INTERVAL, BROWSER_MAX_RSS_MB, BROWSER_MAX_USES, BROWSER_POOL_SIZE,
+    CRAWL_HOST_INTERVAL_MS, CRAWL_TABS, ENDPOINT_SCHEMA_MAX_BODIES, ENDPOINT_SCHEMA_MAX_BYTES,
+    ENDPOINT_SCHEMA_SAMPLES, SETTLE_IDLE_MS, SETTLE_INTERACTION_MAX_MS, SETTLE_LONG_REQUEST_MS,
+    SETTLE_MAX_MS
+)
+from endpoints import endpoint_key, is_api_request, site_domain
+from fingerprints import analyze_tech_stack, fingerprint_label
+from security import analyze_security, security_observation, SecurityReport
+from api_map import infer_api_map, infer_schema
+
+logger = logging.getLogger(__name__)
+
+class PooledBrowser:
+    """A warm Chromium instance tracked by the browser pool"""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.uses = 0
+        self.created_at = time.monotonic()
+        self.rss_mb = 0.0
+        self.healthy = True
+        browser.on("disconnected", lambda _: setattr(self, "healthy", False))
+
+    async def measure_rss_mb(self) -> float:
+        """Sum the resident memory of all Chromium processes owned by this browser"""
+        total_kb = 0
+        try:
+            cdp = await self.browser.new_browser_cdp_session()
+            try:
+                info = await cdp.send("SystemInfo.getProcessInfo")
+            finally:
+                await cdp.detach()
+            for proc in info.get("processInfo", []):
+                try:
+                    with open(f"/proc/{proc['id']}/status") as f:
+                        for line in f:
+                            if line.startswith("VmRSS:"):
+                                total_kb += int(line.split()[1])
+                                break
+                except (OSError, ValueError):
+                    continue
+        except Exception as e:
+            logger.debug(f"Failed to measure browser memory: {e}")
+        self.rss_mb = round(total_kb / 1024, 1)
+        return self.rss_mb
+
+class BrowserPool:
+    """Bounded pool of warm Chromium browsers driven by one long-lived Playwright instance.
+
+    Each lease hands out a fresh, isolated BrowserContext on an idle browser. Browsers are
+    recycled after ``max_uses`` leases, when their memory grows past ``max_rss_mb`` or when
+    they disconnect. The pool belongs to one worker process, so ``size`` is per worker;
+    how many captures run at once across workers is capped by the analysis job queue.
+    """
+
+    def __init__(self, size: int, max_uses: int, max_rss_mb: int, health_interval: int):
+        self.size = size
+        self.max_uses = max_uses
+        self.max_rss_mb = max_rss_mb
+        self.health_interval = health_interval
+        self._playwright = None
+        self._browsers: List[PooledBrowser] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock = asyncio.Lock()
+        self._health_task = None
+        self._waiting = 0
+        self._stats = {
+            "leases": 0,
+            "launches": 0,
+            "recycled": 0,
+            "health_failures": 0,
+            "wait_time_ms_total": 0.0
+        }
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self):
+        """Start the Playwright driver and launch the warm browsers"""
+        async with self._start_lock:
+            if self.started:
+                return
+            self._playwright = await async_playwright().start()
+            self._idle = asyncio.Queue()
+            try:
+                for _ in range(self.size):
+                    pooled = await self._launch()
+                    self._idle.put_nowait(pooled)
+            except Exception:
+                await self._shutdown_browsers()
+                await self._playwright.stop()
+                self._playwright = None
+                raise
+            self._health_task = asyncio.create_task(self._health_loop())
+            logger.info(f"Browser pool started with {self.size} browsers")
+
+    async def stop(self):
+        """Close every browser and the Playwright driver"""
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        await self._shutdown_browsers()
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _shutdown_browsers(self):
+        for pooled in list(self._browsers):
+            await self._close(pooled)
+
+    async def _launch(self) -> PooledBrowser:
+        browser = await self._playwright.chromium.launch(headless=True)
+        pooled = PooledBrowser(browser)
+        self._browsers.append(pooled)
+        self._stats["launches"] += 1
+        return pooled
+
+    async def _close(self, pooled: PooledBrowser):
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.debug(f"Failed to close browser: {e}")
+
+    async def _replace(self, pooled: PooledBrowser) -> PooledBrowser:
+        await self._close(pooled)
+        self._stats["recycled"] += 1
+        return await self._launch()
+
+    async def _recycle_and_release(self, pooled: PooledBrowser):
+        try:
+            pooled = await self._replace(pooled)
+        except Exception as e:
+            logger.error(f"Failed to relaunch browser: {e}")
+            # Keep the slot alive; the next lease retries the launch
+            pooled.healthy = False
+        self._idle.put_nowait(pooled)
+
+    def _needs_recycle(self, pooled: PooledBrowser) -> bool:
+        return (
+            not pooled.healthy
+            or not pooled.browser.is_connected()
+            or pooled.uses >= self.max_uses
+            or pooled.rss_mb >= self.max_rss_mb
+        )
+
+    @asynccontextmanager
+    async def lease_context(self, **context_options):
+        """Lease an isolated BrowserContext on a warm browser"""
+        if not self.started:
+            await self.start()
+
+        wait_start = time.monotonic()
+        self._waiting += 1
+        try:
+            pooled = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        self._stats["wait_time_ms_total"] += (time.monotonic() - wait_start) * 1000
+
+        context = None
+        try:
+            if not pooled.healthy or not pooled.browser.is_connected():
+                self._stats["health_failures"] += 1
+                pooled = await self._replace(pooled)
+            context = await pooled.browser.new_context(**context_options)
+            pooled.uses += 1
+            self._stats["leases"] += 1
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception as e:
+                    logger.debug(f"Failed to close browser context: {e}")
+            if self._needs_recycle(pooled):
+                asyncio.create_task(self._recycle_and_release(pooled))
+            else:
+                self._idle.put_nowait(pooled)
+
+    async def _health_loop(self):
+        """Periodically check idle browsers and recycle unhealthy or bloated ones"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.warning(f"Browser pool health check failed: {e}")
+
+    async def check_health(self):
+        """Check every idle browser; leased browsers are checked on release"""
+        for _ in range(self._idle.qsize()):
+            try:
+                pooled = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if pooled.browser.is_connected():
+                await pooled.measure_rss_mb()
+            else:
+                self._stats["health_failures"] += 1
+            if self._needs_recycle(pooled):
+                asyncio.create_task(self._recycle_and_release(pooled))
+            else:
+                self._idle.put_nowait(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool metrics for the health endpoint"""
+        leases = self._stats["leases"]
+        return {
+            "started": self.started,
+            "size": self.size,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "waiting": self._waiting,
+            "leases": leases,
+            "launches": self._stats["launches"],
+            "recycled": self._stats["recycled"],
+            "health_failures": self._stats["health_failures"],
+            "avg_wait_ms": round(self._stats["wait_time_ms_total"] / leases, 2) if leases else 0.0,
+            "browsers": [
+                {
+                    "uses": pooled.uses,
+                    "rss_mb": pooled.rss_mb,
+                    "age_s": round(time.monotonic() - pooled.created_at, 1),
+                    "connected": pooled.browser.is_connected()
+                }
+                for pooled in self._browsers
+            ]
+        }
+
+browser_pool = BrowserPool(
+    size=BROWSER_POOL_SIZE,
+    max_uses=BROWSER_MAX_USES,
+    max_rss_mb=BROWSER_MAX_RSS_MB,
+    health_interval=BROWSER_HEALTH_INTERVAL
+)
+
+class NetworkCapture:
+    """Correlates Playwright request, response, finish and failure events in O(1).
+
+    Records are keyed by the Request object itself (Playwright hands out one object per
+    request), so repeated fetches of the same URL stay separate and responses never have
+    to be matched by scanning.
+    """
+
+    def __init__(self):
+        self._records: Dict[Any, Dict[str, Any]] = {}
+        self._pending = []
+        # JSON bodies sampled for schema inference, per endpoint and in total
+        self._schema_samples: Dict[str, int] = {}
+        self._schema_bodies = 0
+        # TLS details per HTTPS origin, looked up on the origin's first response
+        self.tls: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def attach(self, page):
+        page.on("request", self.handle_request)
+        page.on("response", self.handle_response)
+        page.on("requestfinished", self.handle_request_finished)
+        page.on("requestfailed", self.handle_request_failed)
+
+    def handle_request(self, request):
+        if request in self._records:
+            # Already recorded by the route handler
+            return
+        try:
+            redirect_chain = []
+            previous = request.redirected_from
+            while previous is not None:
+                redirect_chain.append(previous.url)
+                previous = previous.redirected_from
+            redirect_chain.reverse()
+
+            self._records[request] = {
+                "url": request.url,
+                "method": request.method,
+                "headers": dict(request.headers),
+                "resource_type": request.resource_type,
+                "status": 0,  # Will be updated in response handler
+                "response_type": "",  # Will be updated in response handler
+                "response_size": 0,  # Will be updated once the request finishes
+                "request_size": 0,
+                "response_headers": {},
+                "timing": {},
+                "redirect_chain": redirect_chain,
+                "failure": None,
+                "blocked": None
+            }
+        except Exception as e:
+            logger.warning(f"Failed to capture request: {e}")
+
+    def mark_blocked(self, request, reason: str):
+        """Record a request the capture profile aborts before it reaches the network"""
+        self.handle_request(request)
+        record = self._records.get(request)
+        if record is not None:
+            record["blocked"] = reason
+
+    def handle_response(self, response):
+        try:
+            record = self._records.get(response.request)
+            content_type = response.headers.get("content-type", "")
+
+            if record is not None:
+                content_length = response.headers.get("content-length", "0")
+                record.update({
+                    "status": response.status,
+                    "response_type": content_type,
+                    # Provisional until the real body size is known
+                    "response_size": int(content_length) if content_length.isdigit() else 0,
+                    "response_headers": dict(response.headers)
+                })
+                self._pending.append(asyncio.ensure_future(self._fetch_response_details(response, record)))
+                if "json" in content_type and self._take_schema_sample(record):
+                    self._pending.append(asyncio.ensure_future(self._sample_schema(response, record)))
+        except Exception as e:
+            logger.warning(f"Failed to capture response: {e}")
+
+    def handle_request_finished(self, request):
+        record = self._records.get(request)
+        if record is None:
+            return
+        record["timing"] = self._timing(request)
+        self._pending.append(asyncio.ensure_future(self._fetch_sizes(request, record)))
+
+    def handle_request_failed(self, request):
+        record = self._records.get(request)
+        if record is None:
+            return
+        record["timing"] = self._timing(request)
+        record["failure"] = request.failure or "failed"
+
+    @staticmethod
+    def _timing(request) -> Dict[str, float]:
+        """Keep only the timing phases Playwright actually measured"""
+        try:
+            return {phase: value for phase, value in request.timing.items() if value is not None and value >= 0}
+        except Exception:
+            return {}
+
+    async def _fetch_sizes(self, request, record: Dict[str, Any]):
+        try:
+            sizes = await request.sizes()
+            record["response_size"] = sizes.get("responseBodySize", record["response_size"])
+            record["request_size"] = sizes.get("requestBodySize", 0)
+        except Exception as e:
+            logger.debug(f"Failed to read request sizes: {e}")
+
+    async def _fetch_response_details(self, response, record: Dict[str, Any]):
+        # response.headers leaves out security-related headers such as Set-Cookie
+        try:
+            record["response_headers"] = await response.all_headers()
+        except Exception as e:
+            logger.debug(f"Failed to read response headers: {e}")
+        parsed = urlparse(response.url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        if parsed.scheme != "https" or origin in self.tls:
+            return
+        self.tls[origin] = None
+        try:
+            self.tls[origin] = await response.security_details()
+        except Exception as e:
+            logger.debug(f"Failed to read TLS details for {origin}: {e}")
+
+    def _take_schema_sample(self, record: Dict[str, Any]) -> bool:
+        """Whether to read this response's body; a few per endpoint, bounded per capture"""
+        if self._schema_bodies >= ENDPOINT_SCHEMA_MAX_BODIES or record["status"] >= 300:
+            return False
+        if not is_api_request(record["url"], record["resource_type"], record["response_type"]):
+            return False
+        if record["response_size"] > ENDPOINT_SCHEMA_MAX_BYTES:
+            return False
+        key = endpoint_key(record["method"], record["url"])
+        if self._schema_samples.get(key, 0) >= ENDPOINT_SCHEMA_SAMPLES:
+            return False
+        self._schema_samples[key] = self._schema_samples.get(key, 0) + 1
+        self._schema_bodies += 1
+        return True
+
+    async def _sample_schema(self, response, record: Dict[str, Any]):
+        try:
+            body = await response.body()
+            if len(body) <= ENDPOINT_SCHEMA_MAX_BYTES:
+                record["response_schema"] = infer_schema(json.loads(body))
+        except Exception as e:
+            logger.debug(f"Failed to sample response schema: {e}")
+
+    async def settle(self):
+        """Wait for outstanding size and header lookups; call before the page closes"""
+        pending, self._pending = self._pending, []
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Captured requests in the order they were issued"""
+        return list(self._records.values())
+
+# Reports DOM mutations to the analyzer, throttled so busy pages don't flood the binding
+MUTATION_OBSERVER_SCRIPT = """
+(() => {
+    let scheduled = false;
+    new MutationObserver(() => {
+        if (scheduled) return;
+        scheduled = true;
+        setTimeout(() => {
+            scheduled = false;
+            if (window.__analyzerMutation) window.__analyzerMutation();
+        }, 100);
+    }).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+})();
+"""
+
+class QuiescenceDetector:
+    """Detects when a page has settled: no blocking requests and no DOM mutations.
+
+    Requests in flight for longer than ``long_request_ms`` (long polling, streaming,
+    beacons) stop counting as activity so they can't hold the page open forever.
+    """
+
+    def __init__(self, idle_ms: int, long_request_ms: int):
+        self.idle_ms = idle_ms
+        self.long_request_ms = long_request_ms
+        self._in_flight: Dict[Any, float] = {}
+        self._last_activity = time.monotonic()
+        self._changed = asyncio.Event()
+
+    async def attach(self, page):
+        page.on("request", self.handle_request_started)
+        page.on("requestfinished", self.handle_request_done)
+        page.on("requestfailed", self.handle_request_done)
+        await page.expose_function("__analyzerMutation", self.activity)
+        await page.add_init_script(MUTATION_OBSERVER_SCRIPT)
+
+    def activity(self):
+        self._last_activity = time.monotonic()
+        self._changed.set()
+
+    def handle_request_started(self, request):
+        self._in_flight[request] = time.monotonic()
+        self.activity()
+
+    def handle_request_done(self, request):
+        if self._in_flight.pop(request, None) is not None:
+            self.activity()
+
+    def _blocking_requests(self, now: float) -> int:
+        cutoff = now - self.long_request_ms / 1000
+        return sum(1 for started in self._in_flight.values() if started >= cutoff)
+
+    async def wait(self, max_ms: int) -> Dict[str, Any]:
+        """Wait until the page has been idle for ``idle_ms``, or ``max_ms`` elapses"""
+        start = time.monotonic()
+        deadline = start + max_ms / 1000
+        idle = self.idle_ms / 1000
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return {"settled": False, "settle_ms": round((now - start) * 1000)}
+
+            quiet_for = now - self._last_activity
+            if quiet_for >= idle and self._blocking_requests(now) == 0:
+                return {"settled": True, "settle_ms": round((now - start) * 1000)}
+
+            # Sleep until the idle window could end, a long request stops blocking, or activity
+            timeout = idle - quiet_for if quiet_for < idle else idle
+            # Requests already past the cutoff no longer block, so they set no wake-up
+            cutoff = now - self.long_request_ms / 1000
+            blocking = [started for started in self._in_flight.values() if started >= cutoff]
+            if blocking:
+                timeout = min(timeout, max(0.01, min(blocking) - cutoff))
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=max(0.01, min(timeout, deadline - now)))
+            except asyncio.TimeoutError:
+                pass
+
+# Well-known ad and tracker hosts, matched on the host and its parent domains
+TRACKER_DOMAINS = frozenset([
+    'doubleclick.net', 'googlesyndication.com', 'google-analytics.com', 'googletagmanager.com',
+    'googleadservices.com', 'adservice.google.com', 'facebook.net', 'connect.facebook.net',
+    'hotjar.com', 'segment.io', 'segment.com', 'mixpanel.com', 'amplitude.com', 'fullstory.com',
+    'clarity.ms', 'scorecardresearch.com', 'quantserve.com', 'taboola.com', 'outbrain.com',
+    'criteo.com', 'adnxs.com', 'amazon-adsystem.com', 'bat.bing.com', 'ads-twitter.com',
+    'px.ads.linkedin.com', 'analytics.tiktok.com', 'js-agent.newrelic.com', 'nr-data.net',
+    'ingest.sentry.io'
+])
+
+# Resource types and tracker blocking per capture profile
+CAPTURE_PROFILES = {
+    "full": {"block_types": frozenset(), "block_trackers": False},
+    "no-media": {"block_types": frozenset(["image", "media", "font"]), "block_trackers": False},
+    "api-only": {"block_types": frozenset(["image", "media", "font", "stylesheet"]), "block_trackers": True}
+}
+
+def is_tracker_host(host: str) -> bool:
+    parts = host.lower().split(".")
+    return any(".".join(parts[i:]) in TRACKER_DOMAINS for i in range(len(parts) - 1))
+
+def profile_block_reason(profile: Dict[str, Any], request, site: str = "") -> Optional[str]:
+    """Why the profile blocks this request, or None to let it through"""
+    if request.resource_type in profile["block_types"]:
+        return f"resource_type:{request.resource_type}"
+    if profile["block_trackers"]:
+        host = urlparse(request.url).hostname or ""
+        # Only third-party trackers; analyzing a tracker's own site must still work
+        if site_domain(host) != site and is_tracker_host(host):
+            return "tracker"
+    return None
+
+CAPTURE_CONTEXT_OPTIONS = {
+    "user_agent": "Website Analyzer Bot 1.0",
+    "viewport": {"width": 1920, "height": 1080}
+}
+
+async def capture_website_data(target_url: str, depth: str = "medium",
+                               crawl: Optional[Dict[str, Any]] = None,
+                               profile: str = "full") -> Dict[str, Any]:
+    """Capture website data using Playwright, optionally crawling same-origin pages"""
+    async with browser_pool.lease_context(**CAPTURE_CONTEXT_OPTIONS) as context:
+        if crawl:
+            return await crawl_website(context, target_url, depth, profile=profile, **crawl)
+        page_data = await capture_page(context, target_url, depth, profile=profile)
+    
+    return build_capture_result([page_data])
+
+async def capture_page(context, target_url: str, depth: str = "medium", collect_links: bool = False,
+                       profile: str = "full") -> Dict[str, Any]:
+    """Capture a single page in a leased browser context"""
+    capture_start = time.monotonic()
+    profile_name = profile if profile in CAPTURE_PROFILES else "full"
+    capture_profile = CAPTURE_PROFILES[profile_name]
+    capture = NetworkCapture()
+    console_logs = []
+    tech_stack = []
+    security_observations = []
+    links = []
+    page_info = {}
+    
+    page = await context.new_page()
+    
+    # Capture console logs
+    def handle_console_log(msg):
+        try:
+            console_logs.append({
+                "type": msg.type,
+                "text": msg.text,
+                "timestamp": datetime.utcnow().isoformat()
+            })
+        except Exception as e:
+            logger.warning(f"Failed to capture console log: {e}")
+    
+    # Client-side route changes (pushState, interaction) are crawlable too
+    def handle_navigation(frame):
+        if collect_links and frame == page.main_frame:
+            links.append(frame.url)
+    
+    # Abort requests the profile doesn't need, keeping them as metadata only
+    site = site_domain(urlparse(target_url).hostname or "")
+    
+    async def handle_route(route):
+        reason = profile_block_reason(capture_profile, route.request, site)
+        if reason:
+            capture.mark_blocked(route.request, reason)
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+    
+    capture.attach(page)
+    page.on("console", handle_console_log)
+    page.on("framenavigated", handle_navigation)
+    quiescence = QuiescenceDetector(SETTLE_IDLE_MS, SETTLE_LONG_REQUEST_MS)
+    
+    try:
+        await quiescence.attach(page)
+        if capture_profile["block_types"] or capture_profile["block_trackers"]:
+            await page.route("**/*", handle_route)
+        
+        # Navigate to the target URL
+        response = await page.goto(target_url, wait_until="load", timeout=30000)
+        
+        # Basic page info
+        page_info = {
+            "title": await page.title(),
+            "url": page.url,
+            "status": response.status if response else 0,
+            "load_time": datetime.utcnow().isoformat()
+        }
+        if response:
+            # Kept so the next analysis of this URL can diff document headers
+            page_info["response_headers"] = {
+                name: value for name, value in (await response.all_headers()).items() if name != "set-cookie"
+            }
+        
+        # Wait for dynamic content until the page goes quiet, capped by depth
+        settle = await quiescence.wait(SETTLE_MAX_MS.get(depth, SETTLE_MAX_MS["medium"]))
+        page_info.update(settle)
+        # Title may change once client-side rendering finishes
+        page_info["title"] = await page.title()
+        
+        # Fingerprint the tech stack from page content, headers, cookies and scripts
+        script_urls = [record["url"] for record in capture.records() if record.get("resource_type") == "script"]
+        fingerprints = await analyze_tech_stack(page, response, script_urls)
+        tech_stack = [fingerprint_label(detection) for detection in fingerprints]
+        page_info["fingerprints"] = fingerprints
+        
+        if collect_links:
+            links.extend(await extract_links(page))
+        
+        # If deep analysis, interact with page elements
+        if depth == "deep":
+            interaction_settle = await interact_with_page(page, quiescence)
+            page_info["interaction_settled"] = interaction_settle["settled"]
+            page_info["interaction_settle_ms"] = interaction_settle["settle_ms"]
+        
+    except Exception as e:
+        logger.error(f"Error during page analysis: {e}")
+        page_info["error"] = str(e)
+    
+    await capture.settle()
+    try:
+        await page.close()
+    except Exception as e:
+        logger.debug(f"Failed to close page: {e}")
+    
+    # Runs once every response has its full headers, including those from interaction
+    security_findings = analyze_security(page_info.get("url") or target_url, capture.records(), capture.tls)
+    security_observations = [security_observation(finding) for finding in security_findings]
+    page_info["security_findings"] = security_findings
+    page_info["tls"] = [{"origin": origin, **details} for origin, details in capture.tls.items() if details]
+    try:
+        # Cookie values are credentials; only names and flags are kept
+        page_info["cookies"] = [
+            {key: cookie.get(key) for key in ("name", "domain", "path", "expires", "httpOnly", "secure", "sameSite")}
+            for cookie in await context.cookies()
+        ]
+    except Exception as e:
+        logger.debug(f"Failed to read cookies: {e}")
+    
+    page_info["capture_profile"] = summarize_capture_profile(
+        profile_name, capture.records(), (time.monotonic() - capture_start) * 1000
+    )
+    
+    return {
+        "network_requests": capture.records(),
+        "console_logs": console_logs,
+        "page_info": page_info,
+        "tech_stack": tech_stack,
+        "security_observations": security_observations,
+        "links": links
+    }
+
+def summarize_capture_profile(profile_name: str, records: List[Dict[str, Any]], capture_ms: float) -> Dict[str, Any]:
+    """Timing and byte counts for a capture, to compare profiles"""
+    blocked_by_reason: Dict[str, int] = {}
+    bytes_received = 0
+    bytes_sent = 0
+    for record in records:
+        if record.get("blocked"):
+            blocked_by_reason[record["blocked"]] = blocked_by_reason.get(record["blocked"], 0) + 1
+        else:
+            bytes_received += record.get("response_size", 0) or 0
+            bytes_sent += record.get("request_size", 0) or 0
+    return {
+        "profile": profile_name,
+        "capture_ms": round(capture_ms),
+        "requests": len(records),
+        "blocked_requests": sum(blocked_by_reason.values()),
+        "blocked_by_reason": blocked_by_reason,
+        "bytes_received": bytes_received,
+        "bytes_sent": bytes_sent
+    }
+
+def build_capture_result(pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge per-page captures into the analysis payload; the first page is the entry page"""
+    network_requests = [req for page in pages for req in page["network_requests"]]
+    console_logs = [log for page in pages for log in page["console_logs"]]
+    page_info = dict(pages[0]["page_info"]) if pages else {}
+    fingerprints = {}
+    for page in pages:
+        for detection in page["page_info"].get("fingerprints", []):
+            fingerprints.setdefault(detection["name"], detection)
+    if fingerprints:
+        page_info["fingerprints"] = list(fingerprints.values())
+    security = SecurityReport()
+    for page in pages:
+        security.merge(page["page_info"].get("security_findings", []))
+    page_info["security_findings"] = security.findings()
+    api_map = infer_api_map(network_requests)
+    
+    return {
+        "network_requests": [
+            {
+                "url": req.get("url", ""),
+                "method": req.get("method", "GET"),
+                "status": req.get("status", 0),
+                "response_type": req.get("response_type", ""),
+                "headers": req.get("headers", {}),
+                "response_size": req.get("response_size", 0),
+                "response_headers": req.get("response_headers", {}),
+                "resource_type": req.get("resource_type", ""),
+                "request_size": req.get("request_size", 0),
+                "timing": req.get("timing", {}),
+                "redirect_chain": req.get("redirect_chain", []),
+                "failure": req.get("failure"),
+                "blocked": req.get("blocked")
+            }
+            for req in network_requests
+            if req.get("url") and req.get("method")
+        ],
+        "console_logs": [log["text"] for log in console_logs[:50]],  # Limit logs
+        "page_info": page_info,
+        "tech_stack": list(dict.fromkeys(tech for page in pages for tech in page["tech_stack"])),
+        "api_endpoints": [f"{endpoint['method']} {endpoint['template']}" for endpoint in api_map],
+        "api_map": api_map,
+        "security_observations": [security_observation(finding) for finding in page_info["security_findings"]]
+    }
+
+async def extract_links(page) -> List[str]:
+    """Collect absolute link targets from the page"""
+    try:
+        return await page.evaluate("""
+            () => Array.from(document.querySelectorAll('a[href], area[href]'))
+                .map(link => link.href)
+                .filter(href => href.startsWith('http'))
+        """)
+    except Exception as e:
+        logger.warning(f"Failed to extract links: {e}")
+        return []
+
+# Links to these are downloads, not pages worth crawling
+NON_PAGE_EXTENSIONS = (
+    '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.ico', '.pdf', '.zip', '.gz',
+    '.mp4', '.mp3', '.webm', '.woff', '.woff2', '.ttf', '.css', '.js', '.json', '.xml'
+)
+
+class HostRateLimiter:
+    """Spaces out navigations to the same host by at least ``interval_ms``"""
+
+    def __init__(self, interval_ms: int):
+        self.interval = interval_ms / 1000
+        self._next_slot: Dict[str, float] = {}
+
+    async def wait(self, host: str):
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class CrawlFrontier:
+    """Deduplicating same-origin URL frontier with page and depth budgets"""
+
+    def __init__(self, start_url: str, max_pages: int, max_depth: int):
+        parsed = urlparse(start_url)
+        self.origin = (parsed.scheme, parsed.netloc)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self._seen = set()
+        self._queue = deque()
+        self._scheduled = 0
+        self._in_progress = 0
+        self._changed = asyncio.Condition()
+
+    @staticmethod
+    def normalize(url: str) -> str:
+        url, _ = urldefrag(url)
+        parsed = urlparse(url)
+        path = parsed.path or "/"
+        return parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower(), path=path).geturl()
+
+    def _accepts(self, url: str) -> bool:
+        parsed = urlparse(url)
+        return (
+            (parsed.scheme, parsed.netloc.lower()) == (self.origin[0], self.origin[1].lower())
+            and not parsed.path.lower().endswith(NON_PAGE_EXTENSIONS)
+        )
+
+    async def add(self, url: str, depth: int):
+        url = self.normalize(url)
+        # The start URL is crawled whatever its extension; the filter is for discovered links
+        if depth > self.max_depth or url in self._seen or (depth > 0 and not self._accepts(url)):
+            return
+        self._seen.add(url)
+        async with self._changed:
+            self._queue.append((url, depth))
+            self._changed.notify()
+
+    async def next(self) -> Optional[tuple]:
+        """Next (url, depth) to crawl, or None once the budget or the frontier is exhausted"""
+        async with self._changed:
+            while True:
+                if self._scheduled >= self.max_pages:
+                    return None
+                if self._queue:
+                    self._scheduled += 1
+                    self._in_progress += 1
+                    return self._queue.popleft()
+                if self._in_progress == 0:
+                    # Nothing queued and nobody left to discover more links
+                    self._changed.notify_all()
+                    return None
+                await self._changed.wait()
+
+    async def done(self):
+        async with self._changed:
+            self._in_progress -= 1
+            self._changed.notify_all()
+
+async def crawl_website(context, start_url: str, depth: str, max_pages: int = 10,
+                        max_depth: int = 2, profile: str = "full") -> Dict[str, Any]:
+    """Crawl same-origin pages in parallel tabs of one browser context and merge the results"""
+    frontier = CrawlFrontier(start_url, max_pages, max_depth)
+    rate_limiter = HostRateLimiter(CRAWL_HOST_INTERVAL_MS)
+    pages = []
+    crawl_start = time.monotonic()
+    
+    await frontier.add(start_url, 0)
+    
+    async def worker():
+        while True:
+            item = await frontier.next()
+            if item is None:
+                return
+            url, link_depth = item
+            try:
+                await rate_limiter.wait(urlparse(url).netloc)
+                page_data = await capture_page(
+                    context, url, depth, collect_links=link_depth < max_depth, profile=profile
+                )
+                page_data["crawl_depth"] = link_depth
+                pages.append(page_data)
+                for link in page_data["links"]:
+                    await frontier.add(link, link_depth + 1)
+            except Exception as e:
+                logger.warning(f"Failed to crawl {url}: {e}")
+            finally:
+                await frontier.done()
+    
+    await asyncio.gather(*[worker() for _ in range(max(1, CRAWL_TABS))])
+    
+    # Keep the entry page first regardless of which tab finished first
+    pages.sort(key=lambda page: page["crawl_depth"])
+    result = build_capture_result(pages)
+    duration = time.monotonic() - crawl_start
+    result["page_info"]["capture_profile"] = summarize_capture_profile(
+        profile if profile in CAPTURE_PROFILES else "full",
+        [req for page in pages for req in page["network_requests"]],
+        duration * 1000
+    )
+    result["page_info"]["crawl"] = {
+        "pages_crawled": len(pages),
+        "duration_ms": round(duration * 1000),
+        "pages_per_minute": round(len(pages) / duration * 60, 1) if duration else 0.0,
+        "pages": [
+            {
+                "url": page["page_info"].get("url"),
+                "title": page["page_info"].get("title"),
+                "status": page["page_info"].get("status"),
+                "depth": page["crawl_depth"],
+                "settle_ms": page["page_info"].get("settle_ms"),
+                "requests": len(page["network_requests"]),
+                "error": page["page_info"].get("error")
+            }
+            for page in pages
+        ]
+    }
+    return result
+
+async def interact_with_page(page, quiescence: QuiescenceDetector) -> Dict[str, Any]:
+    """Interact with page elements for deeper analysis, then wait for the page to settle"""
+    try:
+        # Try to find and click common interactive elements
+        interactive_selectors = [
+            'button[data-testid]',
+            'button[class*="btn"]',
+            'a[href*="api"]',
+            '[role="button"]'
+        ]
+        
+        for selector in interactive_selectors:
+            elements = await page.query_selector_all(selector)
+            if elements and len(elements) > 0:
+                try:
+                    await elements[0].click(timeout=1000)
+                    break
+                except:
+                    continue
+                    
+    except Exception as e:
+        logger.warning(f"Failed to interact with page: {e}")
+    return await quiescence.wait(SETTLE_INTERACTION_MAX_MS)
@@ -0,0 +1,151 @@
+"""Settings read from the environment (and .env) at import time"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Reported by the API and in exported HAR files
+APP_TITLE = "Website Reverse Engineering Tool"
+APP_VERSION = "1.0.0"
+
+# MongoDB connection
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+
+# Uvicorn worker processes started by the entrypoint
+BACKEND_WORKERS = int(os.environ.get('BACKEND_WORKERS', '1'))
+
+# Browser pool configuration
+# Each worker process runs its own pool; by default two browsers are shared out between the workers
+BROWSER_POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', str(max(1, 2 // BACKEND_WORKERS))))
+BROWSER_MAX_USES = int(os.environ.get('BROWSER_MAX_USES', '50'))
+BROWSER_MAX_RSS_MB = int(os.environ.get('BROWSER_MAX_RSS_MB', '1024'))
+BROWSER_HEALTH_INTERVAL = int(os.environ.get('BROWSER_HEALTH_INTERVAL', '30'))
+
+# Analysis job queue configuration
+ANALYSIS_CONCURRENCY = {
+    "light": int(os.environ.get('ANALYSIS_CONCURRENCY_LIGHT', '3')),
+    "medium": int(os.environ.get('ANALYSIS_CONCURRENCY_MEDIUM', '2')),
+    "deep": int(os.environ.get('ANALYSIS_CONCURRENCY_DEEP', '1'))
+}
+ANALYSIS_POLL_INTERVAL = int(os.environ.get('ANALYSIS_POLL_INTERVAL', '5'))
+ANALYSIS_STALE_AFTER = int(os.environ.get('ANALYSIS_STALE_AFTER', '900'))
+
+# Recurring analysis schedule configuration
+SCHEDULE_POLL_INTERVAL = int(os.environ.get('SCHEDULE_POLL_INTERVAL', '15'))
+SCHEDULE_MAX_JITTER = int(os.environ.get('SCHEDULE_MAX_JITTER', '300'))  # seconds
+SCHEDULE_JITTER_FRACTION = float(os.environ.get('SCHEDULE_JITTER_FRACTION', '0.1'))  # of the gap to the next run
+# Scheduled jobs queued or running at once; defaults to the analysis queue's total concurrency
+SCHEDULE_MAX_OUTSTANDING = int(os.environ.get('SCHEDULE_MAX_OUTSTANDING', str(sum(ANALYSIS_CONCURRENCY.values()))))
+SCHEDULE_PRIORITY = int(os.environ.get('SCHEDULE_PRIORITY', '-1'))  # below interactive analyses
+SCHEDULE_RUN_HISTORY = int(os.environ.get('SCHEDULE_RUN_HISTORY', '500'))
+
+# LLM client configuration
+LLM_BASE_URL = os.environ.get('LLM_BASE_URL', 'https://openrouter.ai/api/v1')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'google/gemini-2.5-flash-preview-05-20')
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '8'))
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', '60'))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '2'))
+LLM_MAX_CLIENTS = int(os.environ.get('LLM_MAX_CLIENTS', '32'))
+
+# AI response cache configuration
+AI_CACHE_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', '1000'))
+AI_CACHE_TTL_ANALYSIS = int(os.environ.get('AI_CACHE_TTL_ANALYSIS', '86400'))
+AI_CACHE_TTL_INSIGHT = int(os.environ.get('AI_CACHE_TTL_INSIGHT', '900'))
+
+# AI prompt budget configuration
+AI_PROMPT_TOKEN_BUDGET = int(os.environ.get('AI_PROMPT_TOKEN_BUDGET', '6000'))
+AI_PROMPT_API_SHARE = float(os.environ.get('AI_PROMPT_API_SHARE', '0.4'))
+AI_PROMPT_CONSOLE_SHARE = float(os.environ.get('AI_PROMPT_CONSOLE_SHARE', '0.2'))
+AI_PROMPT_HEADER_VALUE_CHARS = int(os.environ.get('AI_PROMPT_HEADER_VALUE_CHARS', '120'))
+
+# Incremental re-analysis configuration
+ANALYSIS_DIFF_MAX_ITEMS = int(os.environ.get('ANALYSIS_DIFF_MAX_ITEMS', '200'))
+AI_CHANGES_CONTEXT_CHARS = int(os.environ.get('AI_CHANGES_CONTEXT_CHARS', '3000'))
+
+# Page settle detection configuration
+SETTLE_IDLE_MS = int(os.environ.get('SETTLE_IDLE_MS', '500'))
+SETTLE_MAX_MS = {
+    "light": int(os.environ.get('SETTLE_MAX_MS_LIGHT', '2000')),
+    "medium": int(os.environ.get('SETTLE_MAX_MS_MEDIUM', '5000')),
+    "deep": int(os.environ.get('SETTLE_MAX_MS_DEEP', '10000'))
+}
+SETTLE_INTERACTION_MAX_MS = int(os.environ.get('SETTLE_INTERACTION_MAX_MS', '3000'))
+SETTLE_LONG_REQUEST_MS = int(os.environ.get('SETTLE_LONG_REQUEST_MS', '5000'))
+
+# Crawl mode configuration
+CRAWL_TABS = int(os.environ.get('CRAWL_TABS', '4'))
+CRAWL_HOST_INTERVAL_MS = int(os.environ.get('CRAWL_HOST_INTERVAL_MS', '250'))
+CRAWL_MAX_PAGES = int(os.environ.get('CRAWL_MAX_PAGES', '50'))
+CRAWL_MAX_DEPTH = int(os.environ.get('CRAWL_MAX_DEPTH', '3'))
+
+# Capture storage configuration
+CAPTURE_STORAGE = os.environ.get('CAPTURE_STORAGE', 'gridfs')  # gridfs, local
+CAPTURE_DIR = os.environ.get('CAPTURE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'captures'))
+CAPTURE_PREVIEW_REQUESTS = int(os.environ.get('CAPTURE_PREVIEW_REQUESTS', '20'))
+CAPTURE_PREVIEW_LOGS = int(os.environ.get('CAPTURE_PREVIEW_LOGS', '20'))
+
+# API inference configuration
+ENDPOINT_VARIABLE_THRESHOLD = int(os.environ.get('ENDPOINT_VARIABLE_THRESHOLD', '25'))
+ENDPOINT_SCHEMA_SAMPLES = int(os.environ.get('ENDPOINT_SCHEMA_SAMPLES', '3'))
+ENDPOINT_SCHEMA_MAX_BODIES = int(os.environ.get('ENDPOINT_SCHEMA_MAX_BODIES', '200'))
+ENDPOINT_SCHEMA_MAX_BYTES = int(os.environ.get('ENDPOINT_SCHEMA_MAX_BYTES', '262144'))
+ENDPOINT_SCHEMA_MAX_DEPTH = int(os.environ.get('ENDPOINT_SCHEMA_MAX_DEPTH', '6'))
+ENDPOINT_SCHEMA_MAX_ITEMS = int(os.environ.get('ENDPOINT_SCHEMA_MAX_ITEMS', '20'))
+ENDPOINT_SCHEMA_MAX_PROPERTIES = int(os.environ.get('ENDPOINT_SCHEMA_MAX_PROPERTIES', '50'))
+
+# Technology fingerprint configuration
+FINGERPRINTS_PATH = os.environ.get('FINGERPRINTS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fingerprints.json'))
+
+# Retention configuration (0 keeps documents forever)
+LIVE_SESSION_RETENTION_DAYS = int(os.environ.get('LIVE_SESSION_RETENTION_DAYS', '30'))
+ANALYSIS_JOB_RETENTION_DAYS = int(os.environ.get('ANALYSIS_JOB_RETENTION_DAYS', '7'))
+# Analysis retention is opt-in: each step deletes data and is off until given a period in days.
+# Compaction drops stored HAR captures and request/log previews, downsampling keeps one analysis
+# per URL per day (plus any that changed), and expiry deletes analyses outright.
+ANALYSIS_COMPACT_AFTER_DAYS = int(os.environ.get('ANALYSIS_COMPACT_AFTER_DAYS', '0'))
+ANALYSIS_DOWNSAMPLE_AFTER_DAYS = int(os.environ.get('ANALYSIS_DOWNSAMPLE_AFTER_DAYS', '0'))
+ANALYSIS_RETENTION_DAYS = int(os.environ.get('ANALYSIS_RETENTION_DAYS', '0'))
+ANALYSIS_RETENTION_INTERVAL = int(os.environ.get('ANALYSIS_RETENTION_INTERVAL', '3600'))
+ANALYSIS_RETENTION_BATCH = int(os.environ.get('ANALYSIS_RETENTION_BATCH', '500'))
+
+# Live session write-behind buffer configuration
+LIVE_FLUSH_INTERVAL = float(os.environ.get('LIVE_FLUSH_INTERVAL', '0.5'))
+LIVE_FLUSH_MAX_EVENTS = int(os.environ.get('LIVE_FLUSH_MAX_EVENTS', '500'))
+LIVE_FLUSH_MAX_ATTEMPTS = int(os.environ.get('LIVE_FLUSH_MAX_ATTEMPTS', '5'))
+LIVE_BUFFER_MAX_PENDING = int(os.environ.get('LIVE_BUFFER_MAX_PENDING', '50000'))
+LIVE_BUCKET_SIZE = int(os.environ.get('LIVE_BUCKET_SIZE', '200'))
+LIVE_RECENT_EVENTS = int(os.environ.get('LIVE_RECENT_EVENTS', '5'))
+
+# In-memory live session store configuration
+LIVE_SESSION_MAX = int(os.environ.get('LIVE_SESSION_MAX', '1000'))
+LIVE_SESSION_EVENTS = int(os.environ.get('LIVE_SESSION_EVENTS', '200'))
+LIVE_SESSION_IDLE_TTL = int(os.environ.get('LIVE_SESSION_IDLE_TTL', '600'))
+LIVE_SESSION_SWEEP_INTERVAL = int(os.environ.get('LIVE_SESSION_SWEEP_INTERVAL', '30'))
+
+# Live session statistics configuration
+LIVE_STATS_MAX_ENDPOINTS = int(os.environ.get('LIVE_STATS_MAX_ENDPOINTS', '50'))
+LIVE_STATS_TOP_SLOW = int(os.environ.get('LIVE_STATS_TOP_SLOW', '10'))
+LIVE_STATS_SLOW_MS = int(os.environ.get('LIVE_STATS_SLOW_MS', '3000'))
+LIVE_STATS_PERSIST_INTERVAL = float(os.environ.get('LIVE_STATS_PERSIST_INTERVAL', '5'))
+
+# Live anomaly detection and server-side insight configuration
+LIVE_ANOMALY_ERROR_RATE = float(os.environ.get('LIVE_ANOMALY_ERROR_RATE', '0.2'))
+LIVE_ANOMALY_MIN_REQUESTS = int(os.environ.get('LIVE_ANOMALY_MIN_REQUESTS', '5'))
+LIVE_ANOMALY_LATENCY_FACTOR = float(os.environ.get('LIVE_ANOMALY_LATENCY_FACTOR', '2.0'))
+LIVE_ANOMALY_LATENCY_MIN_MS = float(os.environ.get('LIVE_ANOMALY_LATENCY_MIN_MS', '300'))
+LIVE_ANOMALY_LATENCY_MIN_SAMPLES = int(os.environ.get('LIVE_ANOMALY_LATENCY_MIN_SAMPLES', '20'))
+LIVE_INSIGHT_DEBOUNCE = float(os.environ.get('LIVE_INSIGHT_DEBOUNCE', '5'))
+LIVE_INSIGHT_MIN_INTERVAL = float(os.environ.get('LIVE_INSIGHT_MIN_INTERVAL', '60'))
+LIVE_INSIGHT_COOLDOWN = float(os.environ.get('LIVE_INSIGHT_COOLDOWN', '300'))
+LIVE_INSIGHT_HISTORY = int(os.environ.get('LIVE_INSIGHT_HISTORY', '20'))
+
+# Live monitoring websocket configuration
+WS_SEND_QUEUE_SIZE = int(os.environ.get('WS_SEND_QUEUE_SIZE', '256'))
+WS_SEND_TIMEOUT = float(os.environ.get('WS_SEND_TIMEOUT', '5'))
+WS_BROADCAST_INTERVAL = float(os.environ.get('WS_BROADCAST_INTERVAL', '0.05'))
+
+# Live monitoring backplane configuration; use "mongo" when running several workers or nodes
+LIVE_BACKPLANE = os.environ.get('LIVE_BACKPLANE', 'local')  # local, mongo
+LIVE_BACKPLANE_COLLECTION = os.environ.get('LIVE_BACKPLANE_COLLECTION', 'live_broadcasts')
+LIVE_BACKPLANE_SIZE_MB = int(os.environ.get('LIVE_BACKPLANE_SIZE_MB', '64'))
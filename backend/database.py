@@ -0,0 +1,8 @@
+"""The shared MongoDB client; modules reach the database through ``db``"""
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from config import MONGO_URL
+
+client = AsyncIOMotorClient(MONGO_URL)
+db = client.website_analyzer
@@ -0,0 +1,199 @@
+"""Cross-analysis diffing, and AI change reports that build on the previous full report"""
+
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import logging
+
+from config import AI_CACHE_TTL_ANALYSIS, AI_CHANGES_CONTEXT_CHARS, ANALYSIS_DIFF_MAX_ITEMS
+from database import db
+from endpoints import strip_query
+from llm import ai_cache, llm_client, prompt_budgeter
+
+logger = logging.getLogger(__name__)
+
+# Headers that change on every response and say nothing about the site
+VOLATILE_HEADERS = frozenset({
+    "age", "cf-cache-status", "cf-ray", "content-length", "date", "etag", "expires", "last-modified", "nel",
+    "report-to", "server-timing", "set-cookie", "via", "x-amz-cf-id", "x-amz-cf-pop", "x-cache", "x-cache-hits",
+    "x-request-id", "x-served-by", "x-timer", "x-vercel-id"
+})
+
+def schema_paths(schema: Optional[Dict[str, Any]], prefix: str = "", depth: int = 0) -> Dict[str, str]:
+    """Flatten a response schema into field path -> type"""
+    if not schema:
+        return {}
+    types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+    paths = {prefix or "$": "|".join(types)}
+    if depth >= 3:
+        return paths
+    for name, child in schema.get("properties", {}).items():
+        paths.update(schema_paths(child, f"{prefix}.{name}" if prefix else name, depth + 1))
+    if schema.get("items"):
+        paths.update(schema_paths(schema["items"], f"{prefix}[]", depth + 1))
+    return paths
+
+def capped(items: List[Any]) -> List[Any]:
+    return items[:ANALYSIS_DIFF_MAX_ITEMS]
+
+def diff_endpoints(previous: List[Dict[str, Any]], current: List[Dict[str, Any]]) -> Dict[str, Any]:
+    before = {f"{endpoint['method']} {endpoint['template']}": endpoint for endpoint in previous}
+    after = {f"{endpoint['method']} {endpoint['template']}": endpoint for endpoint in current}
+    changed = []
+    for key in sorted(before.keys() & after.keys()):
+        change: Dict[str, Any] = {}
+        new_statuses = sorted(set(after[key].get("status", {})) - set(before[key].get("status", {})))
+        if new_statuses:
+            change["new_status"] = new_statuses
+        if before[key].get("schema") and after[key].get("schema"):
+            old_fields = schema_paths(before[key]["schema"])
+            new_fields = schema_paths(after[key]["schema"])
+            added = sorted(new_fields.keys() - old_fields.keys())
+            removed = sorted(old_fields.keys() - new_fields.keys())
+            retyped = sorted(path for path in old_fields.keys() & new_fields.keys() if old_fields[path] != new_fields[path])
+            if added:
+                change["fields_added"] = added
+            if removed:
+                change["fields_removed"] = removed
+            if retyped:
+                change["fields_retyped"] = {path: {"from": old_fields[path], "to": new_fields[path]} for path in retyped}
+        if change:
+            changed.append({"endpoint": key, **change})
+    return {
+        "added": capped(sorted(after.keys() - before.keys())),
+        "removed": capped(sorted(before.keys() - after.keys())),
+        "changed": capped(changed)
+    }
+
+def technology_versions(analysis: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    fingerprints = (analysis.get("page_info") or {}).get("fingerprints")
+    if fingerprints is not None:
+        return {detection["name"]: detection.get("version") for detection in fingerprints}
+    # Analyses from before fingerprinting only have names
+    return {name: None for name in analysis.get("tech_stack", [])}
+
+def diff_analyses(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Structural changes between the previous analysis of a URL and a new capture of it"""
+    previous_info = previous.get("page_info") or {}
+    current_info = current.get("page_info") or {}
+    
+    tech_before, tech_after = technology_versions(previous), technology_versions(current)
+    tech = {
+        "added": sorted(tech_after.keys() - tech_before.keys()),
+        "removed": sorted(tech_before.keys() - tech_after.keys()),
+        "changed": [
+            {"name": name, "from": tech_before[name], "to": tech_after[name]}
+            for name in sorted(tech_before.keys() & tech_after.keys())
+            if tech_before[name] and tech_after[name] and tech_before[name] != tech_after[name]
+        ]
+    }
+    
+    headers = {"added": {}, "removed": [], "changed": {}}
+    if "response_headers" in previous_info and "response_headers" in current_info:
+        headers_before = {k: v for k, v in previous_info["response_headers"].items() if k not in VOLATILE_HEADERS}
+        headers_after = {k: v for k, v in current_info["response_headers"].items() if k not in VOLATILE_HEADERS}
+        headers = {
+            "added": {name: headers_after[name] for name in sorted(headers_after.keys() - headers_before.keys())},
+            "removed": sorted(headers_before.keys() - headers_after.keys()),
+            "changed": {
+                name: {"from": headers_before[name], "to": headers_after[name]}
+                for name in sorted(headers_before.keys() & headers_after.keys())
+                if headers_before[name] != headers_after[name]
+            }
+        }
+    
+    findings_before = {finding["message"] for finding in previous_info.get("security_findings", [])}
+    findings_after = {finding["message"] for finding in current_info.get("security_findings", [])}
+    security = {"added": capped(sorted(findings_after - findings_before)),
+                "resolved": capped(sorted(findings_before - findings_after))}
+    
+    page = {
+        field: {"from": previous_info.get(field), "to": current_info.get(field)}
+        for field in ("title", "status")
+        if previous_info.get(field) != current_info.get(field)
+    }
+    
+    diff = {
+        "base_id": previous["id"],
+        "base_timestamp": previous["timestamp"].isoformat() if isinstance(previous.get("timestamp"), datetime) else previous.get("timestamp"),
+        "endpoints": diff_endpoints(previous.get("api_map", []), current.get("api_map", [])),
+        "tech_stack": tech,
+        "headers": headers,
+        "security": security,
+        "page": page
+    }
+    diff["changed"] = bool(page) or any(
+        value for section in ("endpoints", "tech_stack", "headers", "security") for value in diff[section].values()
+    )
+    return diff
+
+# Fields of the previous analysis a diff or incremental report needs
+PREVIOUS_ANALYSIS_PROJECTION = {
+    "_id": 0, "id": 1, "timestamp": 1, "tech_stack": 1, "api_map": 1, "ai_analysis": 1, "ai_report": 1,
+    "incremental.llm": 1,
+    "page_info.title": 1, "page_info.status": 1, "page_info.fingerprints": 1,
+    "page_info.security_findings": 1, "page_info.response_headers": 1
+}
+
+async def load_previous_analysis(url: str) -> Optional[Dict[str, Any]]:
+    return await db.analyses.find_one({"url": url}, PREVIOUS_ANALYSIS_PROJECTION, sort=[("timestamp", -1), ("id", -1)])
+
+def full_report(analysis: Dict[str, Any]) -> Optional[str]:
+    """The last complete AI report behind an analysis, if it has a usable one"""
+    if (analysis.get("incremental") or {}).get("llm") == "failed":
+        return None
+    report = analysis.get("ai_report") or analysis.get("ai_analysis")
+    if not report or report.startswith("AI analysis failed"):
+        return None
+    return report
+
+ANALYSIS_CHANGES_PROMPT_TEMPLATE = """The website {target_url} was analyzed on {previous_date}. A new capture differs from that analysis as follows (compact JSON; endpoints are "METHOD template", id-like path segments shown as :id or :param):
+{diff}
+
+Beginning of the previous report, for context:
+{previous_report}
+
+Write a concise change report in markdown covering:
+1. **What Changed**: New, removed and modified endpoints, technologies and headers
+2. **Security Impact**: Findings that appeared or were resolved and what they mean
+3. **Architecture & Integration Impact**: What the changes suggest about the application
+4. **Follow-up**: What to verify next
+
+Only discuss the changes; do not repeat the previous report.
+"""
+
+async def analyze_changes_with_ai(api_key: str, diff: Dict[str, Any], previous_report: str, target_url: str,
+                                  use_cache: bool = True, on_delta=None,
+                                  prompt_stats: Optional[Dict[str, Any]] = None) -> str:
+    """Report on what changed since the previous analysis instead of re-analyzing everything"""
+    try:
+        changes = {key: value for key, value in diff.items() if key not in ("base_id", "base_timestamp", "changed")}
+        cache_key = ai_cache.make_key("changes", {"url": strip_query(target_url), "diff": changes})
+        if use_cache:
+            cached = await ai_cache.get(cache_key)
+            if cached is not None:
+                if on_delta:
+                    on_delta(cached)
+                return cached
+        else:
+            ai_cache.record_bypass()
+        
+        prompt = ANALYSIS_CHANGES_PROMPT_TEMPLATE.format(
+            target_url=target_url,
+            previous_date=diff.get("base_timestamp") or "an earlier date",
+            diff=prompt_budgeter.dumps(changes),
+            previous_report=previous_report[:AI_CHANGES_CONTEXT_CHARS]
+        )
+        if prompt_stats is not None:
+            prompt_stats.update({"mode": "changes", "prompt_tokens": prompt_budgeter.estimate_tokens(prompt)})
+        
+        messages = [{"role": "user", "content": prompt}]
+        if on_delta:
+            report = await llm_client.stream(api_key, messages, on_delta, max_tokens=1000, temperature=0.5)
+        else:
+            report = await llm_client.complete(api_key, messages, max_tokens=1000, temperature=0.5)
+        await ai_cache.set(cache_key, "changes", report, AI_CACHE_TTL_ANALYSIS)
+        return report
+    
+    except Exception as e:
+        logger.error(f"AI change analysis failed: {e}")
+        return f"AI change analysis failed: {str(e)}."
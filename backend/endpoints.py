@@ -0,0 +1,39 @@
+"""URL helpers: classifying captured requests as API calls and grouping them by path template or site"""
+
+import re
+from urllib.parse import urlparse
+
+ID_SEGMENT_PATTERN = re.compile(r"\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{24,}")
+
+def path_template(url: str) -> str:
+    """Host and path of a URL with id-like path segments collapsed"""
+    parsed = urlparse(url or "")
+    segments = [
+        ":id" if ID_SEGMENT_PATTERN.fullmatch(segment) else segment
+        for segment in parsed.path.split("/")
+    ]
+    return f"{parsed.netloc}{'/'.join(segments) or '/'}"
+
+def endpoint_key(method: str, url: str) -> str:
+    """Group requests by method, host and path, with id-like path segments collapsed"""
+    return f"{(method or 'GET').upper()} {path_template(url)}"
+
+API_INDICATORS = ['/api/', '/v1/', '/v2/', '.json', '/graphql', '/rest/']
+
+API_RESOURCE_TYPES = frozenset({"xhr", "fetch", "eventsource", "websocket"})
+
+def is_api_request(url: str, resource_type: str, content_type: str) -> bool:
+    """Whether a request looks like an API call rather than a page asset"""
+    return (
+        resource_type in API_RESOURCE_TYPES
+        or "json" in content_type
+        or any(indicator in url.lower() for indicator in API_INDICATORS)
+    )
+
+def site_domain(host: str) -> str:
+    """Last two host labels, a cheap stand-in for the registrable domain"""
+    return ".".join(host.lower().split(".")[-2:])
+
+def strip_query(url: str) -> str:
+    """Drop query string and fragment so cache-busting parameters don't change keys"""
+    return url.split("#", 1)[0].split("?", 1)[0]
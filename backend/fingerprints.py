@@ -0,0 +1,338 @@
+"""Signature-driven technology fingerprinting over a page's scripts, globals, DOM, meta tags and headers"""
+
+from typing import List, Dict, Any
+import json
+import re
+import logging
+
+from config import FINGERPRINTS_PATH
+
+logger = logging.getLogger(__name__)
+
+def required_literals(pattern: str) -> List[str]:
+    """Lowercased literal runs that every match of a regex must contain.
+
+    Only runs outside groups count, and a top-level alternation means there are none.
+    """
+    runs = []
+    current = ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        literal = None
+        if char == "\\":
+            escaped = pattern[i + 1:i + 2]
+            i += 2
+            if escaped and not escaped.isalnum():
+                literal = escaped
+        elif char == "[":
+            # Character classes match one of several characters; skip to the closing bracket
+            i += 2 if pattern[i + 1:i + 2] == "]" else 1
+            while i < len(pattern) and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+        elif char == "(":
+            depth += 1
+            i += 1
+            if pattern[i:i + 1] == "?":
+                # Group modifiers: (?:, (?=, (?!, (?<=, (?<!, (?P<name>
+                i = pattern.index(">", i) + 1 if pattern[i + 1:i + 2] == "P" else i + (3 if pattern[i + 1:i + 2] == "<" else 2)
+        elif char == ")":
+            depth -= 1
+            i += 1
+        elif char == "|":
+            if depth == 0:
+                return []
+            i += 1
+        elif char in "?*+{":
+            # The previous character may be absent or repeated, so it ends the run
+            if char != "+":
+                current = current[:-1]
+            if char == "{":
+                i = pattern.find("}", i) + 1 or len(pattern)
+            else:
+                i += 1
+        elif char in ".^$":
+            i += 1
+        else:
+            literal = char
+            i += 1
+        
+        if literal is not None and depth == 0:
+            current += literal.lower()
+        elif current:
+            runs.append(current)
+            current = ""
+    if current:
+        runs.append(current)
+    return runs
+
+class FingerprintEngine:
+    """Data-driven technology detection from a signature database.
+
+    Signatures are compiled once into lookup tables. Headers, cookies, meta tags and
+    globals are keyed by name, so an input only ever meets the patterns registered for
+    it; script URL patterns are indexed by their rarest required trigram and only the
+    candidates an URL's trigrams select are run. In the page, globals are found by
+    walking the page's own properties against the set of signature roots, and DOM
+    markers by one combined selector query, so the page is traversed once for each
+    however many signatures the database holds; only the elements that query returns
+    are checked against the individual selectors.
+    """
+    
+    KINDS = ("globals", "scripts", "meta", "headers", "cookies", "dom")
+    
+    def __init__(self, signatures: Dict[str, Dict[str, Any]]):
+        self.technologies: Dict[str, Dict[str, Any]] = {}
+        self.globals: Dict[str, List[tuple]] = {}
+        self.meta: Dict[str, List[tuple]] = {}
+        self.headers: Dict[str, List[tuple]] = {}
+        self.cookies: Dict[str, List[tuple]] = {}
+        self.dom: Dict[str, List[str]] = {}
+        self.dom_attributes: Dict[str, str] = {}
+        self.scripts: List[tuple] = []
+        self.script_index: Dict[str, List[int]] = {}
+        self.unindexed_scripts: List[int] = []
+        
+        for name, signature in signatures.items():
+            self.technologies[name] = {
+                "categories": signature.get("categories", []),
+                "implies": signature.get("implies", [])
+            }
+            for path, pattern in signature.get("globals", {}).items():
+                self._add(self.globals, path, name, pattern)
+            for meta_name, pattern in signature.get("meta", {}).items():
+                self._add(self.meta, meta_name.lower(), name, pattern)
+            for header, pattern in signature.get("headers", {}).items():
+                self._add(self.headers, header.lower(), name, pattern)
+            for cookie, pattern in signature.get("cookies", {}).items():
+                self._add(self.cookies, cookie, name, pattern)
+            dom = signature.get("dom", [])
+            for selector in dom:
+                self.dom.setdefault(selector, []).append(name)
+                if isinstance(dom, dict) and dom[selector]:
+                    self.dom_attributes[selector] = dom[selector]
+            for pattern in signature.get("scripts", []):
+                compiled = self._compile(name, pattern)
+                if compiled:
+                    self.scripts.append((name, compiled))
+        self._index_scripts()
+        
+        # Sent to the page on every capture: global roots to look for and DOM markers
+        roots: Dict[str, List[str]] = {}
+        for path in self.globals:
+            roots.setdefault(path.split(".", 1)[0], []).append(path)
+        self.probe_args = {
+            "globals": roots,
+            "dom": {selector: self.dom_attributes.get(selector, "") for selector in self.dom}
+        }
+    
+    @classmethod
+    def from_file(cls, path: str) -> "FingerprintEngine":
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                signatures = json.load(handle)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load fingerprints from {path}: {e}")
+            signatures = {}
+        engine = cls(signatures)
+        logger.info(f"Loaded {len(engine.technologies)} technology fingerprints")
+        return engine
+    
+    @staticmethod
+    def _compile(name: str, pattern: str):
+        try:
+            return re.compile(pattern, re.IGNORECASE)
+        except re.error as e:
+            logger.warning(f"Skipping invalid fingerprint pattern for {name}: {pattern!r} ({e})")
+            return None
+    
+    def _add(self, table: Dict[str, List[tuple]], key: str, name: str, pattern: str):
+        # An empty pattern means presence alone is enough
+        compiled = self._compile(name, pattern) if pattern else None
+        if compiled or not pattern:
+            table.setdefault(key, []).append((name, compiled))
+    
+    def _index_scripts(self):
+        """Index each script pattern under its least common required trigram"""
+        candidates = []
+        frequency: Dict[str, int] = {}
+        for _, compiled in self.scripts:
+            trigrams = {
+                run[i:i + 3]
+                for run in required_literals(compiled.pattern)
+                for i in range(len(run) - 2)
+            }
+            candidates.append(trigrams)
+            for trigram in trigrams:
+                frequency[trigram] = frequency.get(trigram, 0) + 1
+        for index, trigrams in enumerate(candidates):
+            if trigrams:
+                rarest = min(trigrams, key=lambda trigram: (frequency[trigram], trigram))
+                self.script_index.setdefault(rarest, []).append(index)
+            else:
+                self.unindexed_scripts.append(index)
+    
+    def script_candidates(self, url: str) -> List[int]:
+        lowered = url.lower()
+        found = set(self.unindexed_scripts)
+        for trigram in {lowered[i:i + 3] for i in range(len(lowered) - 2)}:
+            found.update(self.script_index.get(trigram, ()))
+        return sorted(found)
+    
+    def match(self, facts: Dict[str, Any], headers: List[Dict[str, str]], cookies: Dict[str, str],
+              script_urls: List[str] = ()) -> List[Dict[str, Any]]:
+        """Detections from in-page facts plus captured headers, cookies and script URLs"""
+        detections: Dict[str, Dict[str, Any]] = {}
+        
+        def check(entries, value: str, evidence: str) -> bool:
+            matched = False
+            for name, compiled in entries:
+                version = None
+                if compiled is not None:
+                    found = compiled.search(value)
+                    if not found:
+                        continue
+                    version = found.group(1) if compiled.groups else None
+                detection = detections.setdefault(name, {"name": name, "version": None, "evidence": []})
+                detection["version"] = detection["version"] or version
+                if evidence not in detection["evidence"]:
+                    detection["evidence"].append(evidence)
+                matched = True
+            return matched
+        
+        for path, value in facts.get("globals", {}).items():
+            check(self.globals.get(path, ()), value, "global")
+        for selector, value in facts.get("dom", {}).items():
+            for name in self.dom.get(selector, ()):
+                check([(name, None)], "", "dom")
+                if selector in self.dom_attributes and value:
+                    detections[name]["version"] = detections[name]["version"] or value
+        generator_matched = False
+        for meta_name, content in facts.get("meta", {}).items():
+            matched = check(self.meta.get(meta_name, ()), content, "meta")
+            generator_matched = generator_matched or (meta_name == "generator" and matched)
+        for url in dict.fromkeys([*facts.get("scripts", []), *script_urls]):
+            check([self.scripts[index] for index in self.script_candidates(url)], url, "script")
+        for header_set in headers:
+            for header, value in header_set.items():
+                check(self.headers.get(header.lower(), ()), value, "header")
+        for cookie, value in cookies.items():
+            check(self.cookies.get(cookie, ()), value, "cookie")
+        
+        # Unknown generators are still worth reporting as-is
+        generator = facts.get("meta", {}).get("generator")
+        if generator and not generator_matched:
+            detections.setdefault(generator, {"name": generator, "version": None, "evidence": ["meta"]})
+        
+        pending = list(detections)
+        while pending:
+            source = pending.pop()
+            for implied in self.technologies.get(source, {}).get("implies", []):
+                if implied not in detections:
+                    detections[implied] = {"name": implied, "version": None, "evidence": [f"implied by {source}"]}
+                    pending.append(implied)
+        
+        for detection in detections.values():
+            detection["categories"] = self.technologies.get(detection["name"], {}).get("categories", [])
+        return sorted(detections.values(), key=lambda detection: detection["name"].lower())
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "technologies": len(self.technologies),
+            "script_patterns": len(self.scripts),
+            "unindexed_script_patterns": len(self.unindexed_scripts),
+            "globals": len(self.globals),
+            "headers": len(self.headers),
+            "dom_selectors": len(self.dom)
+        }
+
+def fingerprint_label(detection: Dict[str, Any]) -> str:
+    return f"{detection['name']} {detection['version']}" if detection.get("version") else detection["name"]
+
+# One in-page pass collecting everything the fingerprints can match against
+FINGERPRINT_PROBE = """
+    ({globals, dom}) => {
+        const found = {};
+        // Walk the page's own globals rather than the signature list
+        for (const root of Object.getOwnPropertyNames(window)) {
+            if (!Object.prototype.hasOwnProperty.call(globals, root)) continue;
+            for (const path of globals[root]) {
+                let value = window;
+                try {
+                    for (const key of path.split('.')) {
+                        if (value === undefined || value === null) break;
+                        value = value[key];
+                    }
+                } catch (e) {
+                    value = undefined;
+                }
+                if (value !== undefined && value !== null) {
+                    found[path] = (typeof value === 'string' || typeof value === 'number') ? String(value) : '';
+                }
+            }
+        }
+        
+        const markers = {};
+        const mark = (selector, element) => {
+            const attribute = dom[selector];
+            markers[selector] = attribute ? (element.getAttribute(attribute) || '') : '';
+        };
+        const selectors = Object.keys(dom);
+        let matched = null;
+        try {
+            // One traversal for every selector; elements come back in document order
+            matched = selectors.length ? document.querySelectorAll(selectors.join(',')) : [];
+        } catch (e) {
+            // An invalid selector in the database spoils the combined query
+        }
+        if (matched) {
+            for (const element of matched) {
+                for (const selector of selectors) {
+                    if (!(selector in markers) && element.matches(selector)) mark(selector, element);
+                }
+            }
+        } else {
+            for (const selector of selectors) {
+                try {
+                    const element = document.querySelector(selector);
+                    if (element) mark(selector, element);
+                } catch (e) {
+                    // Invalid selector in the database
+                }
+            }
+        }
+        
+        const meta = {};
+        for (const element of document.querySelectorAll('meta[name], meta[property]')) {
+            const name = (element.getAttribute('name') || element.getAttribute('property')).toLowerCase();
+            if (!(name in meta)) meta[name] = element.getAttribute('content') || '';
+        }
+        
+        return {
+            globals: found,
+            dom: markers,
+            meta: meta,
+            scripts: Array.from(document.scripts, script => script.src).filter(Boolean)
+        };
+    }
+"""
+
+fingerprint_engine = FingerprintEngine.from_file(FINGERPRINTS_PATH)
+
+async def analyze_tech_stack(page, response=None, script_urls: List[str] = ()) -> List[Dict[str, Any]]:
+    """Fingerprint the technologies used by the website.
+
+    One evaluate call collects the page's globals, DOM markers, meta tags and scripts;
+    the document's response headers, cookies and captured script URLs are matched in
+    the same pass.
+    """
+    try:
+        facts = await page.evaluate(FINGERPRINT_PROBE, fingerprint_engine.probe_args)
+        headers = [await response.all_headers()] if response else []
+        cookies = {cookie["name"]: cookie["value"] for cookie in await page.context.cookies()}
+        return fingerprint_engine.match(facts, headers, cookies, script_urls)
+    except Exception as e:
+        logger.warning(f"Failed to analyze tech stack: {e}")
+        return []
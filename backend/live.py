@@ -0,0 +1,1195 @@
+"""Live-session monitoring: ingestion, streaming statistics, buffered storage and anomaly-driven insights"""
+
+from typing import List, Dict, Any, Optional
+import sys
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timedelta
+import uuid
+import asyncio
+import json
+import time
+import heapq
+import math
+from collections import OrderedDict, deque
+import logging
+
+from config import (
+    AI_CACHE_TTL_INSIGHT, LIVE_ANOMALY_ERROR_RATE, LIVE_ANOMALY_LATENCY_FACTOR,
+    LIVE_ANOMALY_LATENCY_MIN_MS, LIVE_ANOMALY_LATENCY_MIN_SAMPLES, LIVE_ANOMALY_MIN_REQUESTS,
+    LIVE_BUCKET_SIZE, LIVE_BUFFER_MAX_PENDING, LIVE_FLUSH_INTERVAL, LIVE_FLUSH_MAX_ATTEMPTS,
+    LIVE_FLUSH_MAX_EVENTS, LIVE_INSIGHT_COOLDOWN, LIVE_INSIGHT_DEBOUNCE, LIVE_INSIGHT_HISTORY,
+    LIVE_INSIGHT_MIN_INTERVAL, LIVE_RECENT_EVENTS, LIVE_SESSION_EVENTS, LIVE_SESSION_IDLE_TTL,
+    LIVE_SESSION_MAX, LIVE_SESSION_SWEEP_INTERVAL, LIVE_STATS_MAX_ENDPOINTS, LIVE_STATS_PERSIST_INTERVAL,
+    LIVE_STATS_SLOW_MS, LIVE_STATS_TOP_SLOW
+)
+from database import db
+from endpoints import endpoint_key
+from backplane import broadcast_hub
+from llm import ai_cache, llm_client, normalize_events_summary
+
+logger = logging.getLogger(__name__)
+
+async def ingest_live_events(session_id: str, url: str, hostname: str, events: List[Dict[str, Any]],
+                             api_key: Optional[str] = None):
+    """Record events for a live session and queue them for the database"""
+    session = live_session_store.touch(session_id, url, hostname)
+    if api_key:
+        # Kept in memory only, like the analysis job keys
+        session.api_key = api_key
+    await live_session_store.load_aggregate(session)
+    live_session_store.add_events(session, events)
+    live_event_buffer.add(session, url, hostname, events)
+    live_insight_trigger.notify(session)
+
+class LatencySketch:
+    """Log-bucketed latency histogram (HDR/DDSketch style).
+
+    Bucket bounds grow by a constant factor, so every quantile is within ``ACCURACY`` of
+    the true value, size depends on the latency range rather than the sample count, and
+    two sketches merge by adding their bucket counts.
+    """
+
+    ACCURACY = 0.02
+    _LOG_GAMMA = math.log((1 + ACCURACY) / (1 - ACCURACY))
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value: float):
+        # Everything at or below 1ms shares bucket 0
+        index = max(0, math.ceil(math.log(value) / self._LOG_GAMMA)) if value > 1 else 0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                if index == 0:
+                    return 1.0
+                # Midpoint of the bucket (gamma^(i-1), gamma^i], never above the true max
+                return min(round(2 * math.exp(index * self._LOG_GAMMA) / (1 + math.exp(self._LOG_GAMMA)), 1), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": round(self.max, 1) if self.count else None
+        }
+
+    def state(self) -> Dict[str, Any]:
+        return {"buckets": sorted(self.buckets.items()), "count": self.count, "total": self.total, "max": self.max}
+
+    def merge_state(self, state: Dict[str, Any]):
+        for index, count in state.get("buckets", []):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += state.get("count", 0)
+        self.total += state.get("total", 0.0)
+        self.max = max(self.max, state.get("max", 0.0))
+
+# Event types the extension sends; anything else is counted as "other"
+LIVE_EVENT_TYPES = frozenset({"network", "console", "error", "promise_rejection", "performance"})
+
+def live_event_type(event: Dict[str, Any]) -> str:
+    """The event's type, limited to known types since it becomes a Mongo field name"""
+    event_type = event.get("type")
+    if event_type is None:
+        return "unknown"
+    return event_type if isinstance(event_type, str) and event_type in LIVE_EVENT_TYPES else "other"
+
+class SessionAggregator:
+    """Streaming statistics for one live session, updated as events are ingested.
+
+    Reading them costs the same however long the session runs: totals, status-code
+    histograms and per-endpoint latency sketches are counters, rolling error rates come
+    from a ring of ``WINDOW_SLOT``-second slots, and only the slowest ``top_slow``
+    requests are kept. ``state()`` is persisted with the session, one snapshot per worker,
+    and merges back in when the session is re-created in memory; readers add up the
+    snapshots of every worker. Anomaly detection only sees the events of its own worker.
+
+    With ``anomaly_rules`` set, the same per-request update also detects error spikes,
+    latency regressions (a fast latency EWMA pulling away from a slow baseline EWMA) and
+    endpoints failing for the first time; each is reported once when it starts and
+    queued for ``drain_anomalies()``.
+    """
+
+    WINDOW_SLOT = 10
+    WINDOW_SLOTS = 30  # five minutes
+    SPIKE_WINDOW = 60
+    OTHER_ENDPOINT = "(other)"
+    FAST_EWMA = 0.2
+    SLOW_EWMA = 0.02
+
+    __slots__ = ("max_endpoints", "top_slow", "slow_ms", "anomaly_rules", "total_events", "event_types",
+                 "requests", "failed_requests", "status_codes", "endpoints", "slow",
+                 "slow_seq", "recent_errors", "window", "ready", "loading", "persisted_at",
+                 "anomalies", "spiking", "regressed")
+
+    def __init__(self, max_endpoints: int, top_slow: int, slow_ms: int,
+                 anomaly_rules: Optional[Dict[str, float]] = None):
+        self.max_endpoints = max_endpoints
+        self.top_slow = top_slow
+        self.slow_ms = slow_ms
+        self.anomaly_rules = anomaly_rules
+        self.total_events = 0
+        self.event_types: Dict[str, int] = {}
+        self.requests = 0
+        self.failed_requests = 0
+        self.status_codes: Dict[str, int] = {}
+        # endpoint key -> [requests, errors, LatencySketch, fast EWMA, slow EWMA]
+        self.endpoints: Dict[str, list] = {}
+        # Min-heap of (duration, tie-breaker, request) holding the slowest requests
+        self.slow: List[tuple] = []
+        self.slow_seq = 0
+        self.recent_errors = deque(maxlen=10)
+        # [slot number, requests, failed requests] per WINDOW_SLOT seconds
+        self.window = [[-1, 0, 0] for _ in range(self.WINDOW_SLOTS)]
+        # Whether the persisted state has been merged in; nothing is written back until then
+        self.ready = False
+        self.loading = False
+        self.persisted_at = 0.0
+        self.anomalies = deque(maxlen=50)
+        self.spiking = False
+        self.regressed: set = set()
+
+    def add(self, event: Dict[str, Any], now: Optional[float] = None):
+        event_type = live_event_type(event)
+        self.total_events += 1
+        self.event_types[event_type] = self.event_types.get(event_type, 0) + 1
+
+        if event_type == "network":
+            self._add_request(event, now if now is not None else time.time())
+        elif event_type in ("error", "promise_rejection"):
+            self.recent_errors.append({
+                "message": event.get("message", ""),
+                "timestamp": event.get("timestamp")
+            })
+
+    def _add_request(self, event: Dict[str, Any], now: float):
+        try:
+            status = int(event.get("status") or 0)
+        except (TypeError, ValueError):
+            status = 0
+        # Status 0 means the request never got a response
+        failed = status == 0 or status >= 400
+        self.requests += 1
+        self.failed_requests += failed
+        self.status_codes[str(status)] = self.status_codes.get(str(status), 0) + 1
+
+        key = endpoint_key(event.get("method"), event.get("url"))
+        key, endpoint = self._endpoint(key)
+        endpoint[0] += 1
+        endpoint[1] += failed
+
+        duration = event.get("duration")
+        if isinstance(duration, (int, float)) and duration >= 0:
+            endpoint[2].add(duration)
+            if endpoint[3] is None:
+                endpoint[3] = endpoint[4] = float(duration)
+            else:
+                endpoint[3] += self.FAST_EWMA * (duration - endpoint[3])
+                endpoint[4] += self.SLOW_EWMA * (duration - endpoint[4])
+            if duration >= self.slow_ms:
+                self._add_slow(duration, {
+                    "url": event.get("url"),
+                    "method": event.get("method"),
+                    "status": status,
+                    "duration": duration,
+                    "timestamp": event.get("timestamp")
+                })
+
+        slot_number = int(now // self.WINDOW_SLOT)
+        slot = self.window[slot_number % self.WINDOW_SLOTS]
+        if slot[0] != slot_number:
+            slot[:] = [slot_number, 0, 0]
+        slot[1] += 1
+        slot[2] += failed
+
+        if failed:
+            self.recent_errors.append({
+                "message": f"HTTP {status} on {event.get('url')}",
+                "timestamp": event.get("timestamp")
+            })
+
+        if self.anomaly_rules:
+            self._detect(key, endpoint, failed, status, now, event.get("timestamp"))
+
+    def _endpoint(self, key: str) -> tuple:
+        endpoint = self.endpoints.get(key)
+        if endpoint is None:
+            if len(self.endpoints) >= self.max_endpoints:
+                key = self.OTHER_ENDPOINT
+                endpoint = self.endpoints.get(key)
+            if endpoint is None:
+                endpoint = self.endpoints[key] = [0, 0, LatencySketch(), None, None]
+        return key, endpoint
+
+    def _detect(self, key: str, endpoint: list, failed: bool, status: int, now: float, timestamp: Any):
+        rules = self.anomaly_rules
+        if failed and endpoint[1] == 1 and key != self.OTHER_ENDPOINT:
+            self.anomalies.append({
+                "kind": "new_failing_endpoint",
+                "endpoint": key,
+                "status": status,
+                "timestamp": timestamp
+            })
+
+        requests, failures = self._window_counts(self.SPIKE_WINDOW, now)
+        rate = failures / requests if requests else 0.0
+        if not self.spiking and requests >= rules["min_requests"] and rate >= rules["error_rate"]:
+            self.spiking = True
+            self.anomalies.append({
+                "kind": "error_spike",
+                "error_rate": round(rate, 4),
+                "requests": requests,
+                "window_seconds": self.SPIKE_WINDOW,
+                "timestamp": timestamp
+            })
+        elif self.spiking and rate < rules["error_rate"] / 2:
+            # Hysteresis, so a rate hovering at the threshold is one spike rather than many
+            self.spiking = False
+
+        fast, slow = endpoint[3], endpoint[4]
+        if fast is None or endpoint[2].count < rules["latency_min_samples"]:
+            return
+        if key not in self.regressed:
+            if fast >= slow * rules["latency_factor"] and fast - slow >= rules["latency_min_ms"]:
+                self.regressed.add(key)
+                self.anomalies.append({
+                    "kind": "latency_regression",
+                    "endpoint": key,
+                    "recent_ms": round(fast, 1),
+                    "baseline_ms": round(slow, 1),
+                    "timestamp": timestamp
+                })
+        elif fast <= slow * (1 + (rules["latency_factor"] - 1) / 4):
+            self.regressed.discard(key)
+
+    def drain_anomalies(self) -> List[Dict[str, Any]]:
+        anomalies = list(self.anomalies)
+        self.anomalies.clear()
+        return anomalies
+
+    def _add_slow(self, duration: float, request: Dict[str, Any]):
+        self.slow_seq += 1
+        if len(self.slow) < self.top_slow:
+            heapq.heappush(self.slow, (duration, self.slow_seq, request))
+        elif duration > self.slow[0][0]:
+            heapq.heapreplace(self.slow, (duration, self.slow_seq, request))
+
+    def _window_counts(self, seconds: int, now: Optional[float] = None) -> tuple:
+        current = int((now if now is not None else time.time()) // self.WINDOW_SLOT)
+        oldest = current - max(1, seconds // self.WINDOW_SLOT) + 1
+        requests = failed = 0
+        for slot_number, slot_requests, slot_failed in self.window:
+            if oldest <= slot_number <= current:
+                requests += slot_requests
+                failed += slot_failed
+        return requests, failed
+
+    def error_rate(self, seconds: int, now: Optional[float] = None) -> Optional[float]:
+        """Failed share of the requests seen in the last ``seconds`` seconds"""
+        requests, failed = self._window_counts(seconds, now)
+        return round(failed / requests, 4) if requests else None
+
+    def endpoint_stats(self) -> List[Dict[str, Any]]:
+        """Per-endpoint counts and latency percentiles, busiest first"""
+        return sorted(
+            (
+                {
+                    "endpoint": key,
+                    "requests": requests,
+                    "errors": errors,
+                    "error_rate": round(errors / requests, 4) if requests else None,
+                    "latency_ms": sketch.summary()
+                }
+                for key, (requests, errors, sketch, *_) in self.endpoints.items()
+            ),
+            key=lambda endpoint: endpoint["requests"],
+            reverse=True
+        )
+
+    def slow_requests(self) -> List[Dict[str, Any]]:
+        return [request for _, _, request in sorted(self.slow, reverse=True)]
+
+    def summary(self) -> Dict[str, Any]:
+        status_classes: Dict[str, int] = {}
+        for code, count in self.status_codes.items():
+            status_class = "failed" if code == "0" else f"{code[0]}xx"
+            status_classes[status_class] = status_classes.get(status_class, 0) + count
+        return {
+            "total_events": self.total_events,
+            "event_types": dict(self.event_types),
+            "requests": {
+                "total": self.requests,
+                "failed": self.failed_requests,
+                "error_rate": round(self.failed_requests / self.requests, 4) if self.requests else None,
+                "error_rate_1m": self.error_rate(60),
+                "error_rate_5m": self.error_rate(300)
+            },
+            "status_codes": dict(self.status_codes),
+            "status_classes": status_classes,
+            "endpoints": self.endpoint_stats(),
+            "slow_requests": self.slow_requests(),
+            "recent_errors": list(self.recent_errors)
+        }
+
+    def insight_summary(self, max_endpoints: int = 10) -> Dict[str, Any]:
+        """Compact summary for the AI insight prompt"""
+        endpoints = sorted(
+            self.endpoint_stats(),
+            key=lambda e: (e["errors"], e["latency_ms"]["p95"] or 0),
+            reverse=True
+        )[:max_endpoints]
+        summary = self.summary()
+        return {
+            "total_events": self.total_events,
+            "event_types": summary["event_types"],
+            "requests": summary["requests"],
+            "status_codes": summary["status_codes"],
+            "endpoints": [
+                {
+                    "endpoint": e["endpoint"],
+                    "requests": e["requests"],
+                    "errors": e["errors"],
+                    "p50_ms": e["latency_ms"]["p50"],
+                    "p95_ms": e["latency_ms"]["p95"]
+                }
+                for e in endpoints
+            ],
+            "errors": summary["recent_errors"],
+            "slow_requests": summary["slow_requests"]
+        }
+
+    def state(self) -> Dict[str, Any]:
+        """Mergeable snapshot for Mongo (lists instead of dicts keyed by URLs)"""
+        return {
+            "total_events": self.total_events,
+            "event_types": sorted(self.event_types.items()),
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "status_codes": sorted(self.status_codes.items()),
+            "endpoints": [
+                [key, requests, errors, sketch.state(), fast, slow]
+                for key, (requests, errors, sketch, fast, slow) in self.endpoints.items()
+            ],
+            "slow": [request for _, _, request in self.slow],
+            "recent_errors": list(self.recent_errors),
+            "window": [slot for slot in self.window if slot[0] >= 0]
+        }
+
+    def merge_state(self, state: Dict[str, Any]):
+        """Add a persisted snapshot into this aggregator"""
+        self.total_events += state.get("total_events", 0)
+        for event_type, count in state.get("event_types", []):
+            self.event_types[event_type] = self.event_types.get(event_type, 0) + count
+        self.requests += state.get("requests", 0)
+        self.failed_requests += state.get("failed_requests", 0)
+        for code, count in state.get("status_codes", []):
+            self.status_codes[code] = self.status_codes.get(code, 0) + count
+        for key, requests, errors, sketch_state, *ewma in state.get("endpoints", []):
+            _, endpoint = self._endpoint(key)
+            endpoint[0] += requests
+            endpoint[1] += errors
+            endpoint[2].merge_state(sketch_state)
+            if endpoint[3] is None and ewma and ewma[0] is not None:
+                endpoint[3], endpoint[4] = ewma
+        for request in state.get("slow", []):
+            self._add_slow(request.get("duration", 0), request)
+        # Older errors go first so the newest ones survive the deque limit
+        newer = list(self.recent_errors)
+        self.recent_errors.clear()
+        self.recent_errors.extend(state.get("recent_errors", []) + newer)
+        for slot_number, requests, failed in state.get("window", []):
+            slot = self.window[slot_number % self.WINDOW_SLOTS]
+            if slot[0] == slot_number:
+                slot[1] += requests
+                slot[2] += failed
+            elif slot[0] < slot_number:
+                slot[:] = [slot_number, requests, failed]
+
+LIVE_ANOMALY_RULES = {
+    "error_rate": LIVE_ANOMALY_ERROR_RATE,
+    "min_requests": LIVE_ANOMALY_MIN_REQUESTS,
+    "latency_factor": LIVE_ANOMALY_LATENCY_FACTOR,
+    "latency_min_ms": LIVE_ANOMALY_LATENCY_MIN_MS,
+    "latency_min_samples": LIVE_ANOMALY_LATENCY_MIN_SAMPLES
+}
+
+# Each worker persists the statistics of the events it ingested under its own key of the
+# session's ``aggregates``, so workers sharing a session never overwrite or re-count each other
+LIVE_WORKER_ID = uuid.uuid4().hex
+
+def merge_aggregates(aggregator: SessionAggregator, doc: Dict[str, Any], skip: Optional[str] = None):
+    """Add every worker's persisted statistics from a session document, except ``skip``'s"""
+    # Written before statistics were kept per worker
+    if doc.get("aggregate"):
+        aggregator.merge_state(doc["aggregate"])
+    for worker_id, state in (doc.get("aggregates") or {}).items():
+        if worker_id != skip:
+            aggregator.merge_state(state)
+
+def new_session_aggregator(detect_anomalies: bool = False) -> SessionAggregator:
+    return SessionAggregator(
+        max_endpoints=LIVE_STATS_MAX_ENDPOINTS,
+        top_slow=LIVE_STATS_TOP_SLOW,
+        slow_ms=LIVE_STATS_SLOW_MS,
+        anomaly_rules=LIVE_ANOMALY_RULES if detect_anomalies else None
+    )
+
+class LiveSessionState:
+    """Compact in-memory state for one live session.
+
+    Only a ring buffer of the most recent events is kept, each encoded as compact JSON
+    bytes; the full history lives in Mongo.
+    """
+
+    __slots__ = ("id", "session_id", "url", "hostname", "start_time", "last_seen",
+                 "event_count", "recent_events", "recent_bytes", "aggregator", "api_key", "insight")
+
+    def __init__(self, session_id: str, url: str, hostname: str, max_events: int):
+        self.id = str(uuid.uuid4())
+        self.session_id = session_id
+        self.url = url
+        self.hostname = hostname
+        self.start_time = datetime.utcnow()
+        self.last_seen = time.monotonic()
+        self.event_count = 0
+        self.recent_events = deque(maxlen=max_events)
+        self.recent_bytes = 0
+        self.aggregator = new_session_aggregator(detect_anomalies=True)
+        self.api_key: Optional[str] = None
+        # Per-session state of the insight trigger, created on the first anomaly
+        self.insight: Optional[Dict[str, Any]] = None
+
+def insight_channel(session_id: str) -> str:
+    return f"insights:{session_id}"
+
+def anomaly_key(anomaly: Dict[str, Any]) -> str:
+    """Anomalies with the same key are reported at most once per cooldown"""
+    return f"{anomaly['kind']}:{anomaly.get('endpoint', '')}"
+
+class LiveInsightTrigger:
+    """Turns anomalies detected during ingest into server-side AI insights.
+
+    Anomalies of the same kind on the same endpoint are reported at most once per
+    ``cooldown`` seconds. The first new anomaly opens a ``debounce`` window so a burst
+    becomes one insight, and a session gets at most one insight per ``min_interval``
+    seconds. The cooldowns and the time of the last insight live on the session document,
+    and a worker only generates an insight after claiming it there, so the limits hold
+    however many workers receive the session's events. Insights are pushed to websocket
+    clients as ``live_insight`` messages, both with the session's events and on its
+    ``insights:<sessionId>`` channel for clients that want nothing else, and the latest
+    ones are kept on the session document; without an API key for the session only the
+    anomalies are pushed.
+    """
+
+    MAX_PENDING = 20
+
+    def __init__(self, debounce: float, min_interval: float, cooldown: float, history: int):
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.cooldown = cooldown
+        self.history = history
+        self._tasks: set = set()
+        self._stats = {
+            "anomalies": 0,
+            "suppressed": 0,
+            "insights": 0,
+            "llm_calls": 0,
+            "insight_errors": 0
+        }
+
+    def notify(self, session: LiveSessionState):
+        anomalies = session.aggregator.drain_anomalies()
+        if not anomalies:
+            return
+        state = session.insight
+        if state is None:
+            state = session.insight = {"pending": [], "task": None}
+
+        for anomaly in anomalies:
+            self._stats["anomalies"] += 1
+            key = anomaly_key(anomaly)
+            if any(anomaly_key(pending) == key for pending in state["pending"]):
+                self._stats["suppressed"] += 1
+                continue
+            state["pending"] = (state["pending"] + [anomaly])[-self.MAX_PENDING:]
+
+        if state["pending"] and (state["task"] is None or state["task"].done()):
+            self._schedule(session, self.debounce)
+
+    def _schedule(self, session: LiveSessionState, delay: float):
+        state = session.insight
+        task = state["task"] = asyncio.create_task(self._emit_after(session, delay))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _claim(self, session: LiveSessionState, anomalies: List[Dict[str, Any]]) -> tuple:
+        """Claim the session's next insight for this worker through its session document.
+
+        Returns the anomalies still to report, outside their cooldown, and when to try
+        again if another worker holds the current ``min_interval`` (None otherwise).
+        """
+        await db.live_sessions.update_one(
+            {"sessionId": session.session_id},
+            # The buffered events may not have created the session document yet
+            {"$setOnInsert": {"id": session.id, "startTime": session.start_time}},
+            upsert=True
+        )
+        doc = await db.live_sessions.find_one(
+            {"sessionId": session.session_id}, {"lastInsightAt": 1, "insightReported": 1}
+        ) or {}
+        now = datetime.utcnow()
+        last_insight = doc.get("lastInsightAt")
+        if last_insight is not None and (now - last_insight).total_seconds() < self.min_interval:
+            return anomalies, self.min_interval - (now - last_insight).total_seconds()
+
+        cooldown_start = now - timedelta(seconds=self.cooldown)
+        reported = [[key, at] for key, at in doc.get("insightReported") or [] if at > cooldown_start]
+        keys = {key for key, _ in reported}
+        fresh = [anomaly for anomaly in anomalies if anomaly_key(anomaly) not in keys]
+        self._stats["suppressed"] += len(anomalies) - len(fresh)
+        if not fresh:
+            return [], None
+
+        # Only one worker moves lastInsightAt past the interval; the others retry later
+        claimed = await db.live_sessions.update_one(
+            {"sessionId": session.session_id, "lastInsightAt": last_insight},
+            {"$set": {
+                "lastInsightAt": now,
+                "insightReported": reported + [[anomaly_key(anomaly), now] for anomaly in fresh]
+            }}
+        )
+        if not claimed.modified_count:
+            return anomalies, self.min_interval
+        return fresh, None
+
+    async def _emit_after(self, session: LiveSessionState, delay: float):
+        await asyncio.sleep(delay)
+        state = session.insight
+        pending, state["pending"] = state["pending"], []
+        try:
+            anomalies, retry_after = await self._claim(session, pending)
+        except Exception as e:
+            logger.error(f"Failed to claim live insight for session {session.session_id}: {e}")
+            anomalies, retry_after = pending, self.min_interval
+        if retry_after is not None:
+            state["pending"] = (anomalies + state["pending"])[-self.MAX_PENDING:]
+            self._schedule(session, max(self.debounce, retry_after))
+            return
+        if not anomalies:
+            if state["pending"]:
+                self._schedule(session, self.debounce)
+            return
+
+        message = None
+        cached = False
+        if session.api_key:
+            try:
+                message, cached = await generate_insight(
+                    session.api_key,
+                    session.aggregator.insight_summary(),
+                    anomalies=anomalies
+                )
+                if not cached:
+                    self._stats["llm_calls"] += 1
+            except Exception as e:
+                self._stats["insight_errors"] += 1
+                logger.error(f"Live insight for session {session.session_id} failed: {e}")
+
+        insight = {
+            "anomalies": anomalies,
+            "message": message,
+            "cached": cached,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+        self._stats["insights"] += 1
+        message = {"type": "live_insight", "sessionId": session.session_id, **insight}
+        broadcast_hub.publish(message, session_id=session.session_id)
+        broadcast_hub.publish(message, session_id=insight_channel(session.session_id), subscribers_only=True)
+        try:
+            await db.live_sessions.update_one(
+                {"sessionId": session.session_id},
+                {"$push": {"insights": {"$each": [insight], "$slice": -self.history}}}
+            )
+        except Exception as e:
+            logger.error(f"Failed to store live insight for session {session.session_id}: {e}")
+
+        # Anomalies that arrived while this insight was being generated get the next one
+        if state["pending"]:
+            self._schedule(session, self.debounce)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "scheduled": len(self._tasks)}
+
+live_insight_trigger = LiveInsightTrigger(
+    debounce=LIVE_INSIGHT_DEBOUNCE,
+    min_interval=LIVE_INSIGHT_MIN_INTERVAL,
+    cooldown=LIVE_INSIGHT_COOLDOWN,
+    history=LIVE_INSIGHT_HISTORY
+)
+
+class LiveSessionStore:
+    """Bounded per-worker store of active live sessions.
+
+    Sessions idle for longer than ``idle_ttl`` seconds, or pushed out once more than
+    ``max_sessions`` are active, are evicted from memory. Whether a session has ended is
+    decided from ``lastUpdate`` in Mongo, which every worker writes, so a session that is
+    still receiving events on another worker stays active.
+    """
+
+    def __init__(self, max_sessions: int, events_per_session: int, idle_ttl: int, sweep_interval: int):
+        self.max_sessions = max_sessions
+        self.events_per_session = events_per_session
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._sessions: "OrderedDict[str, LiveSessionState]" = OrderedDict()
+        self._evicted: List[LiveSessionState] = []
+        self._task = None
+        self._stats = {
+            "sessions_created": 0,
+            "sessions_evicted": 0,
+            "sessions_ended": 0
+        }
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def get(self, session_id: str) -> Optional[LiveSessionState]:
+        return self._sessions.get(session_id)
+
+    def touch(self, session_id: str, url: str, hostname: str) -> LiveSessionState:
+        """Get or create a session and mark it as most recently used"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = LiveSessionState(
+                session_id, url, hostname, self.events_per_session
+            )
+            self._stats["sessions_created"] += 1
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._evicted.append(evicted)
+        else:
+            self._sessions.move_to_end(session_id)
+            session.url = url
+            session.hostname = hostname
+        session.last_seen = time.monotonic()
+        return session
+
+    async def load_aggregate(self, session: LiveSessionState):
+        """Merge the statistics this worker persisted for an earlier incarnation of the session"""
+        aggregator = session.aggregator
+        if aggregator.ready or aggregator.loading:
+            return
+        aggregator.loading = True
+        field = f"aggregates.{LIVE_WORKER_ID}"
+        try:
+            doc = await db.live_sessions.find_one({"sessionId": session.session_id}, {field: 1})
+            state = ((doc or {}).get("aggregates") or {}).get(LIVE_WORKER_ID)
+            if state:
+                aggregator.merge_state(state)
+        except Exception as e:
+            logger.warning(f"Failed to load statistics for live session {session.session_id}: {e}")
+        finally:
+            aggregator.loading = False
+            aggregator.ready = True
+
+    def add_events(self, session: LiveSessionState, events: List[Dict[str, Any]]):
+        now = time.time()
+        for event in events:
+            session.aggregator.add(event, now)
+            encoded = json.dumps(event, separators=(",", ":"), default=str).encode("utf-8")
+            if len(session.recent_events) == session.recent_events.maxlen:
+                session.recent_bytes -= len(session.recent_events[0])
+            session.recent_events.append(encoded)
+            session.recent_bytes += len(encoded)
+        session.event_count += len(events)
+
+    def recent_events(self, session_id: str) -> List[Dict[str, Any]]:
+        """Decode the ring buffer of a session, oldest first"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return []
+        return [json.loads(encoded) for encoded in session.recent_events]
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.error(f"Live session eviction failed: {e}")
+
+    async def evict_idle(self):
+        """Evict idle sessions and mark sessions idle on every worker as ended"""
+        cutoff = time.monotonic() - self.idle_ttl
+        # Sessions are kept in LRU order, so idle ones are at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_seen >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self._evicted.append(session)
+
+        evicted, self._evicted = self._evicted, []
+        self._stats["sessions_evicted"] += len(evicted)
+        # Flush first so a late buffered write doesn't flip the session back to active
+        await live_event_buffer.flush()
+        # Save the final statistics; the periodic write during the flush may be stale
+        final_stats = [
+            UpdateOne(
+                {"sessionId": session.session_id},
+                {"$set": {f"aggregates.{LIVE_WORKER_ID}": session.aggregator.state()}}
+            )
+            for session in evicted
+            if session.aggregator.ready and session.session_id not in self._sessions
+        ]
+        if final_stats:
+            await db.live_sessions.bulk_write(final_stats, ordered=False)
+        now = datetime.utcnow()
+        result = await db.live_sessions.update_many(
+            {"status": "active", "lastUpdate": {"$lt": now - timedelta(seconds=self.idle_ttl)}},
+            {"$set": {"status": "ended", "endTime": now}}
+        )
+        self._stats["sessions_ended"] += result.modified_count
+
+    def stats(self) -> Dict[str, Any]:
+        event_bytes = sum(session.recent_bytes for session in self._sessions.values())
+        buffered_events = sum(len(session.recent_events) for session in self._sessions.values())
+        return {
+            **self._stats,
+            "active_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "buffered_events": buffered_events,
+            "event_bytes": event_bytes,
+            "approx_memory_bytes": (
+                event_bytes
+                + len(self._sessions) * sys.getsizeof(LiveSessionState.__new__(LiveSessionState))
+                + buffered_events * sys.getsizeof(b"")
+            )
+        }
+
+live_session_store = LiveSessionStore(
+    max_sessions=LIVE_SESSION_MAX,
+    events_per_session=LIVE_SESSION_EVENTS,
+    idle_ttl=LIVE_SESSION_IDLE_TTL,
+    sweep_interval=LIVE_SESSION_SWEEP_INTERVAL
+)
+
+class LiveEventBuffer:
+    """Write-behind buffer that coalesces live-session events into bulk Mongo writes.
+
+    Events are stored in fixed-size buckets in ``live_session_events`` rather than one
+    ever-growing array. Each flush reserves a contiguous range of sequence numbers per
+    session with an atomic ``$inc`` on the session document, then appends the events to
+    bucket ``seq // bucket_size`` in a single ``bulk_write``. Flushes run every
+    ``flush_interval`` seconds or as soon as ``max_events`` are pending. Writes that keep
+    failing are dropped after ``max_attempts`` flushes.
+    """
+
+    def __init__(self, flush_interval: float, max_events: int, max_pending: int,
+                 bucket_size: int, recent_events: int, stats_persist_interval: float,
+                 max_attempts: int = 5):
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self.bucket_size = bucket_size
+        self.recent_events = recent_events
+        self.stats_persist_interval = stats_persist_interval
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._pending_count = 0
+        # Bucket writes that failed and are retried next flush
+        self._failed_ops: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._task = None
+        self._stats = {
+            "events_buffered": 0,
+            "events_written": 0,
+            "events_dropped": 0,
+            "flushes": 0,
+            "flush_errors": 0
+        }
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def add(self, session: "LiveSessionState", url: str, hostname: str, events: List[Dict[str, Any]]):
+        entry = self._pending.get(session.session_id)
+        if entry is None:
+            entry = self._pending[session.session_id] = {"events": []}
+        entry.update({
+            "id": session.id,
+            "aggregator": session.aggregator,
+            "url": url,
+            "hostname": hostname,
+            "startTime": session.start_time,
+            "lastUpdate": datetime.utcnow()
+        })
+        entry["events"].extend(events)
+        self._pending_count += len(events)
+        self._stats["events_buffered"] += len(events)
+        self._enforce_limit()
+
+        if self._pending_count >= self.max_events and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    def _enforce_limit(self):
+        """Drop the oldest pending events if the database can't keep up"""
+        while self._pending_count > self.max_pending:
+            entry = max(self._pending.values(), key=lambda e: len(e["events"]))
+            overflow = min(len(entry["events"]), self._pending_count - self.max_pending)
+            del entry["events"][:overflow]
+            self._pending_count -= overflow
+            self._stats["events_dropped"] += overflow
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Live event flush failed: {e}")
+
+    async def flush(self):
+        """Write every pending event to its session buckets"""
+        async with self._flush_lock:
+            operations, self._failed_ops = self._failed_ops, []
+            if self._pending:
+                pending, self._pending = self._pending, {}
+                self._pending_count = 0
+                results = await asyncio.gather(
+                    *[self._reserve(session_id, entry) for session_id, entry in pending.items()],
+                    return_exceptions=True
+                )
+                requeue = {}
+                for (session_id, entry), result in zip(pending.items(), results):
+                    if isinstance(result, Exception):
+                        logger.error(f"Failed to update live session {session_id}: {result}")
+                        requeue[session_id] = entry
+                    else:
+                        operations.extend(result)
+                if requeue:
+                    self._stats["flush_errors"] += 1
+                    self._requeue(requeue)
+
+            if operations:
+                await self._write_buckets(operations)
+
+    async def _reserve(self, session_id: str, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Update the session document and build bucket writes for its pending events"""
+        events = entry["events"]
+        type_counts: Dict[str, int] = {}
+        for event in events:
+            key = f"eventTypes.{live_event_type(event)}"
+            type_counts[key] = type_counts.get(key, 0) + 1
+
+        fields = {
+            "sessionId": session_id,
+            "url": entry["url"],
+            "hostname": entry["hostname"],
+            "status": "active",
+            "lastUpdate": entry["lastUpdate"]
+        }
+        aggregator = entry.get("aggregator")
+        if aggregator is not None and aggregator.ready:
+            now = time.monotonic()
+            if now - aggregator.persisted_at >= self.stats_persist_interval:
+                fields[f"aggregates.{LIVE_WORKER_ID}"] = aggregator.state()
+                aggregator.persisted_at = now
+
+        session = await db.live_sessions.find_one_and_update(
+            {"sessionId": session_id},
+            {
+                "$set": fields,
+                # Keep the original id and start time when a session is re-created in memory
+                # or first seen by another worker
+                "$setOnInsert": {"id": entry["id"], "startTime": entry["startTime"]},
+                "$unset": {"endTime": ""},
+                "$inc": {"eventCount": len(events), **type_counts},
+                "$push": {"recentEvents": {"$each": events, "$slice": -self.recent_events}}
+            },
+            projection={"eventCount": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        first_seq = session["eventCount"] - len(events)
+
+        buckets: Dict[int, List[Dict[str, Any]]] = {}
+        for offset, event in enumerate(events):
+            seq = first_seq + offset
+            buckets.setdefault(seq // self.bucket_size, []).append({**event, "seq": seq})
+
+        now = datetime.utcnow()
+        return [
+            {
+                # Only matches while the bucket lacks these events, so a retry of a write that
+                # was applied after all does nothing (and its upsert hits the unique index)
+                "op": UpdateOne(
+                    {"sessionId": session_id, "bucket": bucket, "events.seq": {"$ne": bucket_events[0]["seq"]}},
+                    {
+                        "$push": {"events": {"$each": bucket_events}},
+                        "$inc": {"count": len(bucket_events)},
+                        "$min": {"start_time": now},
+                        "$max": {"end_time": now}
+                    },
+                    upsert=True
+                ),
+                "session_id": session_id,
+                "bucket": bucket,
+                "first_seq": bucket_events[0]["seq"],
+                "count": len(bucket_events),
+                "attempts": 0
+            }
+            for bucket, bucket_events in buckets.items()
+        ]
+
+    async def _already_written(self, write: Dict[str, Any]) -> bool:
+        try:
+            return await db.live_session_events.find_one(
+                {"sessionId": write["session_id"], "bucket": write["bucket"], "events.seq": write["first_seq"]},
+                {"_id": 1}
+            ) is not None
+        except Exception:
+            return False
+
+    async def _write_buckets(self, writes: List[Dict[str, Any]]):
+        failed = []
+        try:
+            await db.live_session_events.bulk_write([write["op"] for write in writes], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                write = writes[error["index"]]
+                # A duplicate key means the bucket exists without matching the filter: either an
+                # earlier attempt got through, or another writer created the bucket concurrently
+                if error.get("code") == 11000 and await self._already_written(write):
+                    continue
+                failed.append(write)
+        except Exception as e:
+            # The writes may or may not have been applied; the retry skips those that were
+            logger.error(f"Failed to write live events: {e}")
+            failed = writes
+
+        self._stats["events_written"] += sum(write["count"] for write in writes) - sum(write["count"] for write in failed)
+        self._stats["flushes"] += 1
+        if failed:
+            # Sequence numbers are already assigned; retry the same bucket writes next flush
+            self._stats["flush_errors"] += 1
+            retry = []
+            for write in failed:
+                write["attempts"] += 1
+                if write["attempts"] >= self.max_attempts:
+                    logger.error(f"Dropping {write['count']} live events for session {write['session_id']} "
+                                 f"after {write['attempts']} failed bucket writes")
+                    self._stats["events_dropped"] += write["count"]
+                else:
+                    retry.append(write)
+            self._failed_ops = retry + self._failed_ops
+
+    def _requeue(self, pending: Dict[str, Dict[str, Any]]):
+        """Put a failed flush back in front of anything buffered since"""
+        for session_id, entry in pending.items():
+            entry["attempts"] = entry.get("attempts", 0) + 1
+            if entry["attempts"] >= self.max_attempts:
+                # Give up on these events; anything buffered since gets a fresh start
+                logger.error(f"Dropping {len(entry['events'])} live events for session {session_id} "
+                             f"after {entry['attempts']} failed flushes")
+                self._stats["events_dropped"] += len(entry["events"])
+                continue
+            newer = self._pending.get(session_id)
+            if newer:
+                entry["events"].extend(newer["events"])
+                entry.update({k: v for k, v in newer.items() if k != "events"})
+            self._pending[session_id] = entry
+        self._pending_count = sum(len(e["events"]) for e in self._pending.values())
+        self._enforce_limit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "pending_events": self._pending_count,
+            "pending_sessions": len(self._pending),
+            "retrying_bucket_writes": len(self._failed_ops)
+        }
+
+live_event_buffer = LiveEventBuffer(
+    flush_interval=LIVE_FLUSH_INTERVAL,
+    max_events=LIVE_FLUSH_MAX_EVENTS,
+    max_pending=LIVE_BUFFER_MAX_PENDING,
+    bucket_size=LIVE_BUCKET_SIZE,
+    recent_events=LIVE_RECENT_EVENTS,
+    stats_persist_interval=LIVE_STATS_PERSIST_INTERVAL,
+    max_attempts=LIVE_FLUSH_MAX_ATTEMPTS
+)
+
+async def load_session_events(session: Dict[str, Any], limit: int,
+                              before_seq: Optional[int] = None,
+                              after_seq: Optional[int] = None) -> Dict[str, Any]:
+    """Read one page of a session's events from its buckets.
+
+    Without a cursor the newest ``limit`` events are returned. ``before_seq`` pages
+    backwards and ``after_seq`` pages forwards. Only the buckets covering the requested
+    range are read, so cost does not depend on session length.
+    """
+    event_count = session.get("eventCount", 0)
+    if after_seq is not None:
+        lo_seq = max(0, after_seq + 1)
+        hi_seq = min(lo_seq + limit, event_count) - 1
+    else:
+        hi_seq = min(before_seq if before_seq is not None else event_count, event_count) - 1
+        lo_seq = max(0, hi_seq - limit + 1)
+
+    events = []
+    if hi_seq >= lo_seq:
+        bucket_size = live_event_buffer.bucket_size
+        buckets = await db.live_session_events.find(
+            {
+                "sessionId": session["sessionId"],
+                "bucket": {"$gte": lo_seq // bucket_size, "$lte": hi_seq // bucket_size}
+            },
+            {"events": 1}
+        ).to_list(None)
+        events = sorted(
+            (event for bucket in buckets for event in bucket["events"] if lo_seq <= event["seq"] <= hi_seq),
+            key=lambda event: event["seq"]
+        )
+
+    return {
+        "events": events,
+        "pagination": {
+            "limit": limit,
+            "eventCount": event_count,
+            "oldestSeq": lo_seq if hi_seq >= lo_seq else None,
+            "newestSeq": hi_seq if hi_seq >= lo_seq else None,
+            "hasOlder": hi_seq >= lo_seq and lo_seq > 0,
+            "hasNewer": hi_seq + 1 < event_count
+        }
+    }
+
+async def generate_insight(api_key: str, events_summary: Dict[str, Any],
+                           anomalies: Optional[List[Dict[str, Any]]] = None,
+                           bypass_cache: bool = False) -> tuple:
+    """Ask the LLM for a short live-monitoring insight; returns (message, cached)"""
+    cache_inputs = normalize_events_summary(events_summary)
+    if anomalies:
+        cache_inputs["anomalies"] = sorted({f"{a['kind']} {a.get('endpoint', '')}" for a in anomalies})
+    cache_key = ai_cache.make_key("insight", cache_inputs)
+    if not bypass_cache:
+        cached = await ai_cache.get(cache_key)
+        if cached is not None:
+            return cached, True
+    else:
+        ai_cache.record_bypass()
+
+    anomaly_section = ""
+    if anomalies:
+        anomaly_section = f"""
+These anomalies were just detected:
+
+{json.dumps(anomalies, indent=2)}
+
+Focus on them first.
+"""
+    insight_prompt = f"""
+You are a web development debugging assistant. Analyze these statistics from a live monitoring session:
+
+{json.dumps(events_summary, indent=2)}
+{anomaly_section}
+Provide a brief, actionable insight (max 100 words) focusing on:
+1. What might be wrong
+2. Quick debugging tip
+3. Potential impact
+
+Be concise and practical for a developer actively testing their application.
+"""
+
+    insight = await llm_client.complete(
+        api_key,
+        [{"role": "user", "content": insight_prompt}],
+        max_tokens=150,
+        temperature=0.7
+    )
+    await ai_cache.set(cache_key, "insight", insight, AI_CACHE_TTL_INSIGHT)
+    return insight, False
+
+async def load_session_aggregator(session_id: str) -> Optional[SessionAggregator]:
+    """Statistics for a session merged across workers, with this worker's share taken from memory"""
+    session = live_session_store.get(session_id)
+    local = session.aggregator if session is not None and session.aggregator.ready else None
+    doc = await db.live_sessions.find_one({"sessionId": session_id}, {"aggregate": 1, "aggregates": 1})
+    if doc is None and local is None:
+        return None
+    aggregator = new_session_aggregator()
+    merge_aggregates(aggregator, doc or {}, skip=LIVE_WORKER_ID if local is not None else None)
+    if local is not None:
+        aggregator.merge_state(local.state())
+    return aggregator
+
+def analyze_events_for_ai(events):
+    """Summarize a client-supplied window of events for sessions without server-side statistics"""
+    summary = {
+        "total_events": len(events),
+        "event_types": {},
+        "errors": [],
+        "slow_requests": [],
+        "recent_patterns": []
+    }
+    
+    for event in events[-10:]:  # Last 10 events
+        event_type = live_event_type(event)
+        summary["event_types"][event_type] = summary["event_types"].get(event_type, 0) + 1
+        
+        if event_type == "error":
+            summary["errors"].append({
+                "message": event.get("message", ""),
+                "timestamp": event.get("timestamp")
+            })
+        elif event_type == "network" and event.get("status", 0) >= 400:
+            summary["errors"].append({
+                "message": f"HTTP {event.get('status')} on {event.get('url')}",
+                "timestamp": event.get("timestamp")
+            })
+        elif event_type == "network" and event.get("duration", 0) > 3000:
+            summary["slow_requests"].append({
+                "url": event.get("url"),
+                "duration": event.get("duration"),
+                "timestamp": event.get("timestamp")
+            })
+    
+    return summary
@@ -0,0 +1,659 @@
+"""Non-blocking LLM client, AI response cache and prompt budgeting"""
+
+from typing import List, Dict, Any, Optional
+from abc import ABC, abstractmethod
+from datetime import datetime
+import asyncio
+import json
+import time
+import hashlib
+from openai import AsyncOpenAI
+import openai
+import httpx
+import random
+import math
+from collections import OrderedDict
+from urllib.parse import urlparse
+import logging
+
+from config import (
+    AI_CACHE_MAX_ENTRIES, AI_CACHE_TTL_ANALYSIS, AI_PROMPT_API_SHARE, AI_PROMPT_CONSOLE_SHARE,
+    AI_PROMPT_HEADER_VALUE_CHARS, AI_PROMPT_TOKEN_BUDGET, LLM_BASE_URL, LLM_MAX_CLIENTS,
+    LLM_MAX_CONCURRENCY, LLM_MAX_RETRIES, LLM_MODEL, LLM_TIMEOUT
+)
+from database import db
+from endpoints import API_INDICATORS, endpoint_key, strip_query
+
+logger = logging.getLogger(__name__)
+
+class LLMProvider(ABC):
+    """Interface for chat-completion backends used by the LLM client"""
+
+    @abstractmethod
+    async def complete(self, api_key: str, model: str, messages: List[Dict[str, str]],
+                       max_tokens: int, temperature: float) -> str:
+        """The whole completion as text"""
+
+    async def stream(self, api_key: str, model: str, messages: List[Dict[str, str]],
+                     max_tokens: int, temperature: float):
+        """Yield the completion in text chunks; providers without streaming yield it whole"""
+        yield await self.complete(api_key, model, messages, max_tokens, temperature)
+
+    async def close(self):
+        pass
+
+class OpenAICompatibleProvider(LLMProvider):
+    """Provider for OpenAI-compatible APIs such as OpenRouter.
+
+    Keeps one AsyncOpenAI client (and its HTTP connection pool) per API key, evicting
+    the least recently used client once ``max_clients`` is reached. Point ``base_url``
+    at a local server to swap in a fake OpenRouter.
+    """
+
+    def __init__(self, base_url: str, max_clients: int, max_connections: int):
+        self.base_url = base_url
+        self.max_clients = max_clients
+        self.max_connections = max_connections
+        self._clients: "OrderedDict[str, AsyncOpenAI]" = OrderedDict()
+
+    def _client_for(self, api_key: str) -> AsyncOpenAI:
+        client = self._clients.get(api_key)
+        if client is not None:
+            self._clients.move_to_end(api_key)
+            return client
+
+        client = AsyncOpenAI(
+            base_url=self.base_url,
+            api_key=api_key,
+            # Retries and timeouts are handled by LLMClient
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=None
+            )
+        )
+        self._clients[api_key] = client
+        while len(self._clients) > self.max_clients:
+            _, evicted = self._clients.popitem(last=False)
+            asyncio.create_task(evicted.close())
+        return client
+
+    async def complete(self, api_key: str, model: str, messages: List[Dict[str, str]],
+                       max_tokens: int, temperature: float) -> str:
+        response = await self._client_for(api_key).chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        return response.choices[0].message.content
+
+    async def stream(self, api_key: str, model: str, messages: List[Dict[str, str]],
+                     max_tokens: int, temperature: float):
+        response = await self._client_for(api_key).chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Release the connection if the consumer stops early
+            await response.response.aclose()
+
+    async def close(self):
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.close()
+
+# Errors worth retrying: transient network failures, rate limits and 5xx responses
+RETRYABLE_LLM_ERRORS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+class LLMClient:
+    """Shared async LLM client with a concurrency cap, timeouts and retries with backoff"""
+
+    def __init__(self, provider: LLMProvider, model: str, max_concurrency: int,
+                 timeout: float, max_retries: int):
+        self.provider = provider
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self._in_flight = 0
+        self._stats = {
+            "requests": 0,
+            "failures": 0,
+            "retries": 0,
+            "latency_ms_total": 0.0,
+            "streams": 0,
+            "first_token_ms_total": 0.0
+        }
+
+    def set_provider(self, provider: LLMProvider):
+        """Swap the backend, e.g. for a fake provider in tests"""
+        self.provider = provider
+
+    async def complete(self, api_key: str, messages: List[Dict[str, str]],
+                       max_tokens: int = 1000, temperature: float = 0.7) -> str:
+        """Run a chat completion without blocking the event loop"""
+        self._stats["requests"] += 1
+        attempt = 0
+        async with self._semaphore:
+            self._in_flight += 1
+            start = time.monotonic()
+            try:
+                while True:
+                    try:
+                        return await asyncio.wait_for(
+                            self.provider.complete(api_key, self.model, messages, max_tokens, temperature),
+                            timeout=self.timeout
+                        )
+                    except RETRYABLE_LLM_ERRORS as e:
+                        if attempt >= self.max_retries:
+                            raise
+                        attempt += 1
+                        self._stats["retries"] += 1
+                        backoff = min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+                        logger.warning(f"LLM request failed ({type(e).__name__}), retrying in {backoff:.1f}s")
+                        await asyncio.sleep(backoff)
+            except Exception:
+                self._stats["failures"] += 1
+                raise
+            finally:
+                self._in_flight -= 1
+                self._stats["latency_ms_total"] += (time.monotonic() - start) * 1000
+
+    async def stream(self, api_key: str, messages: List[Dict[str, str]], on_delta,
+                     max_tokens: int = 1000, temperature: float = 0.7) -> str:
+        """Like ``complete``, but passes each text chunk to ``on_delta`` as it arrives.
+
+        ``timeout`` applies to the wait for each chunk rather than the whole completion,
+        and failures are only retried before the first chunk so no text is sent twice.
+        """
+        self._stats["requests"] += 1
+        self._stats["streams"] += 1
+        attempt = 0
+        async with self._semaphore:
+            self._in_flight += 1
+            start = time.monotonic()
+            parts: List[str] = []
+            try:
+                while True:
+                    chunks = self.provider.stream(api_key, self.model, messages, max_tokens, temperature)
+                    try:
+                        while True:
+                            try:
+                                delta = await asyncio.wait_for(chunks.__anext__(), timeout=self.timeout)
+                            except StopAsyncIteration:
+                                return "".join(parts)
+                            if not parts:
+                                self._stats["first_token_ms_total"] += (time.monotonic() - start) * 1000
+                            parts.append(delta)
+                            on_delta(delta)
+                    except RETRYABLE_LLM_ERRORS as e:
+                        if parts or attempt >= self.max_retries:
+                            raise
+                        attempt += 1
+                        self._stats["retries"] += 1
+                        backoff = min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+                        logger.warning(f"LLM stream failed ({type(e).__name__}), retrying in {backoff:.1f}s")
+                        await asyncio.sleep(backoff)
+                    finally:
+                        await chunks.aclose()
+            except Exception:
+                self._stats["failures"] += 1
+                raise
+            finally:
+                self._in_flight -= 1
+                self._stats["latency_ms_total"] += (time.monotonic() - start) * 1000
+
+    async def close(self):
+        await self.provider.close()
+
+    def stats(self) -> Dict[str, Any]:
+        requests = self._stats["requests"]
+        streams = self._stats["streams"]
+        return {
+            "model": self.model,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "requests": requests,
+            "failures": self._stats["failures"],
+            "retries": self._stats["retries"],
+            "avg_latency_ms": round(self._stats["latency_ms_total"] / requests, 2) if requests else 0.0,
+            "streams": streams,
+            "avg_first_token_ms": round(self._stats["first_token_ms_total"] / streams, 2) if streams else 0.0
+        }
+
+llm_client = LLMClient(
+    provider=OpenAICompatibleProvider(
+        base_url=LLM_BASE_URL,
+        max_clients=LLM_MAX_CLIENTS,
+        max_connections=LLM_MAX_CONCURRENCY
+    ),
+    model=LLM_MODEL,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    timeout=LLM_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES
+)
+
+def normalize_browser_data(browser_data: Dict, target_url: str) -> Dict[str, Any]:
+    """Reduce captured data to the inputs that shape the AI analysis, in a stable order"""
+    network_summary = sorted({
+        (
+            req.get("method", "GET"),
+            strip_query(req.get("url", "")),
+            req.get("status", 0),
+            (req.get("response_type") or "").split(";", 1)[0].strip()
+        )
+        for req in browser_data.get("network_requests", [])
+    })
+    return {
+        "url": strip_query(target_url),
+        "network": network_summary,
+        "api_endpoints": sorted({strip_query(url) for url in browser_data.get("api_endpoints", [])}),
+        "tech_stack": sorted(set(browser_data.get("tech_stack", []))),
+        "security": sorted(set(browser_data.get("security_observations", []))),
+        "title": browser_data.get("page_info", {}).get("title", "")
+    }
+
+def normalize_events_summary(events_summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop timestamps from an events summary so near-identical windows share a key"""
+    return {
+        "event_types": sorted(events_summary.get("event_types", {}).items()),
+        "errors": sorted({error.get("message", "") for error in events_summary.get("errors", [])}),
+        "slow_requests": sorted({strip_query(req.get("url") or "") for req in events_summary.get("slow_requests", [])})
+    }
+
+class AICache:
+    """Content-addressed cache for LLM output.
+
+    An in-process LRU sits in front of the ``ai_cache`` collection, whose TTL index lets
+    Mongo expire old entries. Keys hash the normalized prompt inputs plus the model name.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._stats = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "writes": 0
+        }
+
+    def make_key(self, kind: str, inputs: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"kind": kind, "model": llm_client.model, "inputs": inputs},
+            sort_keys=True,
+            separators=(",", ":"),
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return value
+            del self._entries[key]
+
+        try:
+            doc = await db.ai_cache.find_one({"key": key, "expires_at": {"$gt": datetime.utcnow()}})
+        except Exception as e:
+            logger.warning(f"AI cache lookup failed: {e}")
+            doc = None
+        if doc:
+            self._stats["mongo_hits"] += 1
+            expires_at = (doc["expires_at"] - datetime(1970, 1, 1)).total_seconds()
+            self._remember(key, doc["value"], expires_at)
+            return doc["value"]
+
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, kind: str, value: str, ttl: int):
+        expires_at = time.time() + ttl
+        self._remember(key, value, expires_at)
+        self._stats["writes"] += 1
+        try:
+            await db.ai_cache.update_one(
+                {"key": key},
+                {"$set": {
+                    "key": key,
+                    "kind": kind,
+                    "value": value,
+                    "created_at": datetime.utcnow(),
+                    "expires_at": datetime.utcfromtimestamp(expires_at)
+                }},
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"AI cache write failed: {e}")
+
+    def record_bypass(self):
+        self._stats["bypassed"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self._stats["memory_hits"] + self._stats["mongo_hits"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0
+        }
+
+ai_cache = AICache(max_entries=AI_CACHE_MAX_ENTRIES)
+
+# Request headers every browser sends; they say nothing about the application
+PROMPT_BOILERPLATE_HEADERS = frozenset({
+    "accept", "accept-encoding", "accept-language", "cache-control", "connection", "content-length",
+    "dnt", "host", "if-modified-since", "if-none-match", "origin", "pragma", "priority", "range",
+    "referer", "upgrade-insecure-requests", "user-agent"
+})
+PROMPT_BOILERPLATE_HEADER_PREFIXES = ("sec-ch-", "sec-fetch-", ":")
+# Credentials are named in the prompt but never sent to the LLM
+PROMPT_REDACTED_HEADERS = frozenset({
+    "authorization", "cookie", "proxy-authorization", "x-api-key", "x-auth-token", "x-csrf-token", "x-xsrf-token"
+})
+
+class PromptBudgeter:
+    """Compact a capture into an analysis prompt that fits a token budget.
+
+    Requests are grouped by path template, stripped of boilerplate headers and ranked by
+    how much they say about the application; console messages are deduplicated and
+    ranked by level. The highest-ranked entries are kept until the budget runs out and
+    everything is emitted as compact JSON.
+    """
+    
+    # Rough token estimate for JSON-heavy English text; no tokenizer dependency
+    CHARS_PER_TOKEN = 4
+    RESOURCE_WEIGHTS = {"xhr": 3, "fetch": 3, "websocket": 3, "eventsource": 3, "document": 2, "script": 1, "other": 1}
+    CONSOLE_WEIGHTS = {"error": 3, "assert": 3, "warning": 2}
+    CONSOLE_TEXT_CHARS = 300
+    # Already in the prompt as the tech stack, security observations and document request
+    PAGE_INFO_EXCLUDE = frozenset({"fingerprints", "security_findings", "response_headers"})
+    
+    def __init__(self, token_budget: int, api_share: float, console_share: float, header_value_chars: int):
+        self.token_budget = token_budget
+        self.api_share = api_share
+        self.console_share = console_share
+        self.header_value_chars = header_value_chars
+    
+    @classmethod
+    def estimate_tokens(cls, text: str) -> int:
+        return -(-len(text) // cls.CHARS_PER_TOKEN)
+    
+    @staticmethod
+    def dumps(value: Any) -> str:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+    
+    def compact_headers(self, headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+        compact = {}
+        for name, value in (headers or {}).items():
+            name = name.lower()
+            if name in PROMPT_BOILERPLATE_HEADERS or name.startswith(PROMPT_BOILERPLATE_HEADER_PREFIXES):
+                continue
+            if name in PROMPT_REDACTED_HEADERS:
+                # Keep the scheme ("Bearer", "Basic") since it says how the API authenticates
+                scheme = str(value).split(" ", 1)[0] if name.endswith("authorization") and " " in str(value) else ""
+                compact[name] = f"{scheme} <redacted>".strip()
+            else:
+                compact[name] = str(value)[:self.header_value_chars]
+        return compact
+    
+    def group_requests(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One entry per method and path template, ranked most informative first"""
+        groups: Dict[str, Dict[str, Any]] = {}
+        for req in requests:
+            url = req.get("url", "")
+            key = endpoint_key(req.get("method"), url)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    "endpoint": key,
+                    "type": req.get("resource_type", ""),
+                    "count": 0,
+                    "status": {},
+                    "mime": (req.get("response_type") or "").split(";", 1)[0].strip(),
+                    "query": set(),
+                    "headers": self.compact_headers(req.get("headers")),
+                    "max_ms": 0,
+                    "bytes": 0,
+                    "failure": req.get("failure"),
+                    "blocked": req.get("blocked")
+                }
+            group["count"] += 1
+            status = req.get("status", 0)
+            group["status"][status] = group["status"].get(status, 0) + 1
+            query = urlparse(url).query
+            if query:
+                group["query"].update(pair.partition("=")[0] for pair in query.split("&") if pair)
+            duration = (req.get("timing") or {}).get("responseEnd", 0) or 0
+            group["max_ms"] = max(group["max_ms"], round(duration))
+            group["bytes"] += req.get("response_size", 0) or 0
+            if req.get("failure") and not group["failure"]:
+                group["failure"] = req["failure"]
+        
+        ranked = sorted(groups.values(), key=self.score_request_group, reverse=True)
+        # Drop empty fields; they cost tokens and say nothing
+        return [
+            {key: sorted(value) if isinstance(value, set) else value for key, value in group.items() if value}
+            for group in ranked
+        ]
+    
+    def score_request_group(self, group: Dict[str, Any]) -> float:
+        score = self.RESOURCE_WEIGHTS.get(group["type"], 0)
+        if any(indicator in group["endpoint"].lower() for indicator in API_INDICATORS):
+            score += 2
+        if group["failure"] or any(status == 0 or status >= 400 for status in group["status"]):
+            score += 3
+        if not group["endpoint"].startswith("GET "):
+            score += 1
+        if group["headers"] or group["query"]:
+            score += 1
+        if group["blocked"]:
+            # Never reached the network, so all we know is the URL
+            score -= 2
+        return score + math.log2(group["count"]) / 4
+    
+    def group_console_logs(self, logs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Deduplicated console messages, errors first"""
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        for log in logs:
+            if not isinstance(log, dict):
+                log = {"text": log}
+            text = str(log.get("text", ""))[:self.CONSOLE_TEXT_CHARS]
+            key = (log.get("type", "log"), text)
+            if key in groups:
+                groups[key]["count"] += 1
+            else:
+                groups[key] = {"type": key[0], "text": text, "count": 1}
+        return sorted(groups.values(), key=lambda log: self.CONSOLE_WEIGHTS.get(log["type"], 0), reverse=True)
+    
+    def fit(self, items: List[Dict[str, Any]], budget: int) -> tuple:
+        """Keep items in rank order while they fit; returns (kept, tokens used)"""
+        kept = []
+        used = 0
+        for item in items:
+            cost = self.estimate_tokens(self.dumps(item)) + 1
+            if used + cost <= budget:
+                kept.append(item)
+                used += cost
+        return kept, used
+    
+    def build(self, browser_data: Dict[str, Any], target_url: str) -> tuple:
+        """Return (prompt, stats) for a capture"""
+        start = time.perf_counter()
+        requests = browser_data.get("network_requests", [])
+        logs = browser_data.get("console_logs", [])
+        
+        fixed = {
+            "page": self.dumps({
+                key: value for key, value in browser_data.get("page_info", {}).items()
+                if key not in self.PAGE_INFO_EXCLUDE
+            }),
+            "tech": self.dumps(browser_data.get("tech_stack", [])),
+            "security": self.dumps(browser_data.get("security_observations", []))
+        }
+        remaining = max(0, self.token_budget - self.estimate_tokens(ANALYSIS_PROMPT_TEMPLATE) -
+                        sum(self.estimate_tokens(text) for text in fixed.values()))
+        
+        # Busiest endpoints first, up to their share of the budget
+        api_entries = sorted(
+            ({key: value for key, value in endpoint.items() if key != "example" and value}
+             for endpoint in browser_data.get("api_map", [])),
+            key=lambda endpoint: endpoint["count"],
+            reverse=True
+        )
+        kept_api, api_used = self.fit(api_entries, int(remaining * self.api_share))
+        remaining -= api_used
+        
+        request_groups = self.group_requests(requests)
+        console_groups = self.group_console_logs(logs)
+        # Console gets its share only if it needs it; requests take whatever is left over
+        console_reserve = min(
+            int(remaining * self.console_share),
+            sum(self.estimate_tokens(self.dumps(log)) + 1 for log in console_groups)
+        )
+        kept_requests, used = self.fit(request_groups, remaining - console_reserve)
+        kept_logs, _ = self.fit(console_groups, remaining - used)
+        
+        prompt = ANALYSIS_PROMPT_TEMPLATE.format(
+            target_url=target_url,
+            request_count=len(requests),
+            group_count=len(request_groups),
+            requests_note=self.omitted_note(len(request_groups) - len(kept_requests), "request groups"),
+            requests=self.dumps(kept_requests),
+            api_count=len(api_entries),
+            api_note=self.omitted_note(len(api_entries) - len(kept_api), "endpoints"),
+            api_endpoints=self.dumps(kept_api),
+            tech_stack=fixed["tech"],
+            console_count=len(logs),
+            console_note=self.omitted_note(len(console_groups) - len(kept_logs), "messages"),
+            console_logs=self.dumps(kept_logs),
+            page_info=fixed["page"],
+            security=fixed["security"]
+        )
+        build_ms = round((time.perf_counter() - start) * 1000, 1)
+        
+        # What the prompt would cost with the capture serialised in full, as it used to be
+        capture_text = json.dumps({
+            key: browser_data.get(key)
+            for key in ("network_requests", "api_endpoints", "api_map", "tech_stack", "console_logs", "page_info",
+                        "security_observations")
+        }, indent=2, default=str)
+        return prompt, {
+            "budget_tokens": self.token_budget,
+            "full_prompt_tokens": self.estimate_tokens(ANALYSIS_PROMPT_TEMPLATE) + self.estimate_tokens(capture_text),
+            "prompt_tokens": self.estimate_tokens(prompt),
+            "build_ms": build_ms,
+            "api_endpoints": len(api_entries),
+            "api_endpoints_kept": len(kept_api),
+            "request_groups": len(request_groups),
+            "request_groups_kept": len(kept_requests),
+            "console_groups": len(console_groups),
+            "console_groups_kept": len(kept_logs)
+        }
+    
+    @staticmethod
+    def omitted_note(omitted: int, what: str) -> str:
+        return f", {omitted} lower-ranked {what} omitted" if omitted > 0 else ""
+
+ANALYSIS_PROMPT_TEMPLATE = """Analyze this website reverse engineering data for: {target_url}
+Data is compact JSON. Requests are grouped by endpoint with id-like path segments shown as :id (API endpoints also use :param for free-form values); "status" maps status codes to counts.
+
+NETWORK REQUESTS ({request_count} total in {group_count} endpoint groups{requests_note}):
+{requests}
+
+API ENDPOINTS ({api_count} inferred from traffic{api_note}; "schema" is sampled from JSON responses):
+{api_endpoints}
+
+TECHNOLOGY STACK:
+{tech_stack}
+
+CONSOLE LOGS ({console_count} total{console_note}):
+{console_logs}
+
+PAGE INFO:
+{page_info}
+
+SECURITY OBSERVATIONS:
+{security}
+
+Please provide a comprehensive analysis including:
+1. **Architecture Overview**: What type of application this appears to be
+2. **Technology Stack**: Detailed breakdown of technologies used
+3. **API Analysis**: Analysis of discovered API endpoints and their purposes
+4. **Data Flow**: How data appears to flow through the application
+5. **Security Assessment**: Security posture and potential vulnerabilities
+6. **Integration Points**: External services and third-party integrations
+7. **Performance Insights**: Notable performance characteristics
+8. **Reverse Engineering Summary**: Key insights for developers wanting to understand this application
+
+Keep the analysis technical but accessible, focusing on actionable insights.
+"""
+
+prompt_budgeter = PromptBudgeter(
+    AI_PROMPT_TOKEN_BUDGET, AI_PROMPT_API_SHARE, AI_PROMPT_CONSOLE_SHARE, AI_PROMPT_HEADER_VALUE_CHARS
+)
+
+async def analyze_with_ai(api_key: str, browser_data: Dict, target_url: str, use_cache: bool = True,
+                          on_delta=None, prompt_stats: Optional[Dict[str, Any]] = None) -> str:
+    """Analyze the captured data using OpenRouter AI.
+
+    With ``on_delta`` the report is streamed and each chunk passed to it as it arrives.
+    Prompt size and build time are recorded in ``prompt_stats`` when a prompt is built.
+    """
+    try:
+        cache_key = ai_cache.make_key("analysis", normalize_browser_data(browser_data, target_url))
+        if use_cache:
+            cached = await ai_cache.get(cache_key)
+            if cached is not None:
+                if on_delta:
+                    on_delta(cached)
+                return cached
+        else:
+            ai_cache.record_bypass()
+        
+        analysis_prompt, budget_stats = prompt_budgeter.build(browser_data, target_url)
+        if prompt_stats is not None:
+            prompt_stats.update(budget_stats)
+        
+        messages = [{"role": "user", "content": analysis_prompt}]
+        if on_delta:
+            ai_analysis = await llm_client.stream(api_key, messages, on_delta, max_tokens=2000, temperature=0.7)
+        else:
+            ai_analysis = await llm_client.complete(api_key, messages, max_tokens=2000, temperature=0.7)
+        await ai_cache.set(cache_key, "analysis", ai_analysis, AI_CACHE_TTL_ANALYSIS)
+        return ai_analysis
+        
+    except Exception as e:
+        logger.error(f"AI analysis failed: {e}")
+        return f"AI analysis failed: {str(e)}. Raw data analysis shows {len(browser_data.get('network_requests', []))} network requests, {len(browser_data.get('api_endpoints', []))} API endpoints discovered, and {len(browser_data.get('tech_stack', []))} technologies identified."
@@ -0,0 +1,89 @@
+"""Request and response models for the API"""
+
+from pydantic import BaseModel, HttpUrl
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+
+class LiveSessionEvent(BaseModel):
+    sessionId: str
+    url: str
+    hostname: str
+    event: Dict[str, Any]
+
+class LiveSessionBatch(BaseModel):
+    sessionId: str
+    url: str
+    hostname: str
+    events: List[Dict[str, Any]]
+    # Enables server-side AI insights when anomalies are detected in this session
+    openrouter_api_key: Optional[str] = None
+
+class AIInsightRequest(BaseModel):
+    sessionId: str
+    openrouter_api_key: str
+    # Only used for sessions the server has no statistics for
+    events: List[Dict[str, Any]] = []
+    bypass_cache: Optional[bool] = False
+
+class AnalysisRequest(BaseModel):
+    url: HttpUrl
+    openrouter_api_key: str
+    depth: Optional[str] = "medium"  # light, medium, deep
+    priority: Optional[int] = 0  # higher runs first
+    bypass_cache: Optional[bool] = False
+    mode: Optional[str] = "single"  # single, crawl
+    profile: Optional[str] = "full"  # full, no-media, api-only
+    max_pages: Optional[int] = 10  # crawl mode only
+    max_crawl_depth: Optional[int] = 2  # crawl mode only
+    incremental: Optional[bool] = False  # only send changes since the last analysis of the URL to the AI
+
+class ScheduleRequest(BaseModel):
+    url: HttpUrl
+    openrouter_api_key: str
+    cron: str  # minute hour day-of-month month day-of-week (UTC), or @hourly, @daily, @weekly, @monthly
+    depth: Optional[str] = "medium"  # light, medium, deep
+    priority: Optional[int] = None  # defaults to SCHEDULE_PRIORITY
+    mode: Optional[str] = "single"  # single, crawl
+    profile: Optional[str] = "full"  # full, no-media, api-only
+    max_pages: Optional[int] = 10  # crawl mode only
+    max_crawl_depth: Optional[int] = 2  # crawl mode only
+    incremental: Optional[bool] = True
+    enabled: Optional[bool] = True
+
+class ScheduleUpdate(BaseModel):
+    cron: Optional[str] = None
+    enabled: Optional[bool] = None
+    openrouter_api_key: Optional[str] = None
+
+class NetworkRequest(BaseModel):
+    url: str
+    method: str
+    status: Optional[int] = 0
+    response_type: Optional[str] = ""
+    headers: Optional[Dict[str, Any]] = {}
+    response_size: Optional[int] = 0
+    response_headers: Optional[Dict[str, Any]] = {}
+    resource_type: Optional[str] = ""
+    request_size: Optional[int] = 0
+    timing: Optional[Dict[str, float]] = {}
+    redirect_chain: Optional[List[str]] = []
+    failure: Optional[str] = None
+    blocked: Optional[str] = None  # reason, when the capture profile blocked the request
+
+class AnalysisResult(BaseModel):
+    id: str
+    url: str
+    timestamp: datetime
+    network_requests: List[NetworkRequest]
+    console_logs: List[str]
+    page_info: Dict[str, Any]
+    tech_stack: List[str]
+    api_endpoints: List[str]
+    api_map: List[Dict[str, Any]] = []  # endpoint templates with counts and sampled schemas
+    ai_analysis: str
+    security_observations: List[str]
+    capture: Optional[Dict[str, Any]] = None  # reference to the full HAR capture
+    host: Optional[str] = None
+    diff: Optional[Dict[str, Any]] = None  # structural changes since the previous analysis of the URL
+    incremental: Optional[Dict[str, Any]] = None  # how an incremental report was produced
+    ai_report: Optional[str] = None  # full report an incremental change report builds on
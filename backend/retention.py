@@ -0,0 +1,196 @@
+"""Retention: downsampling and expiring old analyses and their captures"""
+
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
+import asyncio
+import time
+import logging
+
+from config import (
+    ANALYSIS_COMPACT_AFTER_DAYS, ANALYSIS_DOWNSAMPLE_AFTER_DAYS, ANALYSIS_RETENTION_BATCH,
+    ANALYSIS_RETENTION_DAYS, ANALYSIS_RETENTION_INTERVAL
+)
+from database import db
+from diffing import PREVIOUS_ANALYSIS_PROJECTION, diff_analyses
+from storage import capture_store
+
+logger = logging.getLogger(__name__)
+
+class AnalysisRetention:
+    """Compacts, downsamples and expires old analyses in batches.
+
+    After ``compact_after_days`` an analysis loses its stored capture and request/log
+    previews but keeps its summary, diff and report. After ``downsample_after_days`` only
+    the last analysis of each URL per day, plus any that changed, is kept. After
+    ``retention_days`` analyses are deleted. A period of 0 (the default) disables that step.
+    Diffs based on a deleted analysis are recomputed against the nearest older one left.
+    """
+
+    # Dropped on compaction; the summary, diff, API map and report stay
+    COMPACTED_FIELDS = {"network_requests": "", "console_logs": "", "capture": ""}
+
+    def __init__(self, compact_after_days: int, downsample_after_days: int, retention_days: int,
+                 interval: int, batch_size: int):
+        # Negative periods would put the cutoff in the future, so they disable the step too
+        self.compact_after_days = max(0, compact_after_days)
+        self.downsample_after_days = max(0, downsample_after_days)
+        self.retention_days = max(0, retention_days)
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task = None
+        self._totals = {"compacted": 0, "downsampled": 0, "expired": 0}
+        self._last_run = None
+
+    def start(self):
+        if not self._task and (self.compact_after_days or self.downsample_after_days or self.retention_days):
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Analysis retention failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    @staticmethod
+    def _cutoff(now: datetime, days: int) -> datetime:
+        # Whole days, so every day before the cutoff is complete when it is downsampled
+        return (now - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        now = now or datetime.utcnow()
+        started = time.monotonic()
+        counts = {"compacted": 0, "downsampled": 0, "expired": 0}
+        if self.retention_days:
+            counts["expired"] = await self._expire(self._cutoff(now, self.retention_days))
+        if self.downsample_after_days:
+            counts["downsampled"] = await self._downsample(self._cutoff(now, self.downsample_after_days))
+        if self.compact_after_days:
+            counts["compacted"] = await self._compact(self._cutoff(now, self.compact_after_days))
+        for key, count in counts.items():
+            self._totals[key] += count
+        self._last_run = {"at": now.isoformat(), "duration_ms": round((time.monotonic() - started) * 1000, 1), **counts}
+        if any(counts.values()):
+            logger.info(f"Analysis retention: {counts}")
+        return counts
+
+    async def _drop_captures(self, docs: List[Dict[str, Any]]):
+        for doc in docs:
+            if doc.get("capture"):
+                try:
+                    await capture_store.delete(doc["capture"])
+                except Exception as e:
+                    logger.warning(f"Failed to delete capture of analysis {doc['id']}: {e}")
+
+    async def _delete(self, docs: List[Dict[str, Any]]) -> int:
+        await self._drop_captures(docs)
+        ids = [doc["id"] for doc in docs]
+        result = await db.analyses.delete_many({"id": {"$in": ids}})
+        await self._rebase_diffs(ids)
+        return result.deleted_count
+
+    async def _rebase_diffs(self, deleted_ids: List[str]):
+        """Re-diff analyses whose base was deleted against the nearest older analysis left"""
+        projection = {**PREVIOUS_ANALYSIS_PROJECTION, "url": 1}
+        orphans = await db.analyses.find({"diff.base_id": {"$in": deleted_ids}}, projection).to_list(None)
+        for orphan in orphans:
+            base = await db.analyses.find_one(
+                {"url": orphan["url"], "timestamp": {"$lt": orphan["timestamp"]}},
+                PREVIOUS_ANALYSIS_PROJECTION,
+                sort=[("timestamp", -1), ("id", -1)]
+            )
+            # The change report stays on the analysis; only the reference to its base goes
+            update: Dict[str, Any] = {"$unset": {"incremental.base_id": ""}}
+            if base:
+                update["$set"] = {"diff": diff_analyses(base, orphan)}
+            else:
+                update["$unset"]["diff"] = ""
+            await db.analyses.update_one({"id": orphan["id"]}, update)
+
+    async def _expire(self, cutoff: datetime) -> int:
+        deleted = 0
+        while True:
+            docs = await db.analyses.find(
+                {"timestamp": {"$lt": cutoff}}, {"_id": 0, "id": 1, "capture": 1}
+            ).sort([("timestamp", 1), ("id", 1)]).limit(self.batch_size).to_list(self.batch_size)
+            if not docs:
+                return deleted
+            deleted += await self._delete(docs)
+
+    async def _compact(self, cutoff: datetime) -> int:
+        compacted = 0
+        while True:
+            docs = await db.analyses.find(
+                {"timestamp": {"$lt": cutoff}, "retention": {"$exists": False}}, {"_id": 0, "id": 1, "capture": 1}
+            ).limit(self.batch_size).to_list(self.batch_size)
+            if not docs:
+                return compacted
+            await self._drop_captures(docs)
+            result = await db.analyses.update_many(
+                {"id": {"$in": [doc["id"] for doc in docs]}},
+                {"$unset": self.COMPACTED_FIELDS, "$set": {"retention": "compacted"}}
+            )
+            compacted += result.modified_count
+
+    async def _downsample(self, cutoff: datetime) -> int:
+        """Keep the newest analysis of each URL per day, and every one whose diff changed.
+
+        Diffs based on a deleted analysis are recomputed against the nearest older survivor,
+        so history never points at a missing analysis.
+        """
+        deleted = 0
+        doomed, kept = [], []
+        last_kept = None
+        cursor = db.analyses.find(
+            {"timestamp": {"$lt": cutoff}, "retention": {"$ne": "downsampled"}},
+            {"_id": 0, "id": 1, "url": 1, "timestamp": 1, "capture": 1, "diff.changed": 1}
+        ).sort([("url", 1), ("timestamp", -1), ("id", -1)])
+        async for doc in cursor:
+            day = (doc["url"], doc["timestamp"].date())
+            if day != last_kept or (doc.get("diff") or {}).get("changed"):
+                last_kept = day
+                kept.append(doc)
+            else:
+                doomed.append(doc)
+            if len(doomed) >= self.batch_size:
+                deleted += await self._delete(doomed)
+                doomed = []
+            if len(kept) >= self.batch_size:
+                await self._mark_downsampled(kept)
+                kept = []
+        if doomed:
+            deleted += await self._delete(doomed)
+        if kept:
+            await self._mark_downsampled(kept)
+        return deleted
+
+    async def _mark_downsampled(self, docs: List[Dict[str, Any]]):
+        # Downsampled analyses are also past compaction
+        await self._drop_captures(docs)
+        await db.analyses.update_many(
+            {"id": {"$in": [doc["id"] for doc in docs]}},
+            {"$unset": self.COMPACTED_FIELDS, "$set": {"retention": "downsampled"}}
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "compact_after_days": self.compact_after_days,
+            "downsample_after_days": self.downsample_after_days,
+            "retention_days": self.retention_days,
+            "totals": dict(self._totals),
+            "last_run": self._last_run
+        }
+
+analysis_retention = AnalysisRetention(
+    compact_after_days=ANALYSIS_COMPACT_AFTER_DAYS,
+    downsample_after_days=ANALYSIS_DOWNSAMPLE_AFTER_DAYS,
+    retention_days=ANALYSIS_RETENTION_DAYS,
+    interval=ANALYSIS_RETENTION_INTERVAL,
+    batch_size=ANALYSIS_RETENTION_BATCH
+)
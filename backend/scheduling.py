@@ -0,0 +1,519 @@
+"""Scheduling analyses: the bounded job queue, cron expressions and the recurring-analysis loop"""
+
+from typing import List, Dict, Any, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+import uuid
+import asyncio
+import time
+import random
+import logging
+
+from config import (
+    ANALYSIS_CONCURRENCY, ANALYSIS_POLL_INTERVAL, ANALYSIS_STALE_AFTER, SCHEDULE_JITTER_FRACTION,
+    SCHEDULE_MAX_JITTER, SCHEDULE_MAX_OUTSTANDING, SCHEDULE_POLL_INTERVAL, SCHEDULE_PRIORITY,
+    SCHEDULE_RUN_HISTORY
+)
+from database import db
+from models import AnalysisRequest
+from backplane import broadcast_hub
+from live import LatencySketch
+from analysis import job_channel, run_analysis, serialize_job
+
+logger = logging.getLogger(__name__)
+
+class AnalysisJobScheduler:
+    """Mongo-backed analysis queue with per-depth concurrency limits.
+
+    Jobs are claimed atomically (highest priority first, then oldest) so queued work
+    survives restarts. The limits hold across every worker sharing the queue: each depth
+    has ``limit`` slot documents in ``analysis_slots``, and a worker leases a free slot
+    before claiming a job. Leases left by a crashed worker expire after ``stale_after``,
+    when its jobs are requeued. Status changes are pushed to the live-monitoring websockets.
+    """
+
+    def __init__(self, concurrency: Dict[str, int], poll_interval: int, stale_after: int):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._running: Dict[str, int] = {depth: 0 for depth in concurrency}
+        self._slots_ready = False
+        self._tasks = set()
+        self._wakeup = asyncio.Event()
+        self._dispatcher = None
+        self._metric_totals: Dict[str, float] = {}
+        self._metric_counts: Dict[str, int] = {}
+
+    async def start(self):
+        """Start dispatching queued jobs"""
+        if self._dispatcher:
+            return
+        self._dispatcher = asyncio.create_task(self._dispatch_loop())
+
+    async def _prepare(self):
+        """Requeue jobs abandoned by a previous process"""
+        await self.requeue_stale_jobs()
+
+    async def stop(self):
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def enqueue(self, request: AnalysisRequest, schedule_id: Optional[str] = None) -> Dict[str, Any]:
+        depth = request.depth if request.depth in self.concurrency else "medium"
+        job = {
+            "id": str(uuid.uuid4()),
+            "url": str(request.url),
+            "openrouter_api_key": request.openrouter_api_key,
+            "depth": depth,
+            "priority": request.priority or 0,
+            "bypass_cache": bool(request.bypass_cache),
+            "mode": request.mode or "single",
+            "profile": request.profile or "full",
+            "max_pages": request.max_pages,
+            "max_crawl_depth": request.max_crawl_depth,
+            "incremental": bool(request.incremental),
+            "status": "queued",
+            "created_at": datetime.utcnow()
+        }
+        if schedule_id:
+            job["schedule_id"] = schedule_id
+        await db.analysis_jobs.insert_one(dict(job))
+        self._wakeup.set()
+        await self._notify(job)
+        return job
+
+    async def requeue_stale_jobs(self):
+        """Put jobs stuck in 'running' (e.g. after a crash) back on the queue"""
+        cutoff = datetime.utcfromtimestamp(time.time() - self.stale_after)
+        result = await db.analysis_jobs.update_many(
+            {"status": "running", "started_at": {"$lt": cutoff}},
+            {"$set": {"status": "queued"}, "$unset": {"started_at": ""}}
+        )
+        if result.modified_count:
+            logger.info(f"Requeued {result.modified_count} stale analysis jobs")
+
+    async def _dispatch_loop(self):
+        prepared = False
+        while True:
+            try:
+                if not prepared:
+                    await self._prepare()
+                    prepared = True
+                await self._dispatch()
+            except Exception as e:
+                logger.error(f"Analysis dispatch failed: {e}")
+            self._wakeup.clear()
+            try:
+                # Also poll, so jobs queued by other workers get picked up
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _ensure_slots(self):
+        for depth, limit in self.concurrency.items():
+            for index in range(limit):
+                try:
+                    await db.analysis_slots.update_one(
+                        {"_id": f"{depth}:{index}"},
+                        {"$setOnInsert": {"depth": depth, "index": index, "holder": None}},
+                        upsert=True
+                    )
+                except DuplicateKeyError:
+                    # Created by another worker at the same moment
+                    pass
+        self._slots_ready = True
+
+    async def _lease_slot(self, depth: str, limit: int) -> Optional[tuple]:
+        """Take a free slot of ``depth``; returns (slot id, holder) or None when all are busy"""
+        now = datetime.utcnow()
+        holder = uuid.uuid4().hex
+        slot = await db.analysis_slots.find_one_and_update(
+            {
+                "depth": depth,
+                "index": {"$lt": limit},
+                "$or": [{"holder": None}, {"expires_at": {"$lt": now}}]
+            },
+            {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=self.stale_after)}}
+        )
+        return (slot["_id"], holder) if slot else None
+
+    async def _release_slot(self, lease: tuple):
+        slot_id, holder = lease
+        try:
+            await db.analysis_slots.update_one(
+                {"_id": slot_id, "holder": holder}, {"$set": {"holder": None}, "$unset": {"expires_at": ""}}
+            )
+        except Exception as e:
+            # The lease runs out on its own
+            logger.warning(f"Failed to release analysis slot {slot_id}: {e}")
+
+    async def _dispatch(self):
+        """Claim queued jobs while any depth has a free slot"""
+        if not self._slots_ready:
+            await self._ensure_slots()
+        claimed = True
+        while claimed:
+            claimed = False
+            for depth, limit in self.concurrency.items():
+                if self._running[depth] >= limit:
+                    continue
+                lease = await self._lease_slot(depth, limit)
+                if not lease:
+                    continue
+                job = await db.analysis_jobs.find_one_and_update(
+                    {"status": "queued", "depth": depth},
+                    {"$set": {"status": "running", "started_at": datetime.utcnow()}},
+                    sort=[("priority", -1), ("created_at", 1)],
+                    return_document=ReturnDocument.AFTER
+                )
+                if not job:
+                    await self._release_slot(lease)
+                    continue
+                claimed = True
+                self._running[depth] += 1
+                task = asyncio.create_task(self._run_job(job, lease))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _run_job(self, job: Dict[str, Any], lease: tuple):
+        await self._notify(job)
+        metrics: Dict[str, float] = {}
+        try:
+            request = AnalysisRequest(
+                url=job["url"],
+                openrouter_api_key=job["openrouter_api_key"],
+                depth=job["depth"],
+                priority=job.get("priority", 0),
+                bypass_cache=job.get("bypass_cache", False),
+                mode=job.get("mode", "single"),
+                profile=job.get("profile", "full"),
+                max_pages=job.get("max_pages", 10),
+                max_crawl_depth=job.get("max_crawl_depth", 2),
+                incremental=job.get("incremental", False)
+            )
+            result = await run_analysis(request, job_id=job["id"], metrics=metrics)
+            update = {"status": "completed", "analysis_id": result.id}
+        except Exception as e:
+            logger.error(f"Analysis failed: {str(e)}")
+            update = {"status": "failed", "error": f"Analysis failed: {str(e)}"}
+        finally:
+            self._running[job["depth"]] -= 1
+            await self._release_slot(lease)
+            self._wakeup.set()
+
+        update["finished_at"] = datetime.utcnow()
+        update["stage"] = "done"
+        update["metrics"] = self._record_metrics(job, metrics)
+        job = await db.analysis_jobs.find_one_and_update(
+            {"id": job["id"]},
+            # The API key is only needed while the job is pending
+            {"$set": update, "$unset": {"openrouter_api_key": ""}},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            await self._notify(job)
+            if job.get("schedule_id"):
+                await recurring_scheduler.record_run(job)
+
+    def _record_metrics(self, job: Dict[str, Any], metrics: Dict[str, float]) -> Dict[str, float]:
+        """Add queueing time and time to first byte/token as seen by the client"""
+        metrics = dict(metrics)
+        if job.get("created_at") and job.get("started_at"):
+            metrics["queue_ms"] = round((job["started_at"] - job["created_at"]).total_seconds() * 1000, 1)
+            if "capture_ms" in metrics:
+                # The capture is the first thing streamed to the client
+                metrics["time_to_first_byte_ms"] = round(metrics["queue_ms"] + metrics["capture_ms"], 1)
+            if "first_token_ms" in metrics:
+                metrics["time_to_first_token_ms"] = round(metrics["queue_ms"] + metrics["first_token_ms"], 1)
+        for key in ("time_to_first_byte_ms", "time_to_first_token_ms", "total_ms", "prompt_tokens"):
+            if key in metrics:
+                self._metric_totals[key] = self._metric_totals.get(key, 0.0) + metrics[key]
+                self._metric_counts[key] = self._metric_counts.get(key, 0) + 1
+        return metrics
+
+    async def _notify(self, job: Dict[str, Any]):
+        message = {"type": "analysis_job", "job": serialize_job(job)}
+        # A client that is behind only needs the latest status of each job
+        broadcast_hub.publish(message, coalesce_key=f"analysis_job:{job['id']}")
+        broadcast_hub.publish(message, session_id=job_channel(job["id"]), subscribers_only=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": dict(self._running),
+            "limits": dict(self.concurrency),
+            **{
+                f"avg_{key}": round(total / self._metric_counts[key], 1)
+                for key, total in self._metric_totals.items()
+            }
+        }
+
+analysis_scheduler = AnalysisJobScheduler(
+    concurrency=ANALYSIS_CONCURRENCY,
+    poll_interval=ANALYSIS_POLL_INTERVAL,
+    stale_after=ANALYSIS_STALE_AFTER
+)
+
+class CronSchedule:
+    """Five-field cron expression (minute hour day-of-month month day-of-week), in UTC.
+
+    Fields accept ``*``, numbers, ranges, lists and steps (``*/15``, ``1-5``, ``0,30``).
+    As in cron, when both day fields are restricted a day matching either one fires;
+    a day field starting with ``*`` is not restricted, so ``0 0 */2 * 1`` needs both.
+    """
+
+    FIELDS = (("minute", 0, 59), ("hour", 0, 23), ("day of month", 1, 31), ("month", 1, 12), ("day of week", 0, 7))
+    ALIASES = {"@hourly": "0 * * * *", "@daily": "0 0 * * *", "@weekly": "0 0 * * 0", "@monthly": "0 0 1 * *"}
+    # Bounds the search for expressions that can never fire, like February 30th
+    MAX_SEARCH_DAYS = 5 * 366
+
+    def __init__(self, expression: str):
+        self.expression = expression.strip()
+        fields = self.ALIASES.get(self.expression, self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields, got {len(fields)}: {expression!r}")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self._parse_field(field, *spec) for field, spec in zip(fields, self.FIELDS)
+        )
+        # 0 and 7 are both Sunday
+        self.weekdays = {day % 7 for day in weekdays}
+        # Like Vixie cron, a day field starting with * (including */2) counts as unrestricted
+        self.any_day = fields[2].startswith("*")
+        self.any_weekday = fields[4].startswith("*")
+        self._sorted_minutes = sorted(self.minutes)
+        self.next_after(datetime(2000, 1, 1))
+
+    @staticmethod
+    def _parse_field(field: str, name: str, low: int, high: int) -> set:
+        values = set()
+        for part in field.split(","):
+            value_range, _, step = part.partition("/")
+            try:
+                step = int(step) if step else 1
+                if value_range == "*":
+                    start, end = low, high
+                elif "-" in value_range:
+                    start, end = (int(bound) for bound in value_range.split("-", 1))
+                else:
+                    start = int(value_range)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise ValueError(f"Invalid {name} field: {field!r}")
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f"Invalid {name} field: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        in_month = moment.day in self.days
+        # Python counts Monday as 0, cron counts Sunday as 0
+        in_week = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_month and in_week
+        return in_month or in_week
+
+    def next_after(self, moment: datetime) -> datetime:
+        """The first time strictly after ``moment`` that the expression fires"""
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = moment + timedelta(days=self.MAX_SEARCH_DAYS)
+        while moment < limit:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            else:
+                minute = next((minute for minute in self._sorted_minutes if minute >= moment.minute), None)
+                if minute is not None:
+                    return moment.replace(minute=minute)
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+        raise ValueError(f"Cron expression never fires: {self.expression!r}")
+
+def run_trends(runs: List[Dict[str, Any]], days: int, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Daily run duration and failure statistics for a schedule's recent runs"""
+    since = (now or datetime.utcnow()) - timedelta(days=days)
+    runs = [run for run in runs if run.get("finished_at") and run["finished_at"] >= since]
+    overall = LatencySketch()
+    by_day: Dict[str, Dict[str, Any]] = {}
+    for run in runs:
+        day = by_day.setdefault(run["finished_at"].strftime("%Y-%m-%d"), {"runs": 0, "failures": 0, "duration": LatencySketch()})
+        day["runs"] += 1
+        if run["status"] != "completed":
+            day["failures"] += 1
+        elif run.get("total_ms"):
+            day["duration"].add(run["total_ms"])
+            overall.add(run["total_ms"])
+    
+    failures = sum(day["failures"] for day in by_day.values())
+    # Compare the newer half of the window with the older half
+    durations = [run["total_ms"] for run in runs if run["status"] == "completed" and run.get("total_ms")]
+    half = len(durations) // 2
+    change = None
+    if half:
+        older = sum(durations[:half]) / half
+        newer = sum(durations[-half:]) / half
+        change = {"older_mean_ms": round(older, 1), "newer_mean_ms": round(newer, 1),
+                  "change_pct": round((newer - older) / older * 100, 1) if older else None}
+    return {
+        "days": days,
+        "runs": len(runs),
+        "failures": failures,
+        "failure_rate": round(failures / len(runs), 3) if runs else None,
+        "duration_ms": overall.summary(),
+        "duration_change": change,
+        "daily": [
+            {"date": date, "runs": day["runs"], "failures": day["failures"], "duration_ms": day["duration"].summary()}
+            for date, day in sorted(by_day.items())
+        ]
+    }
+
+class RecurringAnalysisScheduler:
+    """Queues analyses for cron schedules stored in Mongo.
+
+    Due schedules are claimed atomically, so several workers can share the collection.
+    Each run starts a random jitter after its cron time, and goes through the analysis
+    job queue at low priority. No more than ``max_outstanding`` scheduled jobs are queued
+    or running at once, so a burst of due schedules drains at the browsers' pace.
+    A schedule whose previous run has not finished skips that run.
+    """
+
+    ACTIVE_STATUSES = ["queued", "running"]
+
+    def __init__(self, poll_interval: int, max_jitter: int, jitter_fraction: float,
+                 max_outstanding: int, history: int):
+        self.poll_interval = poll_interval
+        self.max_jitter = max_jitter
+        self.jitter_fraction = jitter_fraction
+        self.max_outstanding = max_outstanding
+        self.history = history
+        self._task = None
+        self._wakeup = asyncio.Event()
+        self._queued = 0
+        self._skipped = 0
+        self._deferred = 0
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def wake(self):
+        self._wakeup.set()
+
+    def next_run(self, cron: CronSchedule, after: datetime) -> tuple:
+        """Next cron time after ``after`` and the jittered time to actually run it"""
+        scheduled_for = cron.next_after(after)
+        gap = (cron.next_after(scheduled_for) - scheduled_for).total_seconds()
+        jitter = random.uniform(0, min(self.max_jitter, gap * self.jitter_fraction))
+        return scheduled_for, scheduled_for + timedelta(seconds=jitter)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._fire_due()
+            except Exception as e:
+                logger.error(f"Scheduled analysis dispatch failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _fire_due(self):
+        outstanding = await db.analysis_jobs.count_documents(
+            {"status": {"$in": self.ACTIVE_STATUSES}, "schedule_id": {"$exists": True}}
+        )
+        while True:
+            now = datetime.utcnow()
+            schedule = await db.analysis_schedules.find_one(
+                {"enabled": True, "next_run_at": {"$lte": now}}, sort=[("next_run_at", 1)]
+            )
+            if not schedule:
+                return
+            if outstanding >= self.max_outstanding:
+                # Due schedules stay due and run as the queue drains
+                self._deferred += 1
+                return
+            scheduled_for, next_run_at = self.next_run(CronSchedule(schedule["cron"]), now)
+            claimed = await db.analysis_schedules.find_one_and_update(
+                {"id": schedule["id"], "next_run_at": schedule["next_run_at"]},
+                {"$set": {"next_run_at": next_run_at, "scheduled_for": scheduled_for, "last_fired_at": now}}
+            )
+            if not claimed:
+                # Another worker took this run
+                continue
+            
+            if schedule.get("last_job_id") and await db.analysis_jobs.find_one(
+                {"id": schedule["last_job_id"], "status": {"$in": self.ACTIVE_STATUSES}}, {"_id": 1}
+            ):
+                self._skipped += 1
+                await db.analysis_schedules.update_one({"id": schedule["id"]}, {"$inc": {"skipped_runs": 1}})
+                logger.info(f"Skipped scheduled analysis of {schedule['url']}: previous run still active")
+                continue
+            
+            request = AnalysisRequest(
+                url=schedule["url"],
+                openrouter_api_key=schedule["openrouter_api_key"],
+                depth=schedule["depth"],
+                priority=schedule.get("priority", SCHEDULE_PRIORITY),
+                mode=schedule.get("mode", "single"),
+                profile=schedule.get("profile", "full"),
+                max_pages=schedule.get("max_pages", 10),
+                max_crawl_depth=schedule.get("max_crawl_depth", 2),
+                incremental=schedule.get("incremental", True)
+            )
+            job = await analysis_scheduler.enqueue(request, schedule_id=schedule["id"])
+            await db.analysis_schedules.update_one({"id": schedule["id"]}, {"$set": {"last_job_id": job["id"]}})
+            self._queued += 1
+            outstanding += 1
+
+    async def record_run(self, job: Dict[str, Any]):
+        """Append a finished job to its schedule's run history"""
+        metrics = job.get("metrics") or {}
+        run = {
+            "job_id": job["id"],
+            "analysis_id": job.get("analysis_id"),
+            "status": job["status"],
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at"),
+            "queue_ms": metrics.get("queue_ms"),
+            "total_ms": metrics.get("total_ms"),
+            "error": job.get("error")
+        }
+        try:
+            await db.analysis_schedules.update_one(
+                {"id": job["schedule_id"]},
+                {
+                    "$push": {"runs": {"$each": [run], "$slice": -self.history}},
+                    "$set": {"last_status": job["status"], "last_run_at": job.get("finished_at")},
+                    "$inc": {"run_count": 1, "failure_count": 0 if job["status"] == "completed" else 1}
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record run of schedule {job['schedule_id']}: {e}")
+        # A finished run frees queue capacity for deferred schedules
+        self.wake()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._queued,
+            "skipped": self._skipped,
+            "deferred": self._deferred,
+            "max_outstanding": self.max_outstanding
+        }
+
+recurring_scheduler = RecurringAnalysisScheduler(
+    poll_interval=SCHEDULE_POLL_INTERVAL,
+    max_jitter=SCHEDULE_MAX_JITTER,
+    jitter_fraction=SCHEDULE_JITTER_FRACTION,
+    max_outstanding=SCHEDULE_MAX_OUTSTANDING,
+    history=SCHEDULE_RUN_HISTORY
+)
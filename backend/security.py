@@ -0,0 +1,208 @@
+"""Header-indexed security checks over a capture's documents, cookies, CORS responses and TLS"""
+
+from typing import List, Dict, Any, Optional
+import time
+import re
+from urllib.parse import urlparse
+
+from endpoints import site_domain
+
+SECURITY_SEVERITIES = ("high", "medium", "low", "info")
+# Six months, the minimum HSTS preload lists accept
+HSTS_MIN_MAX_AGE = 15552000
+TLS_WEAK_PROTOCOLS = frozenset({"SSL 3.0", "TLS 1.0", "TLS 1.1"})
+TLS_EXPIRY_WARNING_DAYS = 30
+# Subresources that can act on the page; mixed-content versions of them are blocked or dangerous
+ACTIVE_RESOURCE_TYPES = frozenset({"script", "stylesheet", "xhr", "fetch", "websocket", "eventsource", "document"})
+
+class SecurityReport:
+    """Findings aggregated by rule and message, with a count and an example URL"""
+    
+    def __init__(self):
+        self._findings: Dict[tuple, Dict[str, Any]] = {}
+    
+    def add(self, rule: str, severity: str, message: str, url: str):
+        finding = self._findings.get((rule, message))
+        if finding is None:
+            self._findings[(rule, message)] = {
+                "rule": rule, "severity": severity, "message": message, "count": 1, "example": url
+            }
+        else:
+            finding["count"] += 1
+    
+    def merge(self, findings: List[Dict[str, Any]]):
+        for finding in findings:
+            existing = self._findings.get((finding["rule"], finding["message"]))
+            if existing is None:
+                self._findings[(finding["rule"], finding["message"])] = dict(finding)
+            else:
+                existing["count"] += finding["count"]
+    
+    def findings(self) -> List[Dict[str, Any]]:
+        return sorted(
+            self._findings.values(),
+            key=lambda finding: (SECURITY_SEVERITIES.index(finding["severity"]), finding["rule"], finding["message"])
+        )
+
+def security_observation(finding: Dict[str, Any]) -> str:
+    suffix = f" (seen {finding['count']} times)" if finding["count"] > 1 else ""
+    return f"[{finding['severity']}] {finding['message']}{suffix}"
+
+def parse_csp(value: str) -> Dict[str, List[str]]:
+    directives: Dict[str, List[str]] = {}
+    for part in value.split(";"):
+        tokens = part.lower().split()
+        if tokens:
+            directives.setdefault(tokens[0], tokens[1:])
+    return directives
+
+def check_hsts(report: SecurityReport, value: str, record: Dict[str, Any]):
+    if not record["url"].startswith("https://"):
+        # Browsers ignore HSTS sent over plain HTTP
+        return
+    max_age = re.search(r"max-age\s*=\s*\"?(\d+)", value, re.IGNORECASE)
+    if not max_age:
+        report.add("hsts", "medium", "Strict-Transport-Security header has no max-age", record["url"])
+    elif int(max_age.group(1)) < HSTS_MIN_MAX_AGE:
+        report.add("hsts", "low", "Strict-Transport-Security max-age is shorter than 180 days", record["url"])
+
+def check_csp(report: SecurityReport, value: str, record: Dict[str, Any]):
+    directives = parse_csp(value)
+    scripts = directives.get("script-src", directives.get("default-src"))
+    if scripts is None:
+        report.add("csp", "medium", "Content-Security-Policy does not restrict scripts", record["url"])
+        return
+    # A nonce or hash makes browsers ignore 'unsafe-inline'
+    if "'unsafe-inline'" in scripts and not any(source.startswith(("'nonce-", "'sha")) for source in scripts):
+        report.add("csp", "medium", "Content-Security-Policy allows inline scripts ('unsafe-inline')", record["url"])
+    if "'unsafe-eval'" in scripts:
+        report.add("csp", "medium", "Content-Security-Policy allows eval ('unsafe-eval')", record["url"])
+    if any(source in ("*", "http:", "https:", "data:") for source in scripts):
+        report.add("csp", "medium", "Content-Security-Policy allows scripts from any origin", record["url"])
+
+def check_csp_report_only(report: SecurityReport, value: str, record: Dict[str, Any]):
+    if "content-security-policy" not in record["response_headers"]:
+        report.add("csp", "low", "Content-Security-Policy is only in report-only mode", record["url"])
+
+def check_frame_options(report: SecurityReport, value: str, record: Dict[str, Any]):
+    if value.strip().upper() not in ("DENY", "SAMEORIGIN"):
+        report.add("x-frame-options", "low", f"X-Frame-Options has an unsupported value ({value[:40]})", record["url"])
+
+def check_content_type_options(report: SecurityReport, value: str, record: Dict[str, Any]):
+    if value.strip().lower() != "nosniff":
+        report.add("x-content-type-options", "low", "X-Content-Type-Options is not 'nosniff'", record["url"])
+
+def check_set_cookie(report: SecurityReport, value: str, record: Dict[str, Any]):
+    secure_context = record["url"].startswith("https://")
+    # all_headers() joins repeated Set-Cookie headers with newlines
+    for cookie in value.split("\n"):
+        name, _, rest = cookie.partition("=")
+        attributes = {part.strip().lower().partition("=")[0]: part.strip().lower().partition("=")[2]
+                      for part in rest.split(";")[1:]}
+        name = name.strip()
+        if not name:
+            continue
+        if secure_context and "secure" not in attributes:
+            report.add("cookie-secure", "medium", f"Cookie '{name}' is set without the Secure flag", record["url"])
+        if "httponly" not in attributes:
+            report.add("cookie-httponly", "low", f"Cookie '{name}' is readable by scripts (no HttpOnly)", record["url"])
+        if attributes.get("samesite") == "none" and "secure" not in attributes:
+            report.add("cookie-samesite", "medium", f"Cookie '{name}' is SameSite=None without Secure", record["url"])
+
+def check_cors_origin(report: SecurityReport, value: str, record: Dict[str, Any]):
+    value = value.strip()
+    credentials = record["response_headers"].get("access-control-allow-credentials", "").strip().lower() == "true"
+    if value == "*" and credentials:
+        report.add("cors", "high", "CORS allows any origin with credentials", record["url"])
+    elif value == "null":
+        report.add("cors", "medium", "CORS allows the 'null' origin", record["url"])
+    elif value == "*":
+        report.add("cors", "info", "CORS allows any origin", record["url"])
+
+def check_version_disclosure(report: SecurityReport, value: str, record: Dict[str, Any], header: str):
+    if any(char.isdigit() for char in value):
+        report.add("version-disclosure", "low", f"{header} header discloses a software version ({value[:60]})", record["url"])
+
+def check_referrer_policy(report: SecurityReport, value: str, record: Dict[str, Any]):
+    if "unsafe-url" in value.lower():
+        report.add("referrer-policy", "low", "Referrer-Policy sends full URLs to other origins (unsafe-url)", record["url"])
+
+def disclosure_rule(header: str):
+    return lambda report, value, record: check_version_disclosure(report, value, record, header)
+
+# Response header name -> rules run for every response carrying it
+SECURITY_HEADER_RULES = {
+    "strict-transport-security": [check_hsts],
+    "content-security-policy": [check_csp],
+    "content-security-policy-report-only": [check_csp_report_only],
+    "x-frame-options": [check_frame_options],
+    "x-content-type-options": [check_content_type_options],
+    "set-cookie": [check_set_cookie],
+    "access-control-allow-origin": [check_cors_origin],
+    "referrer-policy": [check_referrer_policy],
+    "server": [disclosure_rule("Server")],
+    "x-powered-by": [disclosure_rule("X-Powered-By")],
+    "x-aspnet-version": [disclosure_rule("X-AspNet-Version")],
+    "x-aspnetmvc-version": [disclosure_rule("X-AspNetMvc-Version")],
+    "x-generator": [disclosure_rule("X-Generator")]
+}
+
+def check_document_headers(report: SecurityReport, record: Dict[str, Any]):
+    """Headers every first-party page should send"""
+    headers = record["response_headers"]
+    if record["url"].startswith("https://") and "strict-transport-security" not in headers:
+        report.add("hsts", "medium", "Missing Strict-Transport-Security header", record["url"])
+    if "content-security-policy" not in headers:
+        report.add("csp", "medium", "Missing Content-Security-Policy header", record["url"])
+    if "x-frame-options" not in headers and "frame-ancestors" not in parse_csp(headers.get("content-security-policy", "")):
+        report.add("clickjacking", "medium", "Page can be framed by other sites (no X-Frame-Options or frame-ancestors)", record["url"])
+    if "x-content-type-options" not in headers:
+        report.add("x-content-type-options", "low", "Missing X-Content-Type-Options header", record["url"])
+
+def check_tls(report: SecurityReport, origin: str, details: Dict[str, Any]):
+    protocol = details.get("protocol", "")
+    if protocol in TLS_WEAK_PROTOCOLS:
+        report.add("tls", "high", f"{origin} negotiates an outdated protocol ({protocol})", origin)
+    valid_to = details.get("validTo")
+    if valid_to:
+        days_left = (valid_to - time.time()) / 86400
+        if days_left < 0:
+            report.add("tls", "high", f"TLS certificate for {origin} has expired", origin)
+        elif days_left < TLS_EXPIRY_WARNING_DAYS:
+            report.add("tls", "medium", f"TLS certificate for {origin} expires in {int(days_left)} days", origin)
+
+def analyze_security(page_url: str, network_requests: List[Dict[str, Any]],
+                     tls: Dict[str, Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Evaluate the security rules over a capture in one pass.
+
+    Each response only runs the rules for headers it actually carries, and first-party
+    documents are also checked for missing headers, so cost is linear in the capture.
+    """
+    report = SecurityReport()
+    https_page = page_url.startswith("https://")
+    site = site_domain(urlparse(page_url).hostname or "")
+    if not https_page:
+        report.add("https", "high", "Website not using HTTPS", page_url)
+    
+    for record in network_requests:
+        url = record.get("url", "")
+        if https_page and url.startswith("http://"):
+            if record.get("resource_type") in ACTIVE_RESOURCE_TYPES:
+                report.add("mixed-content", "high", "Mixed content: scripts or requests loaded over HTTP on an HTTPS page", url)
+            else:
+                report.add("mixed-content", "low", "Mixed content: media loaded over HTTP on an HTTPS page", url)
+        
+        headers = record.get("response_headers")
+        if not headers:
+            continue
+        for header, value in headers.items():
+            for rule in SECURITY_HEADER_RULES.get(header, ()):
+                rule(report, value, record)
+        if record.get("resource_type") == "document" and 200 <= record.get("status", 0) < 300 and \
+                site_domain(urlparse(url).hostname or "") == site:
+            check_document_headers(report, record)
+    
+    for origin, details in tls.items():
+        if details:
+            check_tls(report, origin, details)
+    return report.findings()
@@ -1,25 +1,45 @@
-from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Depends, WebSocket, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
+from fastapi.responses import StreamingResponse
+from pydantic import HttpUrl, TypeAdapter, ValidationError
 from typing import List, Dict, Any, Optional
-import os
-from motor.motor_asyncio import AsyncIOMotorClient
+import sys
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
 from datetime import datetime
 import uuid
 import asyncio
-from playwright.async_api import async_playwright
 import json
-from openai import OpenAI
-from dotenv import load_dotenv
+import time
+import base64
 import logging
 
-load_dotenv()
+from config import (
+    ANALYSIS_CONCURRENCY, ANALYSIS_JOB_RETENTION_DAYS, APP_TITLE, APP_VERSION,
+    LIVE_SESSION_RETENTION_DAYS, SCHEDULE_PRIORITY
+)
+from database import db
+from models import (
+    AIInsightRequest, AnalysisRequest, LiveSessionBatch, LiveSessionEvent, ScheduleRequest, ScheduleUpdate
+)
+from backplane import broadcast_hub
+from llm import ai_cache, llm_client
+from live import (
+    analyze_events_for_ai, generate_insight, ingest_live_events, live_event_buffer, live_insight_trigger,
+    live_session_store, load_session_aggregator, load_session_events
+)
+from fingerprints import fingerprint_engine
+from capture import browser_pool
+from storage import capture_store
+from analysis import job_channel, serialize_job
+from scheduling import analysis_scheduler, CronSchedule, recurring_scheduler, run_trends
+from retention import analysis_retention
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Website Reverse Engineering Tool", version="1.0.0")
+app = FastAPI(title=APP_TITLE, version=APP_VERSION)
 
 # CORS middleware
 app.add_middleware(
@@ -30,99 +50,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB setup
-MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.website_analyzer
-
-# OpenRouter client setup
-openrouter_client = None
-
-# Live session storage
-live_sessions = {}
-websocket_connections = []
-
-class LiveSessionEvent(BaseModel):
-    sessionId: str
-    url: str
-    hostname: str
-    event: Dict[str, Any]
-
-class AIInsightRequest(BaseModel):
-    sessionId: str
-    openrouter_api_key: str
-    events: List[Dict[str, Any]]
-
-class AnalysisRequest(BaseModel):
-    url: HttpUrl
-    openrouter_api_key: str
-    depth: Optional[str] = "medium"  # light, medium, deep
-
-class NetworkRequest(BaseModel):
-    url: str
-    method: str
-    status: Optional[int] = 0
-    response_type: Optional[str] = ""
-    headers: Optional[Dict[str, Any]] = {}
-    response_size: Optional[int] = 0
-
-class AnalysisResult(BaseModel):
-    id: str
-    url: str
-    timestamp: datetime
-    network_requests: List[NetworkRequest]
-    console_logs: List[str]
-    page_info: Dict[str, Any]
-    tech_stack: List[str]
-    api_endpoints: List[str]
-    ai_analysis: str
-    security_observations: List[str]
-
 @app.post("/api/live-session")
 async def handle_live_session(request: LiveSessionEvent):
     """Handle live monitoring data from Chrome extension"""
     try:
         session_id = request.sessionId
-        
-        # Get or create session
-        if session_id not in live_sessions:
-            live_sessions[session_id] = {
-                "id": str(uuid.uuid4()),
-                "sessionId": session_id,
-                "url": request.url,
-                "hostname": request.hostname,
-                "startTime": datetime.utcnow(),
-                "events": [],
-                "status": "active"
-            }
-        
-        # Add event to session
-        live_sessions[session_id]["events"].append(request.event)
-        
-        # Store in database
-        await db.live_sessions.update_one(
-            {"sessionId": session_id},
-            {
-                "$set": {
-                    "id": live_sessions[session_id]["id"],
-                    "sessionId": session_id,
-                    "url": request.url,
-                    "hostname": request.hostname,
-                    "startTime": live_sessions[session_id]["startTime"],
-                    "status": "active",
-                    "lastUpdate": datetime.utcnow()
-                },
-                "$push": {"events": request.event}
-            },
-            upsert=True
-        )
+        await ingest_live_events(session_id, request.url, request.hostname, [request.event])
         
         # Broadcast to connected websockets
-        await broadcast_to_websockets({
-            "type": "live_event",
-            "sessionId": session_id,
-            "event": request.event
-        })
+        broadcast_hub.publish_events(session_id, [request.event])
         
         return {"status": "success", "sessionId": session_id}
         
@@ -130,44 +66,44 @@ async def handle_live_session(request: LiveSessionEvent):
         logger.error(f"Live session error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Live session error: {str(e)}")
 
-@app.post("/api/ai-insight")
-async def get_ai_insight(request: AIInsightRequest):
-    """Get AI insights for live monitoring events"""
+@app.post("/api/live-session/batch")
+async def handle_live_session_batch(request: LiveSessionBatch):
+    """Handle a batch of live monitoring events from Chrome extension"""
     try:
-        # Initialize OpenRouter client
-        openrouter_client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=request.openrouter_api_key
-        )
+        session_id = request.sessionId
+        if request.events:
+            await ingest_live_events(session_id, request.url, request.hostname, request.events,
+                                     api_key=request.openrouter_api_key)
+            
+            broadcast_hub.publish_events(session_id, request.events)
         
-        # Analyze recent events
-        events_summary = analyze_events_for_ai(request.events)
+        return {"status": "success", "sessionId": session_id, "accepted": len(request.events)}
         
-        insight_prompt = f"""
-You are a web development debugging assistant. Analyze these recent events from a live monitoring session:
-
-{json.dumps(events_summary, indent=2)}
-
-Provide a brief, actionable insight (max 100 words) focusing on:
-1. What might be wrong
-2. Quick debugging tip
-3. Potential impact
-
-Be concise and practical for a developer actively testing their application.
-"""
+    except Exception as e:
+        logger.error(f"Live session batch error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Live session batch error: {str(e)}")
 
-        response = openrouter_client.chat.completions.create(
-            model="google/gemini-2.5-flash-preview-05-20",
-            messages=[{"role": "user", "content": insight_prompt}],
-            max_tokens=150,
-            temperature=0.7
+@app.post("/api/ai-insight")
+async def get_ai_insight(request: AIInsightRequest):
+    """Get AI insights for live monitoring events"""
+    try:
+        # Prefer the server-side statistics over the client's window of recent events
+        aggregator = await load_session_aggregator(request.sessionId)
+        if aggregator is not None and aggregator.total_events:
+            events_summary = aggregator.insight_summary()
+        else:
+            events_summary = analyze_events_for_ai(request.events)
+        
+        insight, cached = await generate_insight(
+            request.openrouter_api_key,
+            events_summary,
+            bypass_cache=request.bypass_cache
         )
         
-        insight = response.choices[0].message.content
-        
         return {
             "sessionId": request.sessionId,
             "message": insight,
+            "cached": cached,
             "timestamp": datetime.utcnow().isoformat()
         }
         
@@ -179,400 +115,235 @@ Be concise and practical for a developer actively testing their application.
             "timestamp": datetime.utcnow().isoformat()
         }
 
-def analyze_events_for_ai(events):
-    """Analyze events to create a summary for AI"""
-    summary = {
-        "total_events": len(events),
-        "event_types": {},
-        "errors": [],
-        "slow_requests": [],
-        "recent_patterns": []
-    }
-    
-    for event in events[-10:]:  # Last 10 events
-        event_type = event.get("type", "unknown")
-        summary["event_types"][event_type] = summary["event_types"].get(event_type, 0) + 1
-        
-        if event_type == "error":
-            summary["errors"].append({
-                "message": event.get("message", ""),
-                "timestamp": event.get("timestamp")
-            })
-        elif event_type == "network" and event.get("status", 0) >= 400:
-            summary["errors"].append({
-                "message": f"HTTP {event.get('status')} on {event.get('url')}",
-                "timestamp": event.get("timestamp")
-            })
-        elif event_type == "network" and event.get("duration", 0) > 3000:
-            summary["slow_requests"].append({
-                "url": event.get("url"),
-                "duration": event.get("duration"),
-                "timestamp": event.get("timestamp")
-            })
-    
-    return summary
-
 @app.get("/api/live-sessions")
-async def get_live_sessions():
-    """Get all active live sessions"""
+async def get_live_sessions(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    host: Optional[str] = None,
+    status: Optional[str] = "active"
+):
+    """List live sessions (summary fields only), newest first, with keyset pagination"""
     try:
-        sessions = await db.live_sessions.find({"status": "active"}).sort("startTime", -1).to_list(50)
-        serialized_sessions = [serialize_mongo_doc(session) for session in sessions]
-        return serialized_sessions
+        query: Dict[str, Any] = {}
+        if status:
+            query["status"] = status
+        if host:
+            query["hostname"] = host
+        if cursor:
+            query.update(keyset_filter("startTime", "sessionId", *decode_cursor(cursor)))
+        
+        sessions = await db.live_sessions.find(query, LIVE_SESSION_SUMMARY_FIELDS).sort(
+            [("startTime", -1), ("sessionId", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        return paginate(sessions, limit, "startTime", "sessionId")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch live sessions: {str(e)}")
 
 @app.get("/api/live-sessions/{session_id}")
-async def get_live_session(session_id: str):
-    """Get specific live session data"""
+async def get_live_session(session_id: str, limit: int = Query(100, ge=1, le=1000)):
+    """Get specific live session data with its newest events"""
     try:
-        session = await db.live_sessions.find_one({"sessionId": session_id})
+        session = await db.live_sessions.find_one({"sessionId": session_id}, {"events": 0, "aggregate": 0, "aggregates": 0})
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
+        session.update(await load_session_events(session, limit))
         return serialize_mongo_doc(session)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch session: {str(e)}")
 
+@app.get("/api/live-sessions/{session_id}/stats")
+async def get_live_session_stats(session_id: str):
+    """Rolling error rates, status codes, per-endpoint latency percentiles and slowest requests"""
+    try:
+        aggregator = await load_session_aggregator(session_id)
+        if aggregator is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return {"sessionId": session_id, **aggregator.summary()}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch session stats: {str(e)}")
+
+@app.get("/api/live-sessions/{session_id}/events")
+async def get_live_session_events(
+    session_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    before_seq: Optional[int] = None,
+    after_seq: Optional[int] = None
+):
+    """Page through a live session's events by sequence number"""
+    try:
+        session = await db.live_sessions.find_one({"sessionId": session_id}, {"sessionId": 1, "eventCount": 1})
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        page = await load_session_events(session, limit, before_seq=before_seq, after_seq=after_seq)
+        return {"sessionId": session_id, **page}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch session events: {str(e)}")
+
 @app.websocket("/ws/live-monitoring")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time updates"""
+    """WebSocket endpoint for real-time updates.
+
+    Clients receive every session's events until they send
+    ``{"action": "subscribe", "sessionIds": [...]}``; ``unsubscribe`` removes ids again and
+    ``subscribe_all`` goes back to receiving everything. Subscribing to ``job:<job_id>``
+    streams that analysis (capture, report tokens), and ``insights:<sessionId>`` delivers
+    only that session's ``live_insight`` messages; neither is sent unsubscribed.
+    """
     await websocket.accept()
-    websocket_connections.append(websocket)
+    client = broadcast_hub.connect(websocket)
     
     try:
         while True:
             data = await websocket.receive_text()
-            # Handle any incoming websocket messages if needed
-    except WebSocketDisconnect:
-        websocket_connections.remove(websocket)
-
-async def broadcast_to_websockets(message):
-    """Broadcast message to all connected websockets"""
-    if websocket_connections:
-        disconnected = []
-        for websocket in websocket_connections:
-            try:
-                await websocket.send_text(json.dumps(message))
-            except:
-                disconnected.append(websocket)
-        
-        # Remove disconnected websockets
-        for ws in disconnected:
-            if ws in websocket_connections:
-                websocket_connections.remove(ws)
+            broadcast_hub.handle_message(client, data)
+    except (WebSocketDisconnect, RuntimeError):
+        # RuntimeError: the hub already closed a client that fell too far behind
+        pass
+    finally:
+        broadcast_hub.disconnect(client)
 
 @app.post("/api/analyze")
 async def analyze_website(request: AnalysisRequest):
-    """Main endpoint to analyze a website"""
-    try:
-        # Initialize OpenRouter client with user's API key
-        global openrouter_client
-        openrouter_client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=request.openrouter_api_key
-        )
-        
-        # Generate unique analysis ID
-        analysis_id = str(uuid.uuid4())
-        
-        # Perform browser automation and data collection
-        browser_data = await capture_website_data(str(request.url), request.depth)
-        
-        # Perform AI analysis
-        ai_analysis = await analyze_with_ai(browser_data, str(request.url))
-        
-        # Process and structure the results
-        result = AnalysisResult(
-            id=analysis_id,
-            url=str(request.url),
-            timestamp=datetime.utcnow(),
-            network_requests=browser_data["network_requests"],
-            console_logs=browser_data["console_logs"],
-            page_info=browser_data["page_info"],
-            tech_stack=browser_data["tech_stack"],
-            api_endpoints=browser_data["api_endpoints"],
-            ai_analysis=ai_analysis,
-            security_observations=browser_data["security_observations"]
-        )
-        
-        # Store in database
-        await db.analyses.insert_one(result.dict())
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"Analysis failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
-
-async def capture_website_data(target_url: str, depth: str = "medium") -> Dict[str, Any]:
-    """Capture website data using Playwright"""
-    network_requests = []
-    console_logs = []
-    tech_stack = []
-    api_endpoints = []
-    security_observations = []
-    page_info = {}
-    
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(
-            user_agent="Website Analyzer Bot 1.0",
-            viewport={"width": 1920, "height": 1080}
-        )
-        page = await context.new_page()
-        
-        # Capture network requests
-        def handle_request(request):
-            try:
-                network_requests.append({
-                    "url": request.url,
-                    "method": request.method,
-                    "headers": dict(request.headers),
-                    "resource_type": request.resource_type,
-                    "status": 0,  # Will be updated in response handler
-                    "response_type": "",  # Will be updated in response handler
-                    "response_size": 0  # Will be updated in response handler
-                })
-            except Exception as e:
-                logger.warning(f"Failed to capture request: {e}")
-        
-        def handle_response(response):
-            try:
-                # Look for API endpoints
-                if any(api_indicator in response.url.lower() for api_indicator in ['/api/', '/v1/', '/v2/', '.json', '/graphql', '/rest/']):
-                    api_endpoints.append({
-                        "url": response.url,
-                        "status": response.status,
-                        "method": response.request.method,
-                        "content_type": response.headers.get("content-type", "")
-                    })
-                
-                # Update network requests with response data
-                for req in network_requests:
-                    if req["url"] == response.url:
-                        req.update({
-                            "status": response.status,
-                            "response_type": response.headers.get("content-type", ""),
-                            "response_size": int(response.headers.get("content-length", "0")) if response.headers.get("content-length", "0").isdigit() else 0
-                        })
-                        break
-                        
-            except Exception as e:
-                logger.warning(f"Failed to capture response: {e}")
-        
-        # Capture console logs
-        def handle_console_log(msg):
-            try:
-                console_logs.append({
-                    "type": msg.type,
-                    "text": msg.text,
-                    "timestamp": datetime.utcnow().isoformat()
-                })
-            except Exception as e:
-                logger.warning(f"Failed to capture console log: {e}")
-        
-        page.on("request", handle_request)
-        page.on("response", handle_response)
-        page.on("console", handle_console_log)
-        
-        try:
-            # Navigate to the target URL
-            response = await page.goto(target_url, wait_until="networkidle", timeout=30000)
-            
-            # Basic page info
-            page_info = {
-                "title": await page.title(),
-                "url": page.url,
-                "status": response.status if response else 0,
-                "load_time": datetime.utcnow().isoformat()
-            }
-            
-            # Wait for dynamic content based on depth
-            wait_time = {"light": 2000, "medium": 5000, "deep": 10000}.get(depth, 5000)
-            await page.wait_for_timeout(wait_time)
-            
-            # Analyze tech stack from page content
-            tech_stack = await analyze_tech_stack(page)
-            
-            # Security observations
-            security_observations = await analyze_security(page, network_requests)
-            
-            # If deep analysis, interact with page elements
-            if depth == "deep":
-                await interact_with_page(page)
-                await page.wait_for_timeout(3000)
-            
-        except Exception as e:
-            logger.error(f"Error during page analysis: {e}")
-            page_info["error"] = str(e)
-        
-        await browser.close()
-    
-    return {
-        "network_requests": [
-            {
-                "url": req.get("url", ""),
-                "method": req.get("method", "GET"),
-                "status": req.get("status", 0),
-                "response_type": req.get("response_type", ""),
-                "headers": req.get("headers", {}),
-                "response_size": req.get("response_size", 0)
-            }
-            for req in network_requests 
-            if req.get("url") and req.get("method")
-        ],
-        "console_logs": [log["text"] for log in console_logs[:50]],  # Limit logs
-        "page_info": page_info,
-        "tech_stack": tech_stack,
-        "api_endpoints": [ep["url"] for ep in api_endpoints],
-        "security_observations": security_observations
-    }
-
-async def analyze_tech_stack(page) -> List[str]:
-    """Analyze the technology stack used by the website"""
-    tech_stack = []
-    
+    """Queue a website analysis and return its job id right away"""
     try:
-        # Check for common JavaScript libraries and frameworks
-        js_check = await page.evaluate("""
-            () => {
-                const techs = [];
-                
-                // Check for popular libraries/frameworks
-                if (typeof React !== 'undefined') techs.push('React');
-                if (typeof Vue !== 'undefined') techs.push('Vue.js');
-                if (typeof angular !== 'undefined') techs.push('Angular');
-                if (typeof jQuery !== 'undefined') techs.push('jQuery');
-                if (typeof $ !== 'undefined') techs.push('jQuery');
-                if (typeof bootstrap !== 'undefined') techs.push('Bootstrap');
-                if (window.dataLayer) techs.push('Google Analytics');
-                if (window.gtag) techs.push('Google Analytics 4');
-                if (window.fbq) techs.push('Facebook Pixel');
-                
-                // Check meta tags and scripts
-                const scripts = Array.from(document.scripts);
-                scripts.forEach(script => {
-                    if (script.src.includes('react')) techs.push('React');
-                    if (script.src.includes('vue')) techs.push('Vue.js');
-                    if (script.src.includes('angular')) techs.push('Angular');
-                    if (script.src.includes('jquery')) techs.push('jQuery');
-                    if (script.src.includes('bootstrap')) techs.push('Bootstrap');
-                    if (script.src.includes('stripe')) techs.push('Stripe');
-                    if (script.src.includes('paypal')) techs.push('PayPal');
-                });
-                
-                // Check generator meta tag
-                const generator = document.querySelector('meta[name="generator"]');
-                if (generator) techs.push(generator.content);
-                
-                return [...new Set(techs)];
-            }
-        """)
-        
-        tech_stack.extend(js_check)
-        
+        job = await analysis_scheduler.enqueue(request)
+        return serialize_job(job)
     except Exception as e:
-        logger.warning(f"Failed to analyze tech stack: {e}")
-    
-    return list(set(tech_stack))
+        logger.error(f"Failed to queue analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue analysis: {str(e)}")
 
-async def analyze_security(page, network_requests) -> List[str]:
-    """Analyze security aspects of the website"""
-    observations = []
-    
+@app.get("/api/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Poll the status of an analysis job, including its result once completed"""
     try:
-        # Check for HTTPS
-        if not page.url.startswith('https://'):
-            observations.append("Website not using HTTPS")
-        
-        # Check for mixed content
-        http_requests = [req for req in network_requests if req.get("url", "").startswith("http://")]
-        if http_requests and page.url.startswith('https://'):
-            observations.append(f"Mixed content detected: {len(http_requests)} HTTP requests on HTTPS page")
-        
-        # Check for common security headers
-        security_headers = ['strict-transport-security', 'content-security-policy', 'x-frame-options']
-        # This would require analyzing response headers from network requests
-        
+        job = await db.analysis_jobs.find_one({"id": job_id}, {"openrouter_api_key": 0})
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        response = serialize_job(job)
+        if job["status"] == "completed" and job.get("analysis_id"):
+            analysis = await db.analyses.find_one({"id": job["analysis_id"]})
+            response["result"] = serialize_mongo_doc(analysis)
+        elif job.get("capture_preview"):
+            response["capture"] = job["capture_preview"]
+        return response
+
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.warning(f"Failed to analyze security: {e}")
-    
-    return observations
-
-async def interact_with_page(page):
-    """Interact with page elements for deeper analysis"""
-    try:
-        # Try to find and click common interactive elements
-        interactive_selectors = [
-            'button[data-testid]',
-            'button[class*="btn"]',
-            'a[href*="api"]',
-            '[role="button"]'
-        ]
-        
-        for selector in interactive_selectors:
-            elements = await page.query_selector_all(selector)
-            if elements and len(elements) > 0:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch job: {str(e)}")
+
+@app.get("/api/jobs/{job_id}/stream")
+async def stream_analysis_job(job_id: str):
+    """Stream one analysis as server-sent events.
+
+    ``analysis_capture`` arrives as soon as the page is captured, then ``analysis_token``
+    chunks of the AI report, and finally ``result`` with the stored analysis (or ``error``).
+    """
+    async def load_job() -> Optional[Dict[str, Any]]:
+        return await db.analysis_jobs.find_one({"id": job_id}, {"openrouter_api_key": 0})
+
+    job = await load_job()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    channel = job_channel(job_id)
+    queue = broadcast_hub.listen(channel)
+
+    def sse(event: str, data: Any) -> str:
+        payload = data if isinstance(data, str) else json.dumps(data, default=str)
+        return f"event: {event}\ndata: {payload}\n\n"
+
+    async def finish(job: Optional[Dict[str, Any]]):
+        # The job or its analysis may have expired since the stream started
+        if job is None:
+            return sse("error", {"job_id": job_id, "error": "Job not found"})
+        if job["status"] == "completed" and job.get("analysis_id"):
+            analysis = await db.analyses.find_one({"id": job["analysis_id"]})
+            if analysis is None:
+                return sse("error", {"job_id": job_id, "error": "Analysis not found"})
+            return sse("result", serialize_mongo_doc(analysis))
+        return sse("error", {"job_id": job_id, "error": job.get("error")})
+
+    async def events():
+        try:
+            yield sse("analysis_job", {"type": "analysis_job", "job": serialize_job(job)})
+            if job["status"] in ("completed", "failed"):
+                yield await finish(job)
+                return
+            if job.get("capture_preview"):
+                yield sse("analysis_capture", {"type": "analysis_capture", "job_id": job_id,
+                                               "capture": job["capture_preview"]})
+            while True:
                 try:
-                    await elements[0].click(timeout=1000)
-                    await page.wait_for_timeout(500)
-                    break
-                except:
+                    payload = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Keep proxies from closing the connection, and catch a missed completion
+                    current = await load_job()
+                    if current is None or current["status"] in ("completed", "failed"):
+                        yield await finish(current)
+                        return
+                    yield ": keep-alive\n\n"
                     continue
-                    
-    except Exception as e:
-        logger.warning(f"Failed to interact with page: {e}")
+                message = json.loads(payload)
+                yield sse(message["type"], payload)
+                if message["type"] == "analysis_job" and message["job"]["status"] in ("completed", "failed"):
+                    yield await finish(await load_job())
+                    return
+        finally:
+            broadcast_hub.unlisten(channel, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering stops nginx from holding the stream back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class EventLoopLagMonitor:
+    """Samples how late the event loop wakes up, to catch blocking calls in handlers"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task = None
+        self._samples = 0
+        self._lag_ms_total = 0.0
+        self._lag_ms_max = 0.0
+        self._lag_ms_last = 0.0
+
+    def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.monotonic() - expected) * 1000)
+            self._samples += 1
+            self._lag_ms_total += lag_ms
+            self._lag_ms_max = max(self._lag_ms_max, lag_ms)
+            self._lag_ms_last = lag_ms
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "last_ms": round(self._lag_ms_last, 2),
+            "avg_ms": round(self._lag_ms_total / self._samples, 2) if self._samples else 0.0,
+            "max_ms": round(self._lag_ms_max, 2)
+        }
 
-async def analyze_with_ai(browser_data: Dict, target_url: str) -> str:
-    """Analyze the captured data using OpenRouter AI"""
-    try:
-        # Prepare data for AI analysis
-        analysis_prompt = f"""
-Analyze this website reverse engineering data for: {target_url}
-
-NETWORK REQUESTS ({len(browser_data.get('network_requests', []))} total):
-{json.dumps(browser_data.get('network_requests', [])[:10], indent=2)}
-
-API ENDPOINTS DISCOVERED:
-{json.dumps(browser_data.get('api_endpoints', []), indent=2)}
-
-TECHNOLOGY STACK:
-{json.dumps(browser_data.get('tech_stack', []), indent=2)}
-
-CONSOLE LOGS (sample):
-{json.dumps(browser_data.get('console_logs', [])[:5], indent=2)}
-
-PAGE INFO:
-{json.dumps(browser_data.get('page_info', {}), indent=2)}
-
-SECURITY OBSERVATIONS:
-{json.dumps(browser_data.get('security_observations', []), indent=2)}
-
-Please provide a comprehensive analysis including:
-1. **Architecture Overview**: What type of application this appears to be
-2. **Technology Stack**: Detailed breakdown of technologies used
-3. **API Analysis**: Analysis of discovered API endpoints and their purposes
-4. **Data Flow**: How data appears to flow through the application
-5. **Security Assessment**: Security posture and potential vulnerabilities
-6. **Integration Points**: External services and third-party integrations
-7. **Performance Insights**: Notable performance characteristics
-8. **Reverse Engineering Summary**: Key insights for developers wanting to understand this application
-
-Keep the analysis technical but accessible, focusing on actionable insights.
-"""
-
-        response = openrouter_client.chat.completions.create(
-            model="google/gemini-2.5-flash-preview-05-20",
-            messages=[{"role": "user", "content": analysis_prompt}],
-            max_tokens=2000,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content
-        
-    except Exception as e:
-        logger.error(f"AI analysis failed: {e}")
-        return f"AI analysis failed: {str(e)}. Raw data analysis shows {len(browser_data.get('network_requests', []))} network requests, {len(browser_data.get('api_endpoints', []))} API endpoints discovered, and {len(browser_data.get('tech_stack', []))} technologies identified."
+event_loop_monitor = EventLoopLagMonitor()
 
 def serialize_mongo_doc(doc):
     """Convert MongoDB document to JSON serializable format"""
@@ -582,6 +353,8 @@ def serialize_mongo_doc(doc):
     # Convert ObjectId to string
     if '_id' in doc:
         doc['_id'] = str(doc['_id'])
+    if doc.get('capture') and 'file_id' in doc['capture']:
+        doc['capture']['file_id'] = str(doc['capture']['file_id'])
     
     # Handle datetime objects
     if 'timestamp' in doc and hasattr(doc['timestamp'], 'isoformat'):
@@ -589,17 +362,138 @@ def serialize_mongo_doc(doc):
     
     return doc
 
+# Fields returned by the listing endpoints; detail endpoints return full documents
+ANALYSIS_SUMMARY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "url": 1,
+    "host": 1,
+    "timestamp": 1,
+    "tech_stack": 1,
+    "page_info.title": 1,
+    "page_info.status": 1,
+    "capture.summary": 1,
+    "api_endpoint_count": {"$size": {"$ifNull": ["$api_endpoints", []]}},
+    # Older analyses have no capture summary, so count the inline requests instead
+    "request_count": {"$size": {"$ifNull": ["$network_requests", []]}}
+}
+
+LIVE_SESSION_SUMMARY_FIELDS = {
+    "_id": 0,
+    "id": 1,
+    "sessionId": 1,
+    "url": 1,
+    "hostname": 1,
+    "status": 1,
+    "startTime": 1,
+    "endTime": 1,
+    "lastUpdate": 1,
+    "eventCount": 1,
+    "eventTypes": 1,
+    "recentEvents": 1
+}
+
+def encode_cursor(sort_value: datetime, tie_breaker: str) -> str:
+    payload = json.dumps([sort_value.isoformat(), tie_breaker])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        sort_value, tie_breaker = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(sort_value), tie_breaker
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(sort_field: str, tie_field: str, sort_value: datetime, tie_breaker: str) -> Dict[str, Any]:
+    """Match documents strictly after the cursor in (sort_field desc, tie_field desc) order"""
+    return {"$or": [
+        {sort_field: {"$lt": sort_value}},
+        {sort_field: sort_value, tie_field: {"$lt": tie_breaker}}
+    ]}
+
+def paginate(docs: List[Dict[str, Any]], limit: int, sort_field: str, tie_field: str) -> Dict[str, Any]:
+    """Build a page from ``limit + 1`` fetched documents"""
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    next_cursor = None
+    if has_more and docs and isinstance(docs[-1].get(sort_field), datetime):
+        next_cursor = encode_cursor(docs[-1][sort_field], docs[-1][tie_field])
+    return {
+        "items": [serialize_summary(doc) for doc in docs],
+        "next_cursor": next_cursor
+    }
+
+def serialize_summary(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-safe copy of a projected listing document"""
+    return {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in doc.items()
+        if key != "_id"
+    }
+
 @app.get("/api/analyses")
-async def get_analyses():
-    """Get all previous analyses"""
+async def get_analyses(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    host: Optional[str] = None,
+    status: Optional[int] = None
+):
+    """List previous analyses (summary fields only), newest first, with keyset pagination"""
     try:
-        analyses = await db.analyses.find().sort("timestamp", -1).limit(50).to_list(50)
-        # Serialize all documents
-        serialized_analyses = [serialize_mongo_doc(analysis) for analysis in analyses]
-        return serialized_analyses
+        query: Dict[str, Any] = {}
+        if host:
+            query["host"] = host
+        if status is not None:
+            query["page_info.status"] = status
+        if cursor:
+            query.update(keyset_filter("timestamp", "id", *decode_cursor(cursor)))
+        
+        analyses = await db.analyses.aggregate([
+            {"$match": query},
+            {"$sort": {"timestamp": -1, "id": -1}},
+            {"$limit": limit + 1},
+            {"$project": ANALYSIS_SUMMARY_PROJECTION}
+        ]).to_list(limit + 1)
+        return paginate(analyses, limit, "timestamp", "id")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch analyses: {str(e)}")
 
+HISTORY_PROJECTION = {
+    "_id": 0, "id": 1, "url": 1, "timestamp": 1, "status": "$page_info.status", "diff": 1, "incremental": 1
+}
+
+@app.get("/api/history")
+async def get_history(
+    url: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    changed_only: bool = False
+):
+    """Structural diffs between successive analyses of a URL, newest first, with keyset pagination"""
+    try:
+        # Analyses store the URL as pydantic normalized it
+        query: Dict[str, Any] = {"url": str(TypeAdapter(HttpUrl).validate_python(url))}
+        if changed_only:
+            query["diff.changed"] = True
+        if cursor:
+            query.update(keyset_filter("timestamp", "id", *decode_cursor(cursor)))
+        
+        analyses = await db.analyses.aggregate([
+            {"$match": query},
+            {"$sort": {"timestamp": -1, "id": -1}},
+            {"$limit": limit + 1},
+            {"$project": HISTORY_PROJECTION}
+        ]).to_list(limit + 1)
+        return paginate(analyses, limit, "timestamp", "id")
+    except HTTPException:
+        raise
+    except ValidationError:
+        raise HTTPException(status_code=400, detail="Invalid url")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch history: {str(e)}")
+
 @app.get("/api/analyses/{analysis_id}")
 async def get_analysis(analysis_id: str):
     """Get a specific analysis by ID"""
@@ -611,15 +505,362 @@ async def get_analysis(analysis_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch analysis: {str(e)}")
 
+@app.get("/api/analyses/{analysis_id}/capture")
+async def download_capture(analysis_id: str):
+    """Stream the full capture of an analysis as a gzip-compressed HAR file"""
+    analysis = await db.analyses.find_one({"id": analysis_id}, {"capture": 1})
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    if not analysis.get("capture"):
+        raise HTTPException(status_code=404, detail="No stored capture for this analysis")
+    # Open before responding, so a capture removed since is a 404 rather than a broken download
+    try:
+        chunks = await capture_store.open_stream(analysis["capture"])
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Stored capture is missing")
+    
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{analysis_id}.har.gz"'}
+    )
+
+# Schedule fields returned by the API; the API key and run history stay server-side
+SCHEDULE_PROJECTION = {"_id": 0, "openrouter_api_key": 0, "runs": 0}
+
+def schedule_next_run(cron: str) -> tuple:
+    try:
+        return recurring_scheduler.next_run(CronSchedule(cron), datetime.utcnow())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/schedules")
+async def create_schedule(request: ScheduleRequest):
+    """Analyze a URL on a cron schedule"""
+    scheduled_for, next_run_at = schedule_next_run(request.cron)
+    schedule = {
+        "id": str(uuid.uuid4()),
+        "url": str(request.url),
+        "cron": request.cron.strip(),
+        "openrouter_api_key": request.openrouter_api_key,
+        "depth": request.depth if request.depth in ANALYSIS_CONCURRENCY else "medium",
+        "priority": SCHEDULE_PRIORITY if request.priority is None else request.priority,
+        "mode": request.mode or "single",
+        "profile": request.profile or "full",
+        "max_pages": request.max_pages,
+        "max_crawl_depth": request.max_crawl_depth,
+        "incremental": bool(request.incremental),
+        "enabled": bool(request.enabled),
+        "scheduled_for": scheduled_for,
+        "next_run_at": next_run_at,
+        "created_at": datetime.utcnow(),
+        "run_count": 0,
+        "failure_count": 0,
+        "skipped_runs": 0
+    }
+    try:
+        await db.analysis_schedules.insert_one(dict(schedule))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to create schedule: {str(e)}")
+    recurring_scheduler.wake()
+    return serialize_summary({key: value for key, value in schedule.items() if key not in SCHEDULE_PROJECTION})
+
+@app.get("/api/schedules")
+async def get_schedules(
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    url: Optional[str] = None
+):
+    """List schedules, newest first, with keyset pagination"""
+    try:
+        query: Dict[str, Any] = {}
+        if url:
+            query["url"] = url
+        if cursor:
+            query.update(keyset_filter("created_at", "id", *decode_cursor(cursor)))
+        
+        schedules = await db.analysis_schedules.find(query, SCHEDULE_PROJECTION).sort(
+            [("created_at", -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        return paginate(schedules, limit, "created_at", "id")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch schedules: {str(e)}")
+
+@app.patch("/api/schedules/{schedule_id}")
+async def update_schedule(schedule_id: str, update: ScheduleUpdate):
+    """Change a schedule's cron expression or API key, or pause and resume it"""
+    changes: Dict[str, Any] = {}
+    if update.cron is not None:
+        changes["cron"] = update.cron.strip()
+        changes["scheduled_for"], changes["next_run_at"] = schedule_next_run(update.cron)
+    if update.enabled is not None:
+        changes["enabled"] = update.enabled
+    if update.openrouter_api_key:
+        changes["openrouter_api_key"] = update.openrouter_api_key
+    try:
+        if changes:
+            schedule = await db.analysis_schedules.find_one_and_update(
+                {"id": schedule_id}, {"$set": changes},
+                projection=SCHEDULE_PROJECTION, return_document=ReturnDocument.AFTER
+            )
+        else:
+            schedule = await db.analysis_schedules.find_one({"id": schedule_id}, SCHEDULE_PROJECTION)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to update schedule: {str(e)}")
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    recurring_scheduler.wake()
+    return serialize_summary(schedule)
+
+@app.delete("/api/schedules/{schedule_id}")
+async def delete_schedule(schedule_id: str):
+    """Stop analyzing a URL on a schedule; past analyses are kept"""
+    result = await db.analysis_schedules.delete_one({"id": schedule_id})
+    if not result.deleted_count:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return {"status": "deleted", "id": schedule_id}
+
+@app.get("/api/schedules/{schedule_id}/trends")
+async def get_schedule_trends(schedule_id: str, days: int = Query(30, ge=1, le=365)):
+    """Run duration and failure trends for a scheduled target"""
+    schedule = await db.analysis_schedules.find_one({"id": schedule_id}, {"_id": 0, "openrouter_api_key": 0})
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    runs = schedule.pop("runs", [])
+    return {
+        "schedule": serialize_summary(schedule),
+        "trends": run_trends(runs, days),
+        "recent_runs": [serialize_summary(run) for run in runs[-10:]]
+    }
+
+def retention_seconds(days: int) -> Optional[int]:
+    return days * 86400 if days > 0 else None
+
+# Every index the app relies on, declared in one place and created by migrate_indexes()
+INDEX_SPECS = [
+    # analyses: detail lookups, keyset listings and their filters
+    ("analyses", [("id", 1)], {"name": "id_unique", "unique": True}),
+    ("analyses", [("timestamp", -1), ("id", -1)], {"name": "timestamp_id"}),
+    ("analyses", [("host", 1), ("timestamp", -1), ("id", -1)], {"name": "host_timestamp_id"}),
+    ("analyses", [("url", 1), ("timestamp", -1), ("id", -1)], {"name": "url_timestamp_id"}),
+    ("analyses", [("page_info.status", 1), ("timestamp", -1), ("id", -1)], {"name": "status_timestamp_id"}),
+    ("analyses", [("diff.base_id", 1)], {"name": "diff_base_id", "sparse": True}),
+    # live_sessions: ingest upserts, detail lookups, listings and retention
+    ("live_sessions", [("sessionId", 1)], {"name": "sessionId_unique", "unique": True}),
+    ("live_sessions", [("status", 1), ("startTime", -1), ("sessionId", -1)], {"name": "status_startTime_sessionId"}),
+    ("live_sessions", [("hostname", 1), ("status", 1), ("startTime", -1), ("sessionId", -1)],
+     {"name": "hostname_status_startTime_sessionId"}),
+    ("live_sessions", [("status", 1), ("lastUpdate", 1)], {"name": "status_lastUpdate"}),
+    ("live_sessions", [("lastUpdate", 1)],
+     {"name": "lastUpdate_ttl", "expireAfterSeconds": retention_seconds(LIVE_SESSION_RETENTION_DAYS)}),
+    # live_session_events: bucket upserts and range reads
+    ("live_session_events", [("sessionId", 1), ("bucket", 1)], {"name": "sessionId_bucket_unique", "unique": True}),
+    ("live_session_events", [("end_time", 1)],
+     {"name": "end_time_ttl", "expireAfterSeconds": retention_seconds(LIVE_SESSION_RETENTION_DAYS)}),
+    # analysis_jobs: polling, claiming queued work, stale-job recovery and retention
+    ("analysis_jobs", [("id", 1)], {"name": "id_unique", "unique": True}),
+    ("analysis_jobs", [("status", 1), ("depth", 1), ("priority", -1), ("created_at", 1)],
+     {"name": "status_depth_priority_created_at"}),
+    ("analysis_jobs", [("status", 1), ("started_at", 1)], {"name": "status_started_at"}),
+    ("analysis_jobs", [("finished_at", 1)],
+     {"name": "finished_at_ttl", "expireAfterSeconds": retention_seconds(ANALYSIS_JOB_RETENTION_DAYS)}),
+    # analysis_schedules: detail lookups, claiming due runs and listings
+    ("analysis_schedules", [("id", 1)], {"name": "id_unique", "unique": True}),
+    ("analysis_schedules", [("enabled", 1), ("next_run_at", 1)], {"name": "enabled_next_run_at"}),
+    ("analysis_schedules", [("created_at", -1), ("id", -1)], {"name": "created_at_id"}),
+    # ai_cache: lookups and expiry
+    ("ai_cache", [("key", 1)], {"name": "key_unique", "unique": True}),
+    ("ai_cache", [("expires_at", 1)], {"name": "expires_at_ttl", "expireAfterSeconds": 0}),
+]
+
+async def migrate_indexes() -> Dict[str, List[str]]:
+    """Create declared indexes, and update TTLs on existing ones when retention changes"""
+    report = {"created": [], "updated": [], "dropped": [], "failed": []}
+    for collection_name, keys, options in INDEX_SPECS:
+        options = dict(options)
+        name = options["name"]
+        label = f"{collection_name}.{name}"
+        collection = db[collection_name]
+        ttl = options.get("expireAfterSeconds", "unset")
+        try:
+            existing = await collection.index_information()
+            if ttl is None:
+                # Retention disabled: make sure no TTL index is left behind
+                if name in existing:
+                    await collection.drop_index(name)
+                    report["dropped"].append(label)
+                continue
+            if name in existing:
+                if ttl != "unset" and existing[name].get("expireAfterSeconds") != ttl:
+                    await db.command("collMod", collection_name, index={"name": name, "expireAfterSeconds": ttl})
+                    report["updated"].append(label)
+                continue
+            await collection.create_index(keys, **options)
+            report["created"].append(label)
+        except OperationFailure as e:
+            if e.code == 85:
+                # IndexOptionsConflict: the same keys are already indexed under another name
+                continue
+            # E.g. duplicates blocking a unique index; the app still works, just slower
+            logger.error(f"Failed to migrate index {label}: {e}")
+            report["failed"].append(label)
+
+    logger.info(
+        f"Index migration: {len(report['created'])} created, {len(report['updated'])} updated, "
+        f"{len(report['dropped'])} dropped, {len(report['failed'])} failed"
+    )
+    return report
+
+# Hot queries checked by the query plan diagnostics, with representative values
+HOT_QUERIES = [
+    {"name": "analysis by id", "collection": "analyses", "filter": {"id": "diagnostic"}},
+    {"name": "analyses listing", "collection": "analyses", "filter": {},
+     "sort": [("timestamp", -1), ("id", -1)]},
+    {"name": "analyses listing by host", "collection": "analyses", "filter": {"host": "example.com"},
+     "sort": [("timestamp", -1), ("id", -1)]},
+    {"name": "analyses history by url", "collection": "analyses", "filter": {"url": "https://example.com/"},
+     "sort": [("timestamp", -1), ("id", -1)]},
+    {"name": "live session by sessionId", "collection": "live_sessions", "filter": {"sessionId": "diagnostic"}},
+    {"name": "active live sessions listing", "collection": "live_sessions", "filter": {"status": "active"},
+     "sort": [("startTime", -1), ("sessionId", -1)]},
+    {"name": "idle live sessions", "collection": "live_sessions",
+     "filter": {"status": "active", "lastUpdate": {"$lt": datetime(1970, 1, 1)}}},
+    {"name": "live session event buckets", "collection": "live_session_events",
+     "filter": {"sessionId": "diagnostic", "bucket": {"$gte": 0, "$lte": 1}}},
+    {"name": "analysis job by id", "collection": "analysis_jobs", "filter": {"id": "diagnostic"}},
+    {"name": "next queued analysis job", "collection": "analysis_jobs", "filter": {"status": "queued", "depth": "medium"},
+     "sort": [("priority", -1), ("created_at", 1)]},
+    {"name": "stale running analysis jobs", "collection": "analysis_jobs",
+     "filter": {"status": "running", "started_at": {"$lt": datetime(1970, 1, 1)}}},
+    {"name": "due analysis schedules", "collection": "analysis_schedules",
+     "filter": {"enabled": True, "next_run_at": {"$lte": datetime(1970, 1, 1)}}, "sort": [("next_run_at", 1)]},
+    {"name": "analyses past retention", "collection": "analyses",
+     "filter": {"timestamp": {"$lt": datetime(1970, 1, 1)}, "retention": {"$exists": False}}},
+    {"name": "ai cache lookup", "collection": "ai_cache", "filter": {"key": "diagnostic"}},
+]
+
+def plan_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a winning plan tree into its stages"""
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        if not isinstance(node, dict):
+            continue
+        if "stage" in node:
+            stages.append({"stage": node["stage"], "index": node.get("indexName")})
+        pending.extend(node.get("inputStages", []))
+        for key in ("inputStage", "queryPlan"):
+            if key in node:
+                pending.append(node[key])
+    return stages
+
+async def explain_hot_queries() -> Dict[str, Any]:
+    """Run explain() on every hot query and flag collection scans"""
+    results = []
+    for query in HOT_QUERIES:
+        cursor = db[query["collection"]].find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        try:
+            explanation = await cursor.limit(1).explain()
+            stages = plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+            results.append({
+                "name": query["name"],
+                "collection": query["collection"],
+                "stages": [stage["stage"] for stage in stages],
+                "indexes": sorted({stage["index"] for stage in stages if stage["index"]}),
+                "collscan": any(stage["stage"] == "COLLSCAN" for stage in stages)
+            })
+        except Exception as e:
+            results.append({"name": query["name"], "collection": query["collection"], "error": str(e)})
+    return {
+        "ok": not any(result.get("collscan") or result.get("error") for result in results),
+        "queries": results
+    }
+
+@app.get("/api/diagnostics/query-plans")
+async def get_query_plans():
+    """Explain the hot queries and report any that fall back to a collection scan"""
+    try:
+        return await explain_hot_queries()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to explain queries: {str(e)}")
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "service": "Website Reverse Engineering Tool",
-        "timestamp": datetime.utcnow().isoformat()
+        "service": APP_TITLE,
+        "timestamp": datetime.utcnow().isoformat(),
+        "browser_pool": browser_pool.stats(),
+        "analysis_jobs": analysis_scheduler.stats(),
+        "llm": llm_client.stats(),
+        "ai_cache": ai_cache.stats(),
+        "live_event_buffer": live_event_buffer.stats(),
+        "live_session_store": live_session_store.stats(),
+        "websockets": broadcast_hub.stats(),
+        "live_insights": live_insight_trigger.stats(),
+        "fingerprints": fingerprint_engine.stats(),
+        "schedules": recurring_scheduler.stats(),
+        "analysis_retention": analysis_retention.stats(),
+        "event_loop_lag": event_loop_monitor.stats()
     }
 
+@app.on_event("startup")
+async def startup_event():
+    """Warm up long-lived resources"""
+    event_loop_monitor.start()
+    live_event_buffer.start()
+    live_session_store.start()
+    await broadcast_hub.start()
+    try:
+        await migrate_indexes()
+    except Exception as e:
+        logger.error(f"Index migration failed: {e}")
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        # The pool retries on first lease; don't block the API from starting
+        logger.error(f"Failed to warm up browser pool: {e}")
+    await analysis_scheduler.start()
+    recurring_scheduler.start()
+    analysis_retention.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release long-lived resources"""
+    await live_insight_trigger.stop()
+    await broadcast_hub.stop()
+    recurring_scheduler.stop()
+    analysis_retention.stop()
+    await analysis_scheduler.stop()
+    live_session_store.stop()
+    await live_event_buffer.stop()
+    await browser_pool.stop()
+    await llm_client.close()
+    event_loop_monitor.stop()
+
+async def run_index_check():
+    """CLI: apply index migrations, then print the query plan report"""
+    await migrate_indexes()
+    report = await explain_hot_queries()
+    for result in report["queries"]:
+        if result.get("error"):
+            status = f"ERROR {result['error']}"
+        elif result["collscan"]:
+            status = "COLLSCAN"
+        else:
+            status = "ok " + ", ".join(result["indexes"])
+        print(f"{result['collection']:<22} {result['name']:<32} {status}")
+    return 0 if report["ok"] else 1
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "check-indexes":
+        sys.exit(asyncio.run(run_index_check()))
+    
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,239 @@
+"""Out-of-line storage of full captures as gzip-compressed HAR"""
+
+from typing import Dict, Any
+import os
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from datetime import datetime
+import asyncio
+import json
+import zlib
+from urllib.parse import urlparse
+
+from config import APP_TITLE, APP_VERSION, CAPTURE_DIR, CAPTURE_STORAGE
+from database import db
+
+def har_timings(timing: Dict[str, float]) -> Dict[str, float]:
+    """Convert Playwright resource timing into HAR phase durations (-1 when unknown)"""
+    def phase(start_key, end_key):
+        start, end = timing.get(start_key, -1), timing.get(end_key, -1)
+        return round(end - start, 3) if start >= 0 and end >= start else -1
+
+    return {
+        "blocked": -1,
+        "dns": phase("domainLookupStart", "domainLookupEnd"),
+        "connect": phase("connectStart", "connectEnd"),
+        "ssl": phase("secureConnectionStart", "connectEnd"),
+        "send": 0,
+        "wait": phase("requestStart", "responseStart"),
+        "receive": phase("responseStart", "responseEnd")
+    }
+
+def har_entry(req: Dict[str, Any], fallback_started: str) -> Dict[str, Any]:
+    """One HAR 1.2 entry for a captured request"""
+    timing = req.get("timing") or {}
+    started = timing.get("startTime")
+    started_iso = datetime.utcfromtimestamp(started / 1000).isoformat() + "Z" if started else fallback_started
+    url = req.get("url", "")
+    query = urlparse(url).query
+    return {
+        "startedDateTime": started_iso,
+        "time": timing.get("responseEnd", -1),
+        "request": {
+            "method": req.get("method", "GET"),
+            "url": url,
+            "httpVersion": "",
+            "headers": [{"name": name, "value": value} for name, value in (req.get("headers") or {}).items()],
+            "queryString": [
+                {"name": name, "value": value}
+                for name, _, value in (pair.partition("=") for pair in query.split("&") if pair)
+            ],
+            "cookies": [],
+            "headersSize": -1,
+            "bodySize": req.get("request_size", 0)
+        },
+        "response": {
+            "status": req.get("status", 0),
+            "statusText": "",
+            "httpVersion": "",
+            "headers": [{"name": name, "value": value} for name, value in (req.get("response_headers") or {}).items()],
+            "cookies": [],
+            "content": {"size": req.get("response_size", 0), "mimeType": req.get("response_type", "")},
+            "redirectURL": "",
+            "headersSize": -1,
+            "bodySize": req.get("response_size", 0)
+        },
+        "cache": {},
+        "timings": har_timings(timing),
+        "_resourceType": req.get("resource_type", ""),
+        "_redirectChain": req.get("redirect_chain", []),
+        "_failure": req.get("failure"),
+        "_blocked": req.get("blocked")
+    }
+
+def iter_har_chunks(target_url: str, browser_data: Dict[str, Any]):
+    """Serialize a capture as HAR one entry at a time, so large captures are never one big string"""
+    page_info = browser_data.get("page_info", {})
+    started = datetime.utcnow().isoformat() + "Z"
+    header = {
+        "version": "1.2",
+        "creator": {"name": APP_TITLE, "version": APP_VERSION},
+        "pages": [{
+            "id": "page_1",
+            "title": page_info.get("title", target_url),
+            "startedDateTime": started,
+            "pageTimings": {}
+        }]
+    }
+    yield '{"log":' + json.dumps(header, separators=(",", ":"))[:-1] + ',"entries":['
+    for index, req in enumerate(browser_data.get("network_requests", [])):
+        entry = har_entry(req, started)
+        entry["pageref"] = "page_1"
+        yield ("," if index else "") + json.dumps(entry, separators=(",", ":"), default=str)
+    yield '],"_consoleLogs":' + json.dumps(browser_data.get("console_logs", []), separators=(",", ":"))
+    yield ',"_pageInfo":' + json.dumps(page_info, separators=(",", ":"), default=str) + '}}'
+
+def summarize_capture(browser_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary stats kept on the analysis document in place of the full capture"""
+    by_status: Dict[str, int] = {}
+    by_resource_type: Dict[str, int] = {}
+    failed = blocked = response_bytes = 0
+    requests = browser_data.get("network_requests", [])
+    for req in requests:
+        status = req.get("status", 0) or 0
+        status_class = f"{status // 100}xx" if status else "none"
+        by_status[status_class] = by_status.get(status_class, 0) + 1
+        resource_type = req.get("resource_type") or "other"
+        by_resource_type[resource_type] = by_resource_type.get(resource_type, 0) + 1
+        failed += 1 if req.get("failure") else 0
+        blocked += 1 if req.get("blocked") else 0
+        response_bytes += req.get("response_size", 0) or 0
+    return {
+        "requests": len(requests),
+        "by_status": by_status,
+        "by_resource_type": by_resource_type,
+        "failed": failed,
+        "blocked": blocked,
+        "response_bytes": response_bytes,
+        "console_logs": len(browser_data.get("console_logs", [])),
+        "api_endpoints": len(browser_data.get("api_endpoints", []))
+    }
+
+class CaptureStore:
+    """Stores captures as gzip-compressed HAR in GridFS or on local disk, and streams them back"""
+
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, storage: str, directory: str):
+        self.storage = storage
+        self.directory = directory
+
+    def _bucket(self):
+        return AsyncIOMotorGridFSBucket(db, bucket_name="captures")
+
+    async def save(self, analysis_id: str, target_url: str, browser_data: Dict[str, Any]) -> Dict[str, Any]:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+        filename = f"{analysis_id}.har.gz"
+        raw_bytes = compressed_bytes = 0
+
+        if self.storage == "local":
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, filename)
+            handle = await asyncio.to_thread(open, path, "wb")
+            write = lambda data: asyncio.to_thread(handle.write, data)
+        else:
+            handle = self._bucket().open_upload_stream(
+                filename,
+                metadata={"analysis_id": analysis_id, "url": target_url, "format": "har", "encoding": "gzip"}
+            )
+            write = handle.write
+
+        try:
+            pending = b""
+            for chunk in iter_har_chunks(target_url, browser_data):
+                data = chunk.encode("utf-8")
+                raw_bytes += len(data)
+                pending += compressor.compress(data)
+                if len(pending) >= self.CHUNK_SIZE:
+                    compressed_bytes += len(pending)
+                    await write(pending)
+                    pending = b""
+                    # Give other requests a turn while serializing large captures
+                    await asyncio.sleep(0)
+            pending += compressor.flush()
+            compressed_bytes += len(pending)
+            await write(pending)
+        except BaseException:
+            # Closing a GridFS upload would commit the truncated file, so abort it instead
+            if self.storage == "local":
+                await asyncio.to_thread(handle.close)
+                await asyncio.to_thread(os.remove, path)
+            else:
+                await handle.abort()
+            raise
+
+        if self.storage == "local":
+            await asyncio.to_thread(handle.close)
+        else:
+            await handle.close()
+
+        reference = {
+            "storage": self.storage,
+            "format": "har",
+            "encoding": "gzip",
+            "raw_bytes": raw_bytes,
+            "compressed_bytes": compressed_bytes,
+            "summary": summarize_capture(browser_data)
+        }
+        if self.storage == "local":
+            reference["path"] = filename
+        else:
+            reference["file_id"] = handle._id
+        return reference
+
+    async def open_stream(self, reference: Dict[str, Any]):
+        """Open a stored capture and return its compressed chunks as an async iterator.
+
+        Raises ``FileNotFoundError`` when the capture is gone, before anything is sent.
+        """
+        if reference.get("storage") == "local":
+            path = os.path.join(self.directory, os.path.basename(reference["path"]))
+            handle = await asyncio.to_thread(open, path, "rb")
+            return self._read_file(handle)
+        try:
+            grid_out = await self._bucket().open_download_stream(reference["file_id"])
+        except NoFile:
+            raise FileNotFoundError(f"Capture {reference['file_id']} is not in GridFS")
+        return self._read_grid(grid_out)
+
+    async def stream(self, reference: Dict[str, Any]):
+        """Yield the compressed capture in chunks without loading it into memory"""
+        async for chunk in await self.open_stream(reference):
+            yield chunk
+
+    async def _read_file(self, handle):
+        try:
+            while True:
+                chunk = await asyncio.to_thread(handle.read, self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await asyncio.to_thread(handle.close)
+
+    async def _read_grid(self, grid_out):
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+    async def delete(self, reference: Dict[str, Any]):
+        if reference.get("storage") == "local":
+            path = os.path.join(self.directory, os.path.basename(reference["path"]))
+            if os.path.exists(path):
+                await asyncio.to_thread(os.remove, path)
+        else:
+            await self._bucket().delete(reference["file_id"])
+
+capture_store = CaptureStore(storage=CAPTURE_STORAGE, directory=CAPTURE_DIR)
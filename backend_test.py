@@ -30,6 +30,18 @@ def test_health_check():
         print(f"❌ Health check test failed: {str(e)}")
         return False
 
+def wait_for_analysis_job(job_id, timeout=180):
+    """Poll an analysis job until it finishes and return the final job document"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = requests.get(f"{BACKEND_URL}/api/jobs/{job_id}")
+        response.raise_for_status()
+        job = response.json()
+        if job.get("status") in ("completed", "failed"):
+            return job
+        time.sleep(2)
+    raise TimeoutError(f"Analysis job {job_id} did not finish within {timeout}s")
+
 def test_analyze_endpoint():
     """Test the analyze endpoint with a valid URL"""
     print("\n=== Testing Analyze Endpoint ===")
@@ -45,7 +57,13 @@ def test_analyze_endpoint():
         print(f"Status Code: {response.status_code}")
         
         if response.status_code == 200:
-            result = response.json()
+            job = response.json()
+            print(f"Job ID: {job.get('job_id')} ({job.get('status')})")
+            assert 'job_id' in job, "Response missing 'job_id' field"
+            
+            job = wait_for_analysis_job(job["job_id"])
+            assert job.get("status") == "completed", f"Analysis job failed: {job.get('error')}"
+            result = job["result"]
             print(f"Analysis ID: {result.get('id')}")
             print(f"URL Analyzed: {result.get('url')}")
             print(f"Network Requests Captured: {len(result.get('network_requests', []))}")
@@ -88,7 +106,10 @@ def test_get_analyses():
         print(f"Status Code: {response.status_code}")
         
         if response.status_code == 200:
-            analyses = response.json()
+            page = response.json()
+            assert 'items' in page, "Response missing 'items' field"
+            assert 'next_cursor' in page, "Response missing 'next_cursor' field"
+            analyses = page["items"]
             print(f"Number of analyses retrieved: {len(analyses)}")
             
             if len(analyses) > 0:
@@ -150,7 +171,8 @@ def test_error_handling():
         
         # The request might succeed but the AI analysis should fail
         if response.status_code == 200:
-            result = response.json()
+            job = wait_for_analysis_job(response.json()["job_id"])
+            result = job.get("result") or {}
             print(f"Response contains AI analysis error: {'AI analysis failed' in result.get('ai_analysis', '')}")
             assert 'AI analysis failed' in result.get('ai_analysis', ''), "Server should indicate AI analysis failure with invalid API key"
             print("✅ Invalid API key test passed")
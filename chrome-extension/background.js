@@ -10,6 +10,18 @@ class BackgroundService {
     };
     
     this.sessionData = new Map();
+    
+    // Events waiting to be sent to the backend in one batch per session
+    this.pendingEvents = new Map();
+    this.flushTimer = null;
+    this.batchSize = 50;
+    this.flushInterval = 1000;
+    
+    // Websocket delivering server-side AI insights for our sessions, subscribed only to
+    // their insight channels so the events we upload aren't echoed back
+    this.insightSocket = null;
+    this.insightReconnectDelay = 1000;
+    
     this.init();
   }
   
@@ -96,13 +108,9 @@ class BackgroundService {
       const session = this.sessionData.get(data.sessionId);
       session.events.push(data);
       
-      // Send to backend
+      // Send to backend; anomaly detection and AI insights happen server-side
       await this.sendToBackend(data, session);
-      
-      // Trigger AI analysis if enabled and conditions are met
-      if (this.settings.aiEnabled && this.shouldTriggerAI(data)) {
-        await this.triggerAIAnalysis(session);
-      }
+      this.subscribeToInsights(data.sessionId);
       
       // Show notification if needed
       if (this.settings.notificationsEnabled && this.shouldNotify(data)) {
@@ -115,19 +123,48 @@ class BackgroundService {
   }
   
   async sendToBackend(data, session) {
+    if (!this.pendingEvents.has(session.sessionId)) {
+      this.pendingEvents.set(session.sessionId, {
+        sessionId: session.sessionId,
+        url: session.url,
+        hostname: session.hostname,
+        events: []
+      });
+    }
+    
+    const pending = this.pendingEvents.get(session.sessionId);
+    if (this.settings.aiEnabled && this.settings.apiKey) {
+      pending.openrouter_api_key = this.settings.apiKey;
+    }
+    pending.events.push(data);
+    
+    if (pending.events.length >= this.batchSize) {
+      await this.flushSession(session.sessionId);
+    } else if (!this.flushTimer) {
+      this.flushTimer = setTimeout(() => this.flushPendingEvents(), this.flushInterval);
+    }
+  }
+  
+  async flushPendingEvents() {
+    this.flushTimer = null;
+    const sessionIds = Array.from(this.pendingEvents.keys());
+    await Promise.all(sessionIds.map(sessionId => this.flushSession(sessionId)));
+  }
+  
+  async flushSession(sessionId) {
+    const pending = this.pendingEvents.get(sessionId);
+    if (!pending || pending.events.length === 0) {
+      return;
+    }
+    this.pendingEvents.delete(sessionId);
+    
     try {
-      const response = await fetch(`${this.backendUrl}/api/live-session`, {
+      const response = await fetch(`${this.backendUrl}/api/live-session/batch`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({
-          sessionId: session.sessionId,
-          url: session.url,
-          hostname: session.hostname,
-          event: data,
-          openrouter_api_key: this.settings.apiKey
-        })
+        body: JSON.stringify(pending)
       });
       
       if (!response.ok) {
@@ -138,47 +175,77 @@ class BackgroundService {
     }
   }
   
-  shouldTriggerAI(data) {
-    // Trigger AI analysis for errors, slow requests, or security issues
-    return (
-      data.type === 'error' ||
-      (data.type === 'network' && data.status >= 400) ||
-      (data.type === 'network' && data.duration > 5000) ||
-      (data.type === 'console' && data.level === 'error')
-    );
+  connectInsights() {
+    if (this.insightSocket) {
+      return;
+    }
+    
+    const socket = new WebSocket(this.backendUrl.replace(/^http/, 'ws') + '/ws/live-monitoring');
+    this.insightSocket = socket;
+    
+    socket.onopen = () => {
+      this.insightReconnectDelay = 1000;
+      socket.send(JSON.stringify({
+        action: 'subscribe',
+        sessionIds: Array.from(this.sessionData.keys()).map(sessionId => this.insightChannel(sessionId))
+      }));
+    };
+    
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === 'live_insight') {
+        this.handleInsight(message);
+      }
+    };
+    
+    socket.onclose = () => {
+      this.insightSocket = null;
+      if (this.sessionData.size > 0) {
+        setTimeout(() => this.connectInsights(), this.insightReconnectDelay);
+        this.insightReconnectDelay = Math.min(this.insightReconnectDelay * 2, 30000);
+      }
+    };
   }
   
-  async triggerAIAnalysis(session) {
-    try {
-      const recentEvents = session.events.slice(-10); // Last 10 events
-      
-      const response = await fetch(`${this.backendUrl}/api/ai-insight`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          sessionId: session.sessionId,
-          events: recentEvents,
-          openrouter_api_key: this.settings.apiKey
-        })
-      });
-      
-      if (response.ok) {
-        const insight = await response.json();
-        
-        // Show AI insight as notification
-        if (this.settings.notificationsEnabled && insight.message) {
-          this.showNotification({
-            type: 'info',
-            message: `AI Insight: ${insight.message}`,
-            title: 'WebAnalyzer AI'
-          });
-        }
-      }
-    } catch (error) {
-      console.error('AI analysis error:', error);
+  insightChannel(sessionId) {
+    return `insights:${sessionId}`;
+  }
+  
+  subscribeToInsights(sessionId) {
+    if (!this.insightSocket) {
+      // Subscribes to every known session once connected
+      this.connectInsights();
+    } else if (this.insightSocket.readyState === WebSocket.OPEN && !this.sessionData.get(sessionId).subscribed) {
+      this.insightSocket.send(JSON.stringify({action: 'subscribe', sessionIds: [this.insightChannel(sessionId)]}));
+    } else {
+      return;
+    }
+    this.sessionData.get(sessionId).subscribed = true;
+  }
+  
+  handleInsight(insight) {
+    if (!this.settings.notificationsEnabled) {
+      return;
     }
+    
+    const summary = insight.anomalies.map(anomaly => {
+      switch (anomaly.kind) {
+        case 'error_spike':
+          return `Error spike: ${Math.round(anomaly.error_rate * 100)}% of requests failing`;
+        case 'latency_regression':
+          return `${anomaly.endpoint} slowed to ${Math.round(anomaly.recent_ms)}ms`;
+        case 'new_failing_endpoint':
+          return `${anomaly.endpoint} started failing (${anomaly.status})`;
+        default:
+          return anomaly.kind;
+      }
+    }).join('; ');
+    
+    this.showNotification({
+      type: 'info',
+      message: insight.message ? `AI Insight: ${insight.message}` : summary,
+      title: insight.message ? 'WebAnalyzer AI' : '📈 Anomaly Detected'
+    });
   }
   
   shouldNotify(data) {
@@ -5,8 +5,14 @@ set -e
 cd /backend || { echo "Backend directory not found"; exit 1; }
 
 echo "Starting FastAPI backend"
+# Several workers need a shared backplane for live monitoring
+export BACKEND_WORKERS=${BACKEND_WORKERS:-1}
+if [ "$BACKEND_WORKERS" -gt 1 ]; then
+    export LIVE_BACKPLANE=${LIVE_BACKPLANE:-mongo}
+fi
+
 # Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+uvicorn server:app --host 0.0.0.0 --port 8001 --workers "$BACKEND_WORKERS" &
 BACKEND_PID=$!
 
 echo "Waiting for backend to start..."
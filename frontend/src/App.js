@@ -30,7 +30,7 @@ function App() {
       const response = await fetch(`${BACKEND_URL}/api/analyses`);
       if (response.ok) {
         const data = await response.json();
-        setPreviousAnalyses(data);
+        setPreviousAnalyses(data.items);
       }
     } catch (err) {
       console.error('Failed to fetch previous analyses:', err);
@@ -42,7 +42,7 @@ function App() {
       const response = await fetch(`${BACKEND_URL}/api/live-sessions`);
       if (response.ok) {
         const data = await response.json();
-        setLiveSessions(data);
+        setLiveSessions(data.items);
       }
     } catch (err) {
       console.error('Failed to fetch live sessions:', err);
@@ -79,7 +79,8 @@ function App() {
         throw new Error(errorData.detail || 'Analysis failed');
       }
 
-      const result = await response.json();
+      const job = await response.json();
+      const result = await streamAnalysisJob(job.job_id);
       setAnalysis(result);
       setActiveView('results');
       fetchPreviousAnalyses();
@@ -90,6 +91,72 @@ function App() {
     }
   };
 
+  const streamAnalysisJob = (jobId) => {
+    // Show the capture as soon as it is ready, then stream the AI report into it
+    if (typeof EventSource === 'undefined') {
+      return waitForAnalysisJob(jobId);
+    }
+
+    return new Promise((resolve, reject) => {
+      const source = new EventSource(`${BACKEND_URL}/api/jobs/${jobId}/stream`);
+      let settled = false;
+      const settle = (callback) => {
+        settled = true;
+        source.close();
+        callback();
+      };
+
+      source.addEventListener('analysis_capture', (event) => {
+        const { capture } = JSON.parse(event.data);
+        setAnalysis({ url, ...capture, ai_analysis: '' });
+        setActiveView('results');
+      });
+
+      source.addEventListener('analysis_token', (event) => {
+        const { delta } = JSON.parse(event.data);
+        setAnalysis((current) => current && { ...current, ai_analysis: (current.ai_analysis || '') + delta });
+      });
+
+      source.addEventListener('result', (event) => {
+        settle(() => resolve(JSON.parse(event.data)));
+      });
+
+      source.addEventListener('error', (event) => {
+        if (settled) {
+          return;
+        }
+        if (event.data) {
+          const { error } = JSON.parse(event.data);
+          settle(() => reject(new Error(error || 'Analysis failed')));
+        } else {
+          // Stream dropped (e.g. a proxy timeout); fall back to polling
+          settle(() => waitForAnalysisJob(jobId).then(resolve, reject));
+        }
+      });
+    });
+  };
+
+  const waitForAnalysisJob = async (jobId) => {
+    // Analyses run in a background queue; poll until the job finishes
+    while (true) {
+      const response = await fetch(`${BACKEND_URL}/api/jobs/${jobId}`);
+      if (!response.ok) {
+        const errorData = await response.json();
+        throw new Error(errorData.detail || 'Failed to fetch analysis status');
+      }
+
+      const job = await response.json();
+      if (job.status === 'completed') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Analysis failed');
+      }
+
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+  };
+
   const loadPreviousAnalysis = async (analysisId) => {
     try {
       const response = await fetch(`${BACKEND_URL}/api/analyses/${analysisId}`);
@@ -104,6 +171,26 @@ function App() {
     }
   };
 
+  const getRequestStats = (result) => {
+    // Full captures are stored out of line; the document carries summary stats and a preview
+    const summary = result?.capture?.summary;
+    if (summary) {
+      const byStatus = summary.by_status || {};
+      return {
+        total: summary.requests || 0,
+        successful: byStatus['2xx'] || 0,
+        failed: (byStatus['4xx'] || 0) + (byStatus['5xx'] || 0)
+      };
+    }
+
+    const requests = result?.network_requests || [];
+    return {
+      total: result?.request_count ?? requests.length,
+      successful: requests.filter(req => req.status >= 200 && req.status < 300).length,
+      failed: requests.filter(req => req.status >= 400).length
+    };
+  };
+
   const formatTimestamp = (timestamp) => {
     return new Date(timestamp).toLocaleString();
   };
@@ -271,14 +358,14 @@ function App() {
                 <div className="session-info">
                   <div className="session-url">{session.hostname}</div>
                   <div className="session-stats">
-                    <span>{session.events?.length || 0} events</span>
+                    <span>{session.eventCount || 0} events</span>
                     <span>•</span>
                     <span>{getSessionDuration(session.startTime)}</span>
                   </div>
                 </div>
                 
                 <div className="session-preview">
-                  {getRecentEvents(session.events).map((event, index) => (
+                  {getRecentEvents(session.recentEvents).map((event, index) => (
                     <div key={index} className={`event-preview ${event.type}`}>
                       {getEventDescription(event)}
                     </div>
@@ -363,18 +450,18 @@ function App() {
           </h3>
           <div className="session-overview-stats">
             <div className="stat-item">
-              <div className="stat-value">{selectedLiveSession?.events?.length || 0}</div>
+              <div className="stat-value">{selectedLiveSession?.eventCount || 0}</div>
               <div className="stat-label">Total Events</div>
             </div>
             <div className="stat-item">
               <div className="stat-value">
-                {selectedLiveSession?.events?.filter(e => e.type === 'error').length || 0}
+                {selectedLiveSession?.eventTypes?.error || 0}
               </div>
               <div className="stat-label">Errors</div>
             </div>
             <div className="stat-item">
               <div className="stat-value">
-                {selectedLiveSession?.events?.filter(e => e.type === 'network').length || 0}
+                {selectedLiveSession?.eventTypes?.network || 0}
               </div>
               <div className="stat-label">Network Requests</div>
             </div>
@@ -462,7 +549,7 @@ function App() {
                 <div className="history-meta">
                   <div className="history-time">{formatTimestamp(prev.timestamp)}</div>
                   <div className="history-stats">
-                    <span>{prev.network_requests?.length || 0} requests</span>
+                    <span>{getRequestStats(prev).total} requests</span>
                     <span>•</span>
                     <span>{prev.tech_stack?.length || 0} technologies</span>
                   </div>
@@ -505,7 +592,7 @@ function App() {
           </div>
           <div className="overview-stats">
             <div className="stat-item">
-              <div className="stat-value">{analysis?.network_requests?.length || 0}</div>
+              <div className="stat-value">{getRequestStats(analysis).total}</div>
               <div className="stat-label">Network Requests</div>
             </div>
             <div className="stat-item">
@@ -591,21 +678,29 @@ function App() {
                 <span className="card-icon">🌐</span>
                 Network Activity
               </h3>
+              {analysis.capture && (
+                <a
+                  className="capture-download"
+                  href={`${BACKEND_URL}/api/analyses/${analysis.id}/capture`}
+                >
+                  Download HAR
+                </a>
+              )}
             </div>
             <div className="network-summary">
               <div className="network-stat">
-                <span className="network-stat-value">{analysis.network_requests.length}</span>
+                <span className="network-stat-value">{getRequestStats(analysis).total}</span>
                 <span className="network-stat-label">Total Requests</span>
               </div>
               <div className="network-stat">
                 <span className="network-stat-value">
-                  {analysis.network_requests.filter(req => req.status >= 200 && req.status < 300).length}
+                  {getRequestStats(analysis).successful}
                 </span>
                 <span className="network-stat-label">Successful</span>
               </div>
               <div className="network-stat">
                 <span className="network-stat-value">
-                  {analysis.network_requests.filter(req => req.status >= 400).length}
+                  {getRequestStats(analysis).failed}
                 </span>
                 <span className="network-stat-label">Failed</span>
               </div>
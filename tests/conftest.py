@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The backend is a flat set of modules, not an installed package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """An in-memory stand-in for the app database, in every module that uses it"""
+    from mongomock_motor import AsyncMongoMockClient
+    import database
+    import server  # noqa: F401 - loads every backend module
+
+    app_db = database.db
+    test_db = AsyncMongoMockClient()["website_analyzer_test"]
+    for module in list(sys.modules.values()):
+        if getattr(module, "db", None) is app_db:
+            monkeypatch.setattr(module, "db", test_db)
+    return test_db
@@ -0,0 +1,100 @@
+import asyncio
+
+import llm
+from llm import AICache, normalize_browser_data
+
+URL = "https://example.com/?utm_source=mail"
+
+
+def capture(order=1, query="1"):
+    requests = [
+        {"method": "GET", "url": f"https://example.com/api/users?page={query}", "status": 200,
+         "response_type": "application/json; charset=utf-8"},
+        {"method": "GET", "url": "https://example.com/app.js", "status": 200, "response_type": "text/javascript"},
+    ]
+    return {
+        "network_requests": requests[::order],
+        "api_endpoints": [f"https://example.com/api/users?page={query}"],
+        "tech_stack": ["React", "Nginx", "React"][::order],
+        "security_observations": [],
+        "page_info": {"title": "Example", "load_time": 120 * order},
+    }
+
+
+def test_equivalent_captures_share_a_key():
+    cache = AICache(max_entries=10)
+    key = cache.make_key("analysis", normalize_browser_data(capture(), URL))
+    # Order, duplicates, query strings, charsets and timings do not change the analysis
+    same = normalize_browser_data(capture(order=-1, query="2"), "https://example.com/")
+    assert cache.make_key("analysis", same) == key
+    assert cache.make_key("insight", same) != key
+    changed = capture()
+    changed["network_requests"][0]["status"] = 500
+    assert cache.make_key("analysis", normalize_browser_data(changed, URL)) != key
+
+
+def test_the_model_is_part_of_the_key(monkeypatch):
+    cache = AICache(max_entries=10)
+    inputs = normalize_browser_data(capture(), URL)
+    key = cache.make_key("analysis", inputs)
+    monkeypatch.setattr(llm.llm_client, "model", "another/model")
+    assert cache.make_key("analysis", inputs) != key
+
+
+def test_hits_misses_and_expiry(mongo):
+    async def scenario():
+        cache = AICache(max_entries=10)
+        assert await cache.get("k") is None
+        await cache.set("k", "analysis", "report", ttl=60)
+        assert await cache.get("k") == "report"
+        await cache.set("old", "analysis", "stale", ttl=-1)
+        assert await cache.get("old") is None
+
+        # Another worker, or this one after a restart, finds the entry in Mongo
+        restarted = AICache(max_entries=10)
+        assert await restarted.get("k") == "report"
+        assert await restarted.get("k") == "report"
+        return cache.stats(), restarted.stats()
+
+    first, restarted = asyncio.run(scenario())
+    assert (first["memory_hits"], first["mongo_hits"], first["misses"], first["writes"]) == (1, 0, 2, 2)
+    assert (restarted["memory_hits"], restarted["mongo_hits"], restarted["misses"]) == (1, 1, 0)
+    assert restarted["hit_rate"] == 1.0
+
+
+def test_memory_tier_evicts_the_least_recently_used(mongo):
+    async def scenario():
+        cache = AICache(max_entries=2)
+        for key in ("a", "b"):
+            await cache.set(key, "analysis", key.upper(), ttl=60)
+        await cache.get("a")
+        await cache.set("c", "analysis", "C", ttl=60)
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.stats()["entries"] == 2
+    # The evicted entry is still in Mongo
+    assert asyncio.run(cache.get("b")) == "B"
+    assert cache.stats()["mongo_hits"] == 1
+
+
+def test_analysis_is_served_from_the_cache(mongo, monkeypatch):
+    calls = []
+
+    async def complete(api_key, messages, max_tokens, temperature):
+        calls.append(messages)
+        return "report"
+
+    monkeypatch.setattr(llm, "ai_cache", AICache(max_entries=10))
+    monkeypatch.setattr(llm.llm_client, "complete", complete)
+
+    async def scenario():
+        first = await llm.analyze_with_ai("key", capture(), URL)
+        again = await llm.analyze_with_ai("key", capture(order=-1, query="9"), URL)
+        fresh = await llm.analyze_with_ai("key", capture(), URL, use_cache=False)
+        return first, again, fresh
+
+    assert asyncio.run(scenario()) == ("report", "report", "report")
+    assert len(calls) == 2
+    assert llm.ai_cache.stats()["bypassed"] == 1
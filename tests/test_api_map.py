@@ -0,0 +1,176 @@
+import api_map
+from api_map import ApiMap, infer_api_map, infer_schema, merge_schemas
+
+
+def record(url, method="GET", status=200, schema=None, response_type="application/json", resource_type="fetch"):
+    entry = {"url": url, "method": method, "status": status, "response_type": response_type, "resource_type": resource_type}
+    if schema is not None:
+        entry["response_schema"] = schema
+    return entry
+
+
+def templates(endpoints):
+    return [(endpoint["method"], endpoint["template"]) for endpoint in endpoints]
+
+
+def build(records, threshold=3):
+    api = ApiMap(threshold)
+    for entry in records:
+        api.add(entry)
+    return api.endpoints()
+
+
+def test_id_segments_become_placeholders():
+    endpoints = build([
+        record("https://api.test/users/42"),
+        record("https://api.test/users/7?expand=team&fields=name"),
+        record("https://api.test/users/3f2b1c4e-9a7d-4e21-8c55-0d6f1e2a3b4c/orders"),
+        record("https://api.test/users/42", method="delete", status=204),
+    ])
+    assert templates(endpoints) == [
+        ("DELETE", "api.test/users/:id"), ("GET", "api.test/users/:id"), ("GET", "api.test/users/:id/orders")
+    ]
+    users = endpoints[1]
+    assert users["count"] == 2
+    assert users["query"] == ["expand", "fields"]
+    assert users["example"] == "https://api.test/users/42"
+    assert users["content_type"] == "application/json"
+
+
+def test_literal_segments_fold_past_the_threshold():
+    slugs = ["red-shoes", "blue-hat", "green-scarf", "yellow-coat"]
+    endpoints = build([record(f"https://shop.test/products/{slug}/reviews") for slug in slugs] + [
+        record("https://shop.test/products/search"),
+    ])
+    # The fourth distinct literal folds them all into :param, including ones seen later
+    assert templates(endpoints) == [("GET", "shop.test/products/:param"), ("GET", "shop.test/products/:param/reviews")]
+    assert endpoints[1]["count"] == 4
+
+
+def test_under_the_threshold_literals_stay():
+    endpoints = build([record(f"https://shop.test/{section}") for section in ("cart", "search", "account")])
+    assert templates(endpoints) == [("GET", "shop.test/account"), ("GET", "shop.test/cart"), ("GET", "shop.test/search")]
+
+
+def test_folding_merges_counts_statuses_and_schemas():
+    endpoints = build([
+        record("https://api.test/posts/a/comments", schema=infer_schema([{"id": 1, "text": "x"}])),
+        record("https://api.test/posts/b/comments", status=404),
+        record("https://api.test/posts/c/comments", schema=infer_schema([{"id": 2, "edited": True}])),
+        record("https://api.test/posts/d/comments"),
+    ])
+    assert templates(endpoints) == [("GET", "api.test/posts/:param/comments")]
+    endpoint = endpoints[0]
+    assert endpoint["count"] == 4
+    assert endpoint["status"] == {"200": 3, "404": 1}
+    assert endpoint["samples"] == 2
+    item = endpoint["schema"]["items"]
+    assert sorted(item["properties"]) == ["edited", "id", "text"]
+    assert item["required"] == ["id"]
+
+
+def test_nested_folds_merge_their_subtrees():
+    endpoints = build([
+        record("https://api.test/a/x/1"),
+        record("https://api.test/b/x/2"),
+        record("https://api.test/c/y"),
+        record("https://api.test/d/x/3", method="POST"),
+    ])
+    assert templates(endpoints) == [("GET", "api.test/:param/x/:id"), ("POST", "api.test/:param/x/:id"), ("GET", "api.test/:param/y")]
+
+
+def test_hosts_are_kept_apart():
+    endpoints = build([record("https://a.test/api/items"), record("https://b.test/api/items")])
+    assert templates(endpoints) == [("GET", "a.test/api/items"), ("GET", "b.test/api/items")]
+
+
+def test_infer_api_map_skips_assets_and_blocked_requests():
+    requests = [
+        record("https://site.test/api/cart"),
+        record("https://site.test/app.js", response_type="text/javascript", resource_type="script"),
+        record("https://site.test/v1/products", response_type="text/html", resource_type="document"),
+        {**record("https://tracker.test/api/collect"), "blocked": "tracker"},
+    ]
+    assert templates(infer_api_map(requests)) == [("GET", "site.test/api/cart"), ("GET", "site.test/v1/products")]
+
+
+def test_infer_schema_scalars_and_containers():
+    assert infer_schema(None) == {"type": "null"}
+    assert infer_schema(True) == {"type": "boolean"}
+    assert infer_schema(3) == {"type": "integer"}
+    assert infer_schema(1.5) == {"type": "number"}
+    assert infer_schema("x") == {"type": "string"}
+    assert infer_schema([]) == {"type": "array"}
+    assert infer_schema({"b": 1, "a": [1, 2.5]}) == {
+        "type": "object",
+        "properties": {"b": {"type": "integer"}, "a": {"type": "array", "items": {"type": ["integer", "number"]}}},
+        "required": ["a", "b"],
+    }
+
+
+def test_infer_schema_id_keyed_maps():
+    schema = infer_schema({"101": {"name": "a"}, "102": {"name": "b", "price": 3}})
+    assert schema == {
+        "type": "object",
+        "additionalProperties": {
+            "type": "object",
+            "properties": {"name": {"type": "string"}, "price": {"type": "integer"}},
+            "required": ["name"],
+        },
+    }
+
+
+def test_infer_schema_makes_keys_safe_for_mongo():
+    schema = infer_schema({"a.b": 1, "$ref": "x", "plain": True})
+    assert set(schema["properties"]) == {"a．b", "＄ref", "plain"}
+
+
+def test_infer_schema_limits(monkeypatch):
+    monkeypatch.setattr(api_map, "ENDPOINT_SCHEMA_MAX_DEPTH", 2)
+    monkeypatch.setattr(api_map, "ENDPOINT_SCHEMA_MAX_PROPERTIES", 3)
+    monkeypatch.setattr(api_map, "ENDPOINT_SCHEMA_MAX_ITEMS", 2)
+    assert infer_schema({"a": {"b": {"c": 1}}}) == {
+        "type": "object",
+        "properties": {"a": {"type": "object", "properties": {"b": {"type": "object"}}, "required": ["b"]}},
+        "required": ["a"],
+    }
+    assert len(infer_schema({str(i) + "k": i for i in range(10)})["properties"]) == 3
+    # Only the first items are sampled
+    assert infer_schema([1, 2, "three"]) == {"type": "array", "items": {"type": "integer"}}
+
+
+def test_merge_schemas():
+    assert merge_schemas(None, {"type": "string"}) == {"type": "string"}
+    assert merge_schemas({"type": "string"}, None) == {"type": "string"}
+    assert merge_schemas({"type": "string"}, {"type": "null"}) == {"type": ["null", "string"]}
+    assert merge_schemas({"type": ["integer", "null"]}, {"type": "string"}) == {"type": ["integer", "null", "string"]}
+    left = infer_schema({"id": 1, "tags": ["a"]})
+    right = infer_schema({"id": "x", "owner": None})
+    assert merge_schemas(left, right) == {
+        "type": "object",
+        "properties": {
+            "id": {"type": ["integer", "string"]},
+            "tags": {"type": "array", "items": {"type": "string"}},
+            "owner": {"type": "null"},
+        },
+        "required": ["id"],
+    }
+
+
+def test_merge_is_order_independent_for_types_and_required():
+    schemas = [infer_schema(value) for value in ({"a": 1}, {"a": None, "b": 2}, {"b": "x"})]
+    forward = None
+    for schema in schemas:
+        forward = merge_schemas(forward, schema)
+    backward = None
+    for schema in reversed(schemas):
+        backward = merge_schemas(backward, schema)
+    assert forward["required"] == backward["required"] == []
+    assert forward["properties"] == {"a": {"type": ["integer", "null"]}, "b": {"type": ["integer", "string"]}}
+    assert backward["properties"] == {"b": {"type": ["integer", "string"]}, "a": {"type": ["integer", "null"]}}
+
+
+def test_merge_schemas_caps_properties(monkeypatch):
+    monkeypatch.setattr(api_map, "ENDPOINT_SCHEMA_MAX_PROPERTIES", 2)
+    merged = merge_schemas(infer_schema({"a": 1, "b": 2}), infer_schema({"a": 1, "c": 3}))
+    assert sorted(merged["properties"]) == ["a", "b"]
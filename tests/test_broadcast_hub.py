@@ -0,0 +1,47 @@
+import asyncio
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import live
+from backplane import BroadcastHub, LocalBackplane
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, payload):
+        self.sent.append(json.loads(payload))
+
+
+def message_types(websocket):
+    return [message["type"] for message in websocket.sent if message["type"] != "subscriptions"]
+
+
+def test_insight_channel_receives_only_insights(mongo, monkeypatch):
+    async def scenario():
+        hub = BroadcastHub(LocalBackplane(), queue_size=100, send_timeout=1, interval=0.001)
+        monkeypatch.setattr(live, "broadcast_hub", hub)
+        await hub.start()
+
+        extension, dashboard = FakeWebSocket(), FakeWebSocket()
+        extension_client, dashboard_client = hub.connect(extension), hub.connect(dashboard)
+        hub.handle_message(extension_client, json.dumps({"action": "subscribe", "sessionIds": [live.insight_channel("s1")]}))
+        hub.handle_message(dashboard_client, json.dumps({"action": "subscribe", "sessionIds": ["s1"]}))
+
+        hub.publish_events("s1", [{"type": "network", "status": 500}])
+        session = SimpleNamespace(
+            session_id="s1", id="id-s1", start_time=datetime.utcnow(), api_key=None,
+            insight={"pending": [{"kind": "error_spike", "error_rate": 1.0}], "reported": {}, "last_insight": None, "task": None}
+        )
+        trigger = live.LiveInsightTrigger(debounce=0, min_interval=0, cooldown=0, history=5)
+        await trigger._emit_after(session, 0)
+        await asyncio.sleep(0.05)
+        hub._task.cancel()
+        return extension, dashboard
+
+    extension, dashboard = asyncio.run(scenario())
+    # The extension doesn't get its own uploads echoed back
+    assert message_types(extension) == ["live_insight"]
+    assert sorted(message_types(dashboard)) == ["live_event", "live_insight"]
@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+
+import capture
+from capture import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, number):
+        self.number = number
+        self.connected = True
+        self.closed = False
+        self.contexts = []
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    def is_connected(self):
+        return self.connected and not self.closed
+
+    def disconnect(self):
+        self.connected = False
+        self.handlers["disconnected"](self)
+
+    async def new_context(self, **options):
+        self.contexts.append(FakeContext(self))
+        return self.contexts[-1]
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.launched = []
+        self.stopped = False
+        self.chromium = self
+
+    async def start(self):
+        return self
+
+    async def launch(self, headless=True):
+        self.launched.append(FakeBrowser(len(self.launched)))
+        return self.launched[-1]
+
+    async def stop(self):
+        self.stopped = True
+
+
+@pytest.fixture
+def playwright(monkeypatch):
+    driver = FakePlaywright()
+    monkeypatch.setattr(capture, "async_playwright", lambda: driver)
+    return driver
+
+
+def pool(size=2, max_uses=50, max_rss_mb=1024):
+    return BrowserPool(size=size, max_uses=max_uses, max_rss_mb=max_rss_mb, health_interval=3600)
+
+
+async def lease_once(browsers):
+    async with browsers.lease_context() as context:
+        return context
+
+
+def test_leases_reuse_warm_browsers(playwright):
+    async def scenario():
+        browsers = pool(size=2)
+        contexts = [await lease_once(browsers) for _ in range(4)]
+        stats = browsers.stats()
+        await browsers.stop()
+        return contexts, stats
+
+    contexts, stats = asyncio.run(scenario())
+    assert len(playwright.launched) == 2
+    # Every lease gets its own context, closed on release
+    assert len({id(context) for context in contexts}) == 4
+    assert all(context.closed for context in contexts)
+    assert (stats["leases"], stats["launches"], stats["idle"]) == (4, 2, 2)
+    assert playwright.stopped and all(browser.closed for browser in playwright.launched)
+
+
+def test_leases_wait_for_a_free_browser(playwright):
+    async def scenario():
+        browsers = pool(size=1)
+        order = []
+
+        async def analysis(name, hold):
+            async with browsers.lease_context():
+                order.append(f"{name} start")
+                await asyncio.sleep(hold)
+                order.append(f"{name} end")
+
+        await asyncio.gather(analysis("first", 0.02), analysis("second", 0))
+        await browsers.stop()
+        return order
+
+    assert asyncio.run(scenario()) == ["first start", "first end", "second start", "second end"]
+    assert len(playwright.launched) == 1
+
+
+def test_browsers_are_recycled_after_max_uses(playwright):
+    async def scenario():
+        browsers = pool(size=1, max_uses=2)
+        used = []
+        for _ in range(3):
+            used.append((await lease_once(browsers)).browser.number)
+            await asyncio.sleep(0)
+        stats = browsers.stats()
+        await browsers.stop()
+        return used, stats
+
+    used, stats = asyncio.run(scenario())
+    assert used == [0, 0, 1]
+    assert playwright.launched[0].closed
+    assert (stats["recycled"], stats["launches"]) == (1, 2)
+
+
+def test_health_check_replaces_disconnected_and_bloated_browsers(playwright, monkeypatch):
+    async def measure(self):
+        self.rss_mb = 2048.0 if self.browser.number == 1 else 300.0
+        return self.rss_mb
+
+    monkeypatch.setattr(capture.PooledBrowser, "measure_rss_mb", measure)
+
+    async def scenario():
+        browsers = pool(size=3, max_rss_mb=1024)
+        await browsers.start()
+        playwright.launched[0].disconnect()
+        await browsers.check_health()
+        await asyncio.sleep(0)
+        stats = browsers.stats()
+        await browsers.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert (stats["launches"], stats["recycled"], stats["health_failures"], stats["idle"]) == (5, 2, 1, 3)
+    assert [browser["rss_mb"] for browser in stats["browsers"]] == [300.0, 0.0, 0.0]
+
+
+def test_a_browser_that_dropped_is_replaced_on_lease(playwright):
+    async def scenario():
+        browsers = pool(size=1)
+        await browsers.start()
+        playwright.launched[0].disconnect()
+        browser = (await lease_once(browsers)).browser
+        stats = browsers.stats()
+        await browsers.stop()
+        return browser, stats
+
+    browser, stats = asyncio.run(scenario())
+    assert browser is playwright.launched[1]
+    assert (stats["health_failures"], stats["recycled"], stats["leases"]) == (1, 1, 1)
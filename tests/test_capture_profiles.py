@@ -0,0 +1,74 @@
+import pytest
+
+from capture import CAPTURE_PROFILES, NetworkCapture, is_tracker_host, profile_block_reason, summarize_capture_profile
+
+
+class FakeRequest:
+    """Hashed by identity, like Playwright's Request objects"""
+
+    def __init__(self, url, resource_type):
+        self.url = url
+        self.method = "GET"
+        self.headers = {}
+        self.resource_type = resource_type
+        self.redirected_from = None
+
+
+def request(url, resource_type="script"):
+    return FakeRequest(url, resource_type)
+
+
+@pytest.mark.parametrize("host, tracker", [
+    ("www.google-analytics.com", True),
+    ("stats.g.doubleclick.net", True),
+    ("px.ads.linkedin.com", True),
+    ("www.linkedin.com", False),
+    ("doubleclick.net.example.com", False),
+    ("example.com", False),
+])
+def test_tracker_hosts_match_on_parent_domains(host, tracker):
+    assert is_tracker_host(host) is tracker
+
+
+def test_profiles_block_what_they_promise():
+    image = request("https://example.com/logo.png", "image")
+    stylesheet = request("https://example.com/app.css", "stylesheet")
+    tracker = request("https://www.googletagmanager.com/gtm.js")
+    api = request("https://example.com/api/users", "fetch")
+
+    def blocked(profile):
+        return [profile_block_reason(CAPTURE_PROFILES[profile], req, "example.com")
+                for req in (image, stylesheet, tracker, api)]
+
+    assert blocked("full") == [None, None, None, None]
+    assert blocked("no-media") == ["resource_type:image", None, None, None]
+    assert blocked("api-only") == ["resource_type:image", "resource_type:stylesheet", "tracker", None]
+
+
+def test_a_trackers_own_site_is_not_blocked():
+    own = request("https://www.hotjar.com/app.js")
+    assert profile_block_reason(CAPTURE_PROFILES["api-only"], own, "hotjar.com") is None
+    assert profile_block_reason(CAPTURE_PROFILES["api-only"], own, "example.com") == "tracker"
+
+
+def test_blocked_requests_are_recorded_but_not_counted_as_traffic():
+    capture = NetworkCapture()
+    image = request("https://example.com/hero.jpg", "image")
+    capture.mark_blocked(image, "resource_type:image")
+    # The request event Playwright fires afterwards does not replace the record
+    capture.handle_request(image)
+    api = request("https://example.com/api/users", "fetch")
+    capture.handle_request(api)
+    records = capture.records()
+    records[1].update({"status": 200, "response_size": 2048, "request_size": 300})
+
+    assert [record["blocked"] for record in records] == ["resource_type:image", None]
+    assert summarize_capture_profile("no-media", records, 812.4) == {
+        "profile": "no-media",
+        "capture_ms": 812,
+        "requests": 2,
+        "blocked_requests": 1,
+        "blocked_by_reason": {"resource_type:image": 1},
+        "bytes_received": 2048,
+        "bytes_sent": 300
+    }
@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+from fastapi import HTTPException
+from gridfs.errors import NoFile
+
+import server
+import storage
+from storage import CaptureStore
+
+URL = "https://example.com/"
+CAPTURE = {"page_info": {"title": "Example"}, "network_requests": [], "console_logs": []}
+
+
+class RecordingUpload:
+    def __init__(self):
+        self._id = "file-1"
+        self.written = []
+        self.closed = self.aborted = False
+
+    async def write(self, data):
+        self.written.append(data)
+
+    async def close(self):
+        self.closed = True
+
+    async def abort(self):
+        self.aborted = True
+
+
+def failing_chunks(target_url, browser_data):
+    yield "{"
+    raise ValueError("unserializable")
+
+
+def read_local(store, reference):
+    async def collect():
+        return b"".join([chunk async for chunk in store.stream(reference)])
+
+    return json.loads(gzip.decompress(asyncio.run(collect())))
+
+
+def test_local_round_trip(tmp_path):
+    store = CaptureStore("local", str(tmp_path))
+    reference = asyncio.run(store.save("a1", URL, CAPTURE))
+    assert reference["path"] == "a1.har.gz"
+    assert reference["compressed_bytes"] == (tmp_path / "a1.har.gz").stat().st_size
+    assert read_local(store, reference)["log"]["pages"][0]["title"] == "Example"
+
+
+def test_failed_local_save_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "iter_har_chunks", failing_chunks)
+    store = CaptureStore("local", str(tmp_path))
+    with pytest.raises(ValueError):
+        asyncio.run(store.save("a1", URL, CAPTURE))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_gridfs_upload_is_closed_only_on_success(monkeypatch):
+    uploads = []
+
+    class Bucket:
+        def open_upload_stream(self, filename, metadata=None):
+            uploads.append(RecordingUpload())
+            return uploads[-1]
+
+    store = CaptureStore("gridfs", "unused")
+    monkeypatch.setattr(store, "_bucket", Bucket)
+    reference = asyncio.run(store.save("a1", URL, CAPTURE))
+    assert reference["file_id"] == "file-1"
+    assert (uploads[0].closed, uploads[0].aborted) == (True, False)
+
+    # A failed serialization must not commit a truncated file
+    monkeypatch.setattr(storage, "iter_har_chunks", failing_chunks)
+    with pytest.raises(ValueError):
+        asyncio.run(store.save("a2", URL, CAPTURE))
+    assert (uploads[1].closed, uploads[1].aborted) == (False, True)
+
+
+def test_missing_captures_are_reported_before_streaming(tmp_path, monkeypatch):
+    store = CaptureStore("local", str(tmp_path))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(store.open_stream({"storage": "local", "path": "gone.har.gz"}))
+
+    class Bucket:
+        async def open_download_stream(self, file_id):
+            raise NoFile(file_id)
+
+    monkeypatch.setattr(store, "_bucket", Bucket)
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(store.open_stream({"storage": "gridfs", "file_id": "gone"}))
+
+
+def test_download_of_a_missing_capture_is_a_404(mongo, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "capture_store", CaptureStore("local", str(tmp_path)))
+    reference = asyncio.run(server.capture_store.save("a1", URL, CAPTURE))
+    asyncio.run(mongo.analyses.insert_one({"id": "a1", "capture": reference}))
+
+    async def download():
+        response = await server.download_capture("a1")
+        return response.media_type, b"".join([chunk async for chunk in response.body_iterator])
+
+    media_type, body = asyncio.run(download())
+    assert media_type == "application/gzip"
+    assert json.loads(gzip.decompress(body))["log"]["pages"][0]["title"] == "Example"
+
+    (tmp_path / "a1.har.gz").unlink()
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.download_capture("a1"))
+    assert error.value.status_code == 404
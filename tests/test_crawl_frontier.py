@@ -0,0 +1,53 @@
+import asyncio
+
+from capture import CrawlFrontier
+
+
+def drain(frontier):
+    async def collect():
+        items = []
+        while True:
+            item = await frontier.next()
+            if item is None:
+                return items
+            items.append(item)
+            await frontier.done()
+
+    return asyncio.run(collect())
+
+
+def crawl(start_url, links=(), max_pages=10, max_depth=2):
+    frontier = CrawlFrontier(start_url, max_pages, max_depth)
+
+    async def add_all():
+        await frontier.add(start_url, 0)
+        for url, depth in links:
+            await frontier.add(url, depth)
+
+    asyncio.run(add_all())
+    return drain(frontier)
+
+
+def test_same_origin_pages_are_deduplicated():
+    items = crawl("https://example.com", [
+        ("https://example.com/#top", 1),
+        ("https://EXAMPLE.com/about", 1),
+        ("https://example.com/about#team", 1),
+        ("https://other.com/", 1),
+        ("http://example.com/pricing", 1),
+        ("https://example.com/logo.png", 1),
+        ("https://example.com/deep", 3),
+    ])
+    assert items == [("https://example.com/", 0), ("https://example.com/about", 1)]
+
+
+def test_page_budget():
+    items = crawl("https://example.com/", [(f"https://example.com/{index}", 1) for index in range(5)], max_pages=3)
+    assert [url for url, _ in items] == ["https://example.com/", "https://example.com/0", "https://example.com/1"]
+
+
+def test_start_url_is_crawled_whatever_its_extension():
+    assert crawl("https://example.com/data.json") == [("https://example.com/data.json", 0)]
+    # Links to the same kind of resource are still skipped
+    items = crawl("https://example.com/report.pdf", [("https://example.com/other.pdf", 1)])
+    assert items == [("https://example.com/report.pdf", 0)]
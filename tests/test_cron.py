@@ -0,0 +1,89 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduling
+from scheduling import CronSchedule
+
+
+def fire_times(expression, start, count):
+    cron = CronSchedule(expression)
+    times = []
+    moment = start
+    for _ in range(count):
+        moment = cron.next_after(moment)
+        times.append(moment)
+    return times
+
+
+def test_parses_fields_and_aliases():
+    cron = CronSchedule("0,30 9-17/4 1 */3 1-5")
+    assert cron.minutes == {0, 30}
+    assert cron.hours == {9, 13, 17}
+    assert cron.days == {1}
+    assert cron.months == {1, 4, 7, 10}
+    assert cron.weekdays == {1, 2, 3, 4, 5}
+    assert CronSchedule("@daily").minutes == {0}
+    # 7 is Sunday as well as 0
+    assert CronSchedule("0 0 * * 7").weekdays == {0}
+
+
+@pytest.mark.parametrize("expression", [
+    "* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "*/0 * * * *", "a * * * *", "5-1 * * * *",
+])
+def test_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_rejects_expressions_that_never_fire():
+    with pytest.raises(ValueError, match="never fires"):
+        CronSchedule("0 0 30 2 *")
+
+
+def test_next_after_is_strictly_later():
+    cron = CronSchedule("*/15 * * * *")
+    assert cron.next_after(datetime(2026, 10, 17, 12, 0)) == datetime(2026, 10, 17, 12, 15)
+    assert cron.next_after(datetime(2026, 10, 17, 12, 14, 59)) == datetime(2026, 10, 17, 12, 15)
+    assert cron.next_after(datetime(2026, 10, 17, 23, 59)) == datetime(2026, 10, 18, 0, 0)
+
+
+def test_next_after_crosses_months_and_years():
+    assert CronSchedule("@monthly").next_after(datetime(2026, 12, 15)) == datetime(2027, 1, 1)
+    assert CronSchedule("0 12 29 2 *").next_after(datetime(2026, 3, 1)) == datetime(2028, 2, 29, 12)
+
+
+def test_both_restricted_day_fields_fire_on_either():
+    # The 1st of the month or any Monday
+    times = fire_times("0 0 1 * 1", datetime(2026, 10, 17), 4)
+    assert times == [datetime(2026, 10, 19), datetime(2026, 10, 26), datetime(2026, 11, 1), datetime(2026, 11, 2)]
+
+
+def test_stepped_star_day_field_is_not_restricted():
+    # Odd days of the month that are also Mondays, not odd days or Mondays
+    times = fire_times("0 0 */2 * 1", datetime(2026, 10, 1), 3)
+    assert all(moment.day % 2 == 1 and moment.weekday() == 0 for moment in times)
+    assert times[0] == datetime(2026, 10, 5)
+    # Every Monday, whatever the day of the month
+    assert fire_times("0 0 * * 1", datetime(2026, 10, 1), 2) == [datetime(2026, 10, 5), datetime(2026, 10, 12)]
+    # A stepped star weekday field also intersects with a restricted day of month
+    times = fire_times("0 0 1-31/2 * */2", datetime(2026, 10, 1), 5)
+    assert all(moment.day % 2 == 1 and (moment.weekday() + 1) % 7 % 2 == 0 for moment in times)
+
+
+def test_jitter_stays_within_bounds():
+    random.seed(7)
+    scheduler = scheduling.RecurringAnalysisScheduler(
+        poll_interval=30, max_jitter=600, jitter_fraction=0.1, max_outstanding=4, history=10
+    )
+    after = datetime(2026, 10, 17, 12, 7)
+    # Every 5 minutes: bounded by a tenth of the gap, 30 seconds
+    for _ in range(200):
+        scheduled_for, run_at = scheduler.next_run(CronSchedule("*/5 * * * *"), after)
+        assert scheduled_for == datetime(2026, 10, 17, 12, 10)
+        assert scheduled_for <= run_at <= scheduled_for + timedelta(seconds=30)
+    # Daily: bounded by max_jitter
+    for _ in range(200):
+        scheduled_for, run_at = scheduler.next_run(CronSchedule("@daily"), after)
+        assert scheduled_for <= run_at <= scheduled_for + timedelta(seconds=600)
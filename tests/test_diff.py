@@ -0,0 +1,152 @@
+import asyncio
+from datetime import datetime
+
+import analysis
+from diffing import diff_analyses, full_report
+from models import AnalysisRequest
+
+URL = "https://example.com/"
+
+
+def capture(version="18.2.0", headers=None, findings=(), api_map=(), title="Example", status=200):
+    return {
+        "page_info": {
+            "title": title,
+            "status": status,
+            "fingerprints": [{"name": "React", "version": version}],
+            "security_findings": [{"message": message} for message in findings],
+            "response_headers": headers if headers is not None else {"x-frame-options": "DENY"},
+        },
+        "tech_stack": ["React"],
+        "api_map": list(api_map),
+    }
+
+
+def endpoint(template, schema=None, status=None):
+    return {"method": "GET", "template": template, "schema": schema, "status": status or {"200": 1}}
+
+
+def object_schema(**properties):
+    return {"type": "object", "properties": {name: {"type": kind} for name, kind in properties.items()}}
+
+
+def stored(index, data, **fields):
+    return {"id": f"a{index}", "url": URL, "timestamp": datetime(2026, 10, index), **data, **fields}
+
+
+def test_identical_captures_do_not_change():
+    diff = diff_analyses(stored(1, capture()), capture())
+    assert diff["changed"] is False
+    assert diff["base_id"] == "a1"
+    assert diff["base_timestamp"] == "2026-10-01T00:00:00"
+
+
+def test_technology_versions():
+    previous = stored(1, capture())
+    current = capture(version="19.0.0")
+    current["page_info"]["fingerprints"].append({"name": "Next.js", "version": None})
+    diff = diff_analyses(previous, current)
+    assert diff["tech_stack"] == {
+        "added": ["Next.js"], "removed": [], "changed": [{"name": "React", "from": "18.2.0", "to": "19.0.0"}]
+    }
+    assert diff["changed"] is True
+
+
+def test_analyses_without_fingerprints_compare_names_only():
+    previous = stored(1, {"tech_stack": ["React", "jQuery"], "page_info": {}})
+    diff = diff_analyses(previous, capture())
+    assert diff["tech_stack"] == {"added": [], "removed": ["jQuery"], "changed": []}
+
+
+def test_volatile_headers_are_ignored():
+    previous = stored(1, capture(headers={"date": "Mon", "etag": "1", "x-frame-options": "DENY", "server": "nginx"}))
+    current = capture(headers={"date": "Tue", "etag": "2", "x-frame-options": "SAMEORIGIN", "hsts": "max-age=1"})
+    headers = diff_analyses(previous, current)["headers"]
+    assert headers == {
+        "added": {"hsts": "max-age=1"},
+        "removed": ["server"],
+        "changed": {"x-frame-options": {"from": "DENY", "to": "SAMEORIGIN"}},
+    }
+
+
+def test_security_findings_and_page_fields():
+    previous = stored(1, capture(findings=["Missing CSP", "Cookie without Secure"]))
+    diff = diff_analyses(previous, capture(findings=["Missing CSP", "Mixed content"], status=500))
+    assert diff["security"] == {"added": ["Mixed content"], "resolved": ["Cookie without Secure"]}
+    assert diff["page"] == {"status": {"from": 200, "to": 500}}
+
+
+def test_endpoint_changes():
+    previous = stored(1, capture(api_map=[
+        endpoint("/api/users/:id", object_schema(id="integer", name="string")),
+        endpoint("/api/legacy"),
+    ]))
+    current = capture(api_map=[
+        endpoint("/api/users/:id", object_schema(id="string", email="string"), status={"200": 1, "404": 1}),
+        endpoint("/api/orders"),
+    ])
+    endpoints = diff_analyses(previous, current)["endpoints"]
+    assert endpoints["added"] == ["GET /api/orders"]
+    assert endpoints["removed"] == ["GET /api/legacy"]
+    assert endpoints["changed"] == [{
+        "endpoint": "GET /api/users/:id",
+        "new_status": ["404"],
+        "fields_added": ["email"],
+        "fields_removed": ["name"],
+        "fields_retyped": {"id": {"from": "integer", "to": "string"}},
+    }]
+
+
+def test_full_report_skips_failed_reports():
+    assert full_report({"ai_analysis": "report"}) == "report"
+    assert full_report({"ai_analysis": "changes\n\n---\n\nreport", "ai_report": "report"}) == "report"
+    assert full_report({"ai_analysis": "AI analysis failed: timeout."}) is None
+    failed = {"ai_analysis": "AI change analysis failed: timeout.\n\n---\n\nreport",
+              "incremental": {"base_id": "a1", "llm": "failed"}}
+    assert full_report(failed) is None
+
+
+def run(request, monkeypatch, data, changes):
+    calls = []
+
+    async def fake_capture(url, depth, crawl=None, profile="full"):
+        return {**data, "network_requests": [], "console_logs": [], "api_endpoints": [], "security_observations": []}
+
+    async def fake_changes(*args, **kwargs):
+        calls.append("changes")
+        return changes
+
+    async def fake_full(*args, **kwargs):
+        calls.append("full")
+        return "fresh report"
+
+    async def fake_save(analysis_id, target_url, browser_data):
+        return {"path": f"{analysis_id}.har"}
+
+    monkeypatch.setattr(analysis, "capture_website_data", fake_capture)
+    monkeypatch.setattr(analysis, "analyze_changes_with_ai", fake_changes)
+    monkeypatch.setattr(analysis, "analyze_with_ai", fake_full)
+    monkeypatch.setattr(analysis.capture_store, "save", fake_save)
+    return asyncio.run(analysis.run_analysis(request)), calls
+
+
+def test_failed_change_report_falls_back_to_full_report(mongo, monkeypatch):
+    asyncio.run(mongo.analyses.insert_one(stored(1, capture(), ai_analysis="report")))
+    request = AnalysisRequest(url=URL, openrouter_api_key="key", incremental=True)
+
+    failed, calls = run(request, monkeypatch, capture(version="19.0.0"), "AI change analysis failed: timeout.")
+    assert calls == ["changes"]
+    assert failed.incremental == {"base_id": "a1", "llm": "failed"}
+    assert failed.ai_report is None
+
+    # The failed text is not reused as the base of the next change report
+    retried, calls = run(request, monkeypatch, capture(version="19.0.1"), "unused")
+    assert calls == ["full"]
+    assert retried.incremental is None
+    assert retried.ai_analysis == "fresh report"
+
+    # A successful full report is the base again
+    succeeded, calls = run(request, monkeypatch, capture(version="19.1.0"), "React upgraded")
+    assert calls == ["changes"]
+    assert succeeded.incremental == {"base_id": retried.id, "llm": "changes"}
+    assert succeeded.ai_report == "fresh report"
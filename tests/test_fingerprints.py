@@ -0,0 +1,176 @@
+import json
+import re
+
+import pytest
+
+from config import FINGERPRINTS_PATH
+from fingerprints import FingerprintEngine, fingerprint_label, required_literals
+
+SIGNATURES = {
+    "React": {"categories": ["JavaScript library"], "globals": {"React.version": "^([\\d.]+)"}},
+    "Next.js": {
+        "categories": ["JavaScript framework"],
+        "scripts": ["/_next/static/"],
+        "headers": {"X-Powered-By": "^next\\.js ?([\\d.]+)?"},
+        "implies": ["React"],
+    },
+    "Angular": {"categories": ["JavaScript framework"], "dom": {"[ng-version]": "ng-version"}},
+    "jQuery": {"categories": ["JavaScript library"], "scripts": ["jquery[.-]([\\d.]+)(?:\\.min)?\\.js"]},
+    "Cloudflare": {"categories": ["CDN"], "cookies": {"__cf_bm": ""}},
+    "WordPress": {"categories": ["CMS"], "meta": {"generator": "^wordpress ?([\\d.]+)?"}, "implies": ["PHP"]},
+    "PHP": {"categories": ["Programming language"]},
+    "Anything": {"categories": ["Misc"], "scripts": ["\\.js$"]},
+}
+
+URLS = [
+    "https://example.com/_next/static/chunks/main-abc123.js",
+    "https://code.jquery.com/jquery-3.7.1.min.js",
+    "https://example.com/assets/app.css",
+    "https://cdn.example.com/wp-content/plugins/woocommerce/assets/js/frontend/woocommerce.min.js",
+    "https://www.googletagmanager.com/gtag/js?id=G-123",
+    "https://cdn.jsdelivr.net/npm/jquery-ui@1.13.2/dist/jquery-ui.min.js",
+    "https://unpkg.com/react-dom@18.2.0/umd/react-dom.production.min.js",
+    "https://example.com/_nuxt/entry.js",
+    "https://static.hotjar.com/c/hotjar-123.js?sv=6",
+]
+
+
+@pytest.fixture
+def engine():
+    return FingerprintEngine(SIGNATURES)
+
+
+@pytest.mark.parametrize("pattern, literals", [
+    ("/_next/static/", ["/_next/static/"]),
+    ("jquery[.-]([\\d.]+)(?:\\.min)?\\.js", ["jquery", ".js"]),
+    ("colou?r", ["colo", "r"]),
+    ("ab+c", ["ab", "c"]),
+    ("x{2}yz", ["yz"]),
+    ("^https?://cdn\\.(?P<host>\\w+)\\.com", ["http", "://cdn.", ".com"]),
+    ("react|vue", []),
+    ("\\d+\\.js$", [".js"]),
+])
+def test_required_literals(pattern, literals):
+    assert required_literals(pattern) == literals
+
+
+def names(detections):
+    return [detection["name"] for detection in detections]
+
+
+def test_matches_every_kind_of_fact(engine):
+    facts = {
+        "globals": {"React.version": "18.2.0"},
+        "dom": {"[ng-version]": "17.0.1"},
+        "meta": {"generator": "WordPress 6.4"},
+        "scripts": ["https://code.jquery.com/jquery-3.7.1.min.js"],
+    }
+    detections = engine.match(facts, [{"x-powered-by": "Next.js 14.1"}], {"__cf_bm": "token"})
+    by_name = {detection["name"]: detection for detection in detections}
+    assert names(detections) == ["Angular", "Anything", "Cloudflare", "jQuery", "Next.js", "PHP", "React", "WordPress"]
+    assert by_name["React"]["version"] == "18.2.0"
+    assert by_name["Angular"]["version"] == "17.0.1"
+    assert by_name["jQuery"]["version"] == "3.7.1"
+    assert by_name["Next.js"]["version"] == "14.1"
+    assert by_name["Next.js"]["evidence"] == ["header"]
+    assert by_name["Cloudflare"]["evidence"] == ["cookie"]
+    assert by_name["PHP"]["evidence"] == ["implied by WordPress"]
+    assert by_name["WordPress"]["categories"] == ["CMS"]
+
+
+def test_implied_technologies_keep_direct_evidence(engine):
+    facts = {"globals": {"React.version": "18.2.0"}, "scripts": ["https://example.com/_next/static/main.js"]}
+    by_name = {detection["name"]: detection for detection in engine.match(facts, [], {})}
+    assert by_name["React"]["evidence"] == ["global"]
+    assert by_name["React"]["version"] == "18.2.0"
+    assert by_name["Next.js"]["evidence"] == ["script"]
+
+
+def test_unknown_generator_is_reported_as_is(engine):
+    detections = engine.match({"meta": {"generator": "Hugo 0.120"}}, [], {})
+    assert detections == [{"name": "Hugo 0.120", "version": None, "evidence": ["meta"], "categories": []}]
+
+
+def test_invalid_patterns_are_skipped():
+    engine = FingerprintEngine({"Broken": {"scripts": ["(unclosed"], "headers": {"server": "[a-"}}, "Ok": {"scripts": ["ok\\.js"]}})
+    assert [name for name, _ in engine.scripts] == ["Ok"]
+    assert engine.headers == {}
+    assert names(engine.match({}, [{"server": "[a-"}], {}, ["https://x.test/ok.js"])) == ["Ok"]
+
+
+def test_script_patterns_are_indexed_by_a_required_trigram(engine):
+    stats = engine.stats()
+    assert stats["script_patterns"] == 3
+    # "\.js$" has only the literal ".js", which is still one trigram
+    assert stats["unindexed_script_patterns"] == 0
+    next_index = next(index for index, (name, _) in enumerate(engine.scripts) if name == "Next.js")
+    assert next_index in engine.script_candidates("https://example.com/_next/static/main.js")
+    assert next_index not in engine.script_candidates("https://example.com/static/main.js")
+
+
+def naive_script_matches(engine, url):
+    return {name for name, compiled in engine.scripts if compiled.search(url)}
+
+
+def indexed_script_matches(engine, url):
+    return {
+        detection["name"] for detection in engine.match({}, [], {}, [url]) if "script" in detection["evidence"]
+    }
+
+
+@pytest.mark.parametrize("url", URLS)
+def test_index_finds_what_a_full_scan_finds(url):
+    engine = FingerprintEngine.from_file(FINGERPRINTS_PATH)
+    assert indexed_script_matches(engine, url) == naive_script_matches(engine, url)
+
+
+def test_fingerprint_label():
+    assert fingerprint_label({"name": "React", "version": "18.2.0"}) == "React 18.2.0"
+    assert fingerprint_label({"name": "React", "version": None}) == "React"
+
+
+def test_missing_database_gives_an_empty_engine(tmp_path):
+    engine = FingerprintEngine.from_file(str(tmp_path / "missing.json"))
+    assert engine.stats()["technologies"] == 0
+    assert engine.match({"meta": {}}, [], {}) == []
+
+
+@pytest.fixture(scope="module")
+def signatures():
+    with open(FINGERPRINTS_PATH, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+class TestDatabase:
+    def test_signatures_use_known_fields(self, signatures):
+        assert signatures
+        for name, signature in signatures.items():
+            assert set(signature) <= set(FingerprintEngine.KINDS) | {"categories", "implies"}, name
+            assert signature.get("categories"), name
+            assert isinstance(signature.get("dom", []), (list, dict)), name
+
+    def test_patterns_compile(self, signatures):
+        for name, signature in signatures.items():
+            patterns = list(signature.get("scripts", []))
+            for kind in ("globals", "meta", "headers", "cookies"):
+                patterns.extend(signature.get(kind, {}).values())
+            for pattern in patterns:
+                re.compile(pattern, re.IGNORECASE)
+
+    def test_version_captures_are_single_groups(self, signatures):
+        for name, signature in signatures.items():
+            for kind in ("globals", "meta", "headers", "cookies"):
+                for pattern in signature.get(kind, {}).values():
+                    assert re.compile(pattern).groups <= 1, (name, pattern)
+            for pattern in signature.get("scripts", []):
+                assert re.compile(pattern).groups <= 1, (name, pattern)
+
+    def test_implied_technologies_exist(self, signatures):
+        for name, signature in signatures.items():
+            for implied in signature.get("implies", []):
+                assert implied in signatures, f"{name} implies unknown {implied}"
+
+    def test_every_pattern_loads(self, signatures):
+        engine = FingerprintEngine(signatures)
+        assert len(engine.technologies) == len(signatures)
+        assert len(engine.scripts) == sum(len(signature.get("scripts", [])) for signature in signatures.values())
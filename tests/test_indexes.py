@@ -0,0 +1,43 @@
+import asyncio
+
+from pymongo.errors import OperationFailure
+
+import server
+
+SPECS = [
+    ("analyses", [("id", 1)], {"name": "id_unique", "unique": True}),
+    ("live_sessions", [("lastUpdate", 1)], {"name": "lastUpdate_ttl", "expireAfterSeconds": None}),
+    ("analysis_jobs", [("finished_at", 1)], {"name": "finished_at_ttl", "expireAfterSeconds": 3600}),
+]
+
+
+def index_names(mongo, collection):
+    return set(asyncio.run(mongo[collection].index_information()))
+
+
+def test_creates_declared_indexes_and_drops_disabled_ttls(mongo, monkeypatch):
+    monkeypatch.setattr(server, "INDEX_SPECS", SPECS)
+    asyncio.run(mongo.live_sessions.create_index([("lastUpdate", 1)], name="lastUpdate_ttl", expireAfterSeconds=60))
+    report = asyncio.run(server.migrate_indexes())
+    assert report == {
+        "created": ["analyses.id_unique", "analysis_jobs.finished_at_ttl"],
+        "updated": [],
+        "dropped": ["live_sessions.lastUpdate_ttl"],
+        "failed": [],
+    }
+    assert "lastUpdate_ttl" not in index_names(mongo, "live_sessions")
+    # Running again changes nothing
+    assert asyncio.run(server.migrate_indexes()) == {"created": [], "updated": [], "dropped": [], "failed": []}
+
+
+def test_failed_drop_does_not_stop_the_migration(mongo, monkeypatch):
+    monkeypatch.setattr(server, "INDEX_SPECS", [SPECS[1], SPECS[0], SPECS[2]])
+    asyncio.run(mongo.live_sessions.create_index([("lastUpdate", 1)], name="lastUpdate_ttl", expireAfterSeconds=60))
+
+    async def failing_drop(collection, name):
+        raise OperationFailure("not authorized", code=13)
+
+    monkeypatch.setattr(type(mongo.live_sessions), "drop_index", failing_drop)
+    report = asyncio.run(server.migrate_indexes())
+    assert report["failed"] == ["live_sessions.lastUpdate_ttl"]
+    assert report["created"] == ["analyses.id_unique", "analysis_jobs.finished_at_ttl"]
@@ -0,0 +1,104 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import scheduling
+from models import AnalysisRequest
+from scheduling import AnalysisJobScheduler
+
+
+class RecordingHub:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, message, session_id=None, coalesce_key=None, subscribers_only=False):
+        if not subscribers_only:
+            self.messages.append(message)
+
+
+def scheduler(deep=2):
+    return AnalysisJobScheduler(concurrency={"light": 1, "deep": deep}, poll_interval=60, stale_after=900)
+
+
+def request(depth="deep", priority=0):
+    return AnalysisRequest(url="https://example.com/", openrouter_api_key="key", depth=depth, priority=priority)
+
+
+def test_workers_share_the_per_depth_limit(mongo, monkeypatch):
+    monkeypatch.setattr(scheduling, "broadcast_hub", RecordingHub())
+    started = []
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_analysis(request, job_id=None, metrics=None):
+            started.append(job_id)
+            await release.wait()
+            return SimpleNamespace(id=f"analysis-{job_id}")
+
+        monkeypatch.setattr(scheduling, "run_analysis", slow_analysis)
+        # Two worker processes, each allowed two deep jobs, draining one queue
+        workers = [scheduler(), scheduler()]
+        jobs = [await workers[0].enqueue(request()) for _ in range(5)]
+        for worker in workers:
+            await worker._dispatch()
+        await asyncio.sleep(0.01)
+        running = await mongo.analysis_jobs.count_documents({"status": "running"})
+        first_round = list(started)
+
+        release.set()
+        await asyncio.sleep(0.01)
+        release.clear()
+        for worker in workers:
+            await worker._dispatch()
+        await asyncio.sleep(0.01)
+        second_round = await mongo.analysis_jobs.count_documents({"status": "running"})
+        for worker in workers:
+            await worker.stop()
+        return jobs, (running, second_round), first_round
+
+    jobs, running, first_round = asyncio.run(scenario())
+    assert running == (2, 2)
+    # Oldest first; the rest wait on the queue until a slot frees up
+    assert first_round == [jobs[0]["id"], jobs[1]["id"]]
+    assert started[2:] == [jobs[2]["id"], jobs[3]["id"]]
+
+
+def test_claims_follow_priority_then_age(mongo, monkeypatch):
+    monkeypatch.setattr(scheduling, "broadcast_hub", RecordingHub())
+    started = []
+
+    async def quick_analysis(request, job_id=None, metrics=None):
+        started.append(job_id)
+        return SimpleNamespace(id=f"analysis-{job_id}")
+
+    monkeypatch.setattr(scheduling, "run_analysis", quick_analysis)
+
+    async def scenario():
+        worker = scheduler(deep=1)
+        low = await worker.enqueue(request(priority=-1))
+        old = await worker.enqueue(request())
+        urgent = await worker.enqueue(request(priority=5))
+        for _ in range(3):
+            await worker._dispatch()
+            await asyncio.sleep(0.01)
+        await worker.stop()
+        return [urgent["id"], old["id"], low["id"]]
+
+    expected = asyncio.run(scenario())
+    assert started == expected
+    assert asyncio.run(mongo.analysis_jobs.count_documents({"status": "completed"})) == 3
+
+
+def test_slots_of_a_crashed_worker_expire(mongo, monkeypatch):
+    async def scenario():
+        crashed, survivor = scheduler(deep=1), scheduler(deep=1)
+        await crashed._ensure_slots()
+        assert await crashed._lease_slot("deep", 1)
+        assert await survivor._lease_slot("deep", 1) is None
+        await mongo.analysis_slots.update_one(
+            {"_id": "deep:0"}, {"$set": {"expires_at": datetime.utcnow() - timedelta(seconds=1)}}
+        )
+        return await survivor._lease_slot("deep", 1)
+
+    assert asyncio.run(scenario())[0] == "deep:0"
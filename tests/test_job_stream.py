@@ -0,0 +1,109 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+class QueueHub:
+    """Hands the stream a queue the test feeds directly"""
+
+    def __init__(self):
+        self.queues = {}
+        self.unlistened = []
+
+    def listen(self, channel):
+        self.queues[channel] = asyncio.Queue()
+        return self.queues[channel]
+
+    def unlisten(self, channel, queue):
+        self.unlistened.append(channel)
+
+
+def job(status="running", **fields):
+    return {"id": "j1", "url": "https://example.com/", "depth": "light", "status": status,
+            "created_at": datetime(2026, 10, 17), **fields}
+
+
+def parse(chunk):
+    fields = dict(line.split(": ", 1) for line in chunk.strip().split("\n"))
+    return fields["event"], json.loads(fields["data"])
+
+
+def message(type_, **fields):
+    return json.dumps({"type": type_, **fields})
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = QueueHub()
+    monkeypatch.setattr(server, "broadcast_hub", hub)
+    return hub
+
+
+def test_stream_closes_once_the_job_completes(mongo, hub):
+    asyncio.run(mongo.analysis_jobs.insert_one(job(capture_preview={"tech_stack": ["React"]})))
+
+    async def scenario():
+        response = await server.stream_analysis_job("j1")
+        events = response.body_iterator
+        received = [parse(await events.__anext__()), parse(await events.__anext__())]
+
+        queue = hub.queues["job:j1"]
+        queue.put_nowait(message("analysis_token", job_id="j1", delta="Hello"))
+        received.append(parse(await events.__anext__()))
+        await mongo.analyses.insert_one({"id": "a1", "url": "https://example.com/", "ai_analysis": "Hello"})
+        await mongo.analysis_jobs.update_one({"id": "j1"}, {"$set": {"status": "completed", "analysis_id": "a1"}})
+        queue.put_nowait(message("analysis_job", job={"job_id": "j1", "status": "completed"}))
+        received.extend([parse(chunk) async for chunk in events])
+        return response, received
+
+    response, received = asyncio.run(scenario())
+    assert response.media_type == "text/event-stream"
+    assert [event for event, _ in received] == [
+        "analysis_job", "analysis_capture", "analysis_token", "analysis_job", "result"
+    ]
+    assert received[1][1]["capture"] == {"tech_stack": ["React"]}
+    assert received[-1][1]["ai_analysis"] == "Hello"
+    assert hub.unlistened == ["job:j1"]
+
+
+def test_a_finished_job_is_answered_at_once(mongo, hub):
+    asyncio.run(mongo.analysis_jobs.insert_one(job("failed", error="Analysis failed: timeout")))
+
+    async def scenario():
+        response = await server.stream_analysis_job("j1")
+        return [parse(chunk) async for chunk in response.body_iterator]
+
+    received = asyncio.run(scenario())
+    assert [event for event, _ in received] == ["analysis_job", "error"]
+    assert received[1][1]["error"] == "Analysis failed: timeout"
+    assert hub.unlistened == ["job:j1"]
+
+
+def test_client_disconnect_stops_listening(mongo, hub):
+    asyncio.run(mongo.analysis_jobs.insert_one(job()))
+
+    async def scenario():
+        response = await server.stream_analysis_job("j1")
+        events = response.body_iterator
+        await events.__anext__()
+        waiting = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.01)
+        # Starlette cancels the response task when the client goes away
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+    asyncio.run(scenario())
+    assert hub.unlistened == ["job:j1"]
+
+
+def test_unknown_jobs_are_a_404(mongo, hub):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(server.stream_analysis_job("missing"))
+    assert error.value.status_code == 404
+    assert hub.queues == {}
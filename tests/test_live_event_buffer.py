@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import live
+
+
+def make_buffer(max_attempts=3):
+    return live.LiveEventBuffer(
+        flush_interval=60, max_events=10_000, max_pending=10_000, bucket_size=4,
+        recent_events=2, stats_persist_interval=60, max_attempts=max_attempts
+    )
+
+
+def make_session(session_id="s1"):
+    return SimpleNamespace(session_id=session_id, id=f"id-{session_id}", aggregator=None, start_time=datetime.utcnow())
+
+
+def test_event_types_are_safe_field_names():
+    assert live.live_event_type({"type": "network"}) == "network"
+    assert live.live_event_type({}) == "unknown"
+    for hostile in ["", "$where", "a.b", "x\x00y", {"nested": 1}, ["list"], 5]:
+        assert live.live_event_type({"type": hostile}) == "other"
+
+
+def test_hostile_event_types_are_counted_as_other(mongo):
+    buffer = make_buffer()
+    events = [{"type": "network"}, {"type": "$set"}, {"type": "a.b"}, {"type": ""}, {"message": "untyped"}]
+    buffer.add(make_session(), "https://example.com/", "example.com", events)
+    asyncio.run(buffer.flush())
+
+    session = asyncio.run(mongo.live_sessions.find_one({"sessionId": "s1"}))
+    assert session["eventCount"] == 5
+    assert session["eventTypes"] == {"network": 1, "other": 3, "unknown": 1}
+    stored = asyncio.run(mongo.live_session_events.find({"sessionId": "s1"}).to_list(None))
+    assert sum(bucket["count"] for bucket in stored) == 5
+
+
+def test_entry_that_keeps_failing_is_dropped(monkeypatch):
+    buffer = make_buffer(max_attempts=3)
+    failures = {"count": 0}
+
+    async def fail(*args, **kwargs):
+        failures["count"] += 1
+        raise RuntimeError("write rejected")
+
+    monkeypatch.setattr(live, "db", SimpleNamespace(live_sessions=SimpleNamespace(find_one_and_update=fail)))
+    buffer.add(make_session(), "https://example.com/", "example.com", [{"type": "network"}] * 3)
+    asyncio.run(buffer.flush())
+    asyncio.run(buffer.flush())
+    buffer.add(make_session(), "https://example.com/", "example.com", [{"type": "console"}] * 2)
+    asyncio.run(buffer.flush())
+
+    # The third failure gives up instead of retrying every flush forever
+    stats = buffer.stats()
+    assert failures["count"] == 3
+    assert stats["events_dropped"] == 5
+    assert stats["pending_events"] == 0
+    asyncio.run(buffer.flush())
+    assert failures["count"] == 3
+
+    # The session starts over with the next events
+    buffer.add(make_session(), "https://example.com/", "example.com", [{"type": "console"}])
+    asyncio.run(buffer.flush())
+    assert failures["count"] == 4
+    assert buffer.stats()["pending_events"] == 1
+
+
+def test_retried_bucket_write_is_not_applied_twice(mongo):
+    asyncio.run(mongo.live_session_events.create_index([("sessionId", 1), ("bucket", 1)], unique=True))
+    buffer = make_buffer()
+    entry = {"events": [{"type": "network", "n": n} for n in range(6)], "id": "id-s1", "url": "https://example.com/",
+             "hostname": "example.com", "startTime": datetime.utcnow(), "lastUpdate": datetime.utcnow()}
+    writes = asyncio.run(buffer._reserve("s1", entry))
+    asyncio.run(buffer._write_buckets(writes))
+
+    # The same writes again, as after a timeout that hid a successful write
+    asyncio.run(buffer._write_buckets(writes))
+
+    buckets = asyncio.run(mongo.live_session_events.find({"sessionId": "s1"}).sort("bucket", 1).to_list(None))
+    assert [bucket["count"] for bucket in buckets] == [4, 2]
+    assert [event["seq"] for bucket in buckets for event in bucket["events"]] == list(range(6))
+    assert buffer.stats()["retrying_bucket_writes"] == 0
+
+    # A later write to a partly filled bucket still lands
+    more = dict(entry, events=[{"type": "console"}] * 3)
+    asyncio.run(buffer._write_buckets(asyncio.run(buffer._reserve("s1", more))))
+    buckets = asyncio.run(mongo.live_session_events.find({"sessionId": "s1"}).sort("bucket", 1).to_list(None))
+    assert [bucket["count"] for bucket in buckets] == [4, 4, 1]
+    session = asyncio.run(mongo.live_sessions.find_one({"sessionId": "s1"}))
+    assert session["eventCount"] == sum(bucket["count"] for bucket in buckets)
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import live
+
+
+class RecordingHub:
+    def __init__(self):
+        self.messages = []
+
+    def publish(self, message, session_id=None, subscribers_only=False):
+        if not subscribers_only:
+            self.messages.append(message)
+
+
+class StubAggregator:
+    def __init__(self):
+        self.anomalies = []
+
+    def drain_anomalies(self):
+        anomalies, self.anomalies = self.anomalies, []
+        return anomalies
+
+    def insight_summary(self):
+        return {}
+
+
+def make_session(session_id="s1"):
+    return SimpleNamespace(
+        id=f"id-{session_id}", session_id=session_id, start_time=datetime.utcnow(), api_key="key",
+        aggregator=StubAggregator(), insight=None
+    )
+
+
+def anomaly(kind="error_spike", endpoint=None):
+    return {"kind": kind, "endpoint": endpoint} if endpoint else {"kind": kind}
+
+
+def kinds(message):
+    return [item["kind"] for item in message["anomalies"]]
+
+
+def test_anomaly_during_a_slow_insight_is_delivered(mongo, monkeypatch):
+    hub = RecordingHub()
+    monkeypatch.setattr(live, "broadcast_hub", hub)
+
+    async def scenario():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow_insight(api_key, summary, anomalies=None):
+            started.set()
+            await release.wait()
+            return "insight", False
+
+        monkeypatch.setattr(live, "generate_insight", slow_insight)
+        trigger = live.LiveInsightTrigger(debounce=0, min_interval=0.05, cooldown=60, history=5)
+        session = make_session()
+        session.aggregator.anomalies.append(anomaly())
+        trigger.notify(session)
+        await started.wait()
+
+        # Arrives while the first insight is still being generated
+        session.aggregator.anomalies.append(anomaly("latency_regression", "GET api.test/users"))
+        trigger.notify(session)
+        release.set()
+        for _ in range(50):
+            if len(hub.messages) == 2:
+                break
+            await asyncio.sleep(0.01)
+        await trigger.stop()
+        return session
+
+    session = asyncio.run(scenario())
+    assert [kinds(message) for message in hub.messages] == [["error_spike"], ["latency_regression"]]
+    assert session.insight["pending"] == []
+    stored = asyncio.run(mongo.live_sessions.find_one({"sessionId": "s1"}))
+    assert len(stored["insights"]) == 2
+
+
+def test_repeats_within_the_cooldown_are_suppressed(mongo, monkeypatch):
+    hub = RecordingHub()
+    monkeypatch.setattr(live, "broadcast_hub", hub)
+
+    async def quick_insight(api_key, summary, anomalies=None):
+        return "insight", False
+
+    monkeypatch.setattr(live, "generate_insight", quick_insight)
+
+    async def scenario():
+        trigger = live.LiveInsightTrigger(debounce=0.01, min_interval=0, cooldown=60, history=5)
+        session = make_session()
+        session.aggregator.anomalies.extend([anomaly(), anomaly()])
+        trigger.notify(session)
+        await asyncio.sleep(0.05)
+        session.aggregator.anomalies.append(anomaly())
+        trigger.notify(session)
+        await asyncio.sleep(0.05)
+        await trigger.stop()
+        return trigger.stats()
+
+    stats = asyncio.run(scenario())
+    assert [kinds(message) for message in hub.messages] == [["error_spike"]]
+    assert stats["suppressed"] == 2
+
+
+def test_workers_share_the_rate_limit_and_cooldown(mongo, monkeypatch):
+    hub = RecordingHub()
+    monkeypatch.setattr(live, "broadcast_hub", hub)
+    calls = []
+
+    async def quick_insight(api_key, summary, anomalies=None):
+        calls.append(anomalies)
+        return "insight", False
+
+    monkeypatch.setattr(live, "generate_insight", quick_insight)
+
+    async def scenario():
+        # Two workers, each with its own copy of the session, see the same error spike
+        workers = [live.LiveInsightTrigger(debounce=0, min_interval=60, cooldown=600, history=5) for _ in range(2)]
+        sessions = [make_session(), make_session()]
+        for trigger, session in zip(workers, sessions):
+            session.aggregator.anomalies.append(anomaly())
+            trigger.notify(session)
+        await asyncio.sleep(0.05)
+        for trigger in workers:
+            await trigger.stop()
+        return sessions
+
+    sessions = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [kinds(message) for message in hub.messages] == [["error_spike"]]
+    # The other worker holds its copy until the interval is over
+    assert [session.insight["pending"] for session in sessions].count([anomaly()]) == 1
+    stored = asyncio.run(mongo.live_sessions.find_one({"sessionId": "s1"}))
+    assert [key for key, _ in stored["insightReported"]] == ["error_spike:"]
+    assert stored["lastInsightAt"] is not None
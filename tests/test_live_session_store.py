@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import live
+from live import LiveSessionStore
+
+URL = "https://app.test/"
+
+
+def store(max_sessions=10, events_per_session=3, idle_ttl=60):
+    return LiveSessionStore(
+        max_sessions=max_sessions, events_per_session=events_per_session, idle_ttl=idle_ttl, sweep_interval=60
+    )
+
+
+def click(index):
+    return {"type": "click", "target": f"#button-{index}"}
+
+
+def test_least_recently_used_sessions_are_evicted():
+    sessions = store(max_sessions=2)
+    for session_id in ["a", "b", "a", "c"]:
+        sessions.touch(session_id, URL, "app.test")
+    assert sessions.get("b") is None
+    assert [session_id for session_id in ["a", "c"] if sessions.get(session_id)] == ["a", "c"]
+    stats = sessions.stats()
+    assert (stats["sessions_created"], stats["active_sessions"]) == (3, 2)
+
+
+def test_only_the_most_recent_events_are_kept():
+    sessions = store(events_per_session=3)
+    session = sessions.touch("a", URL, "app.test")
+    sessions.add_events(session, [click(index) for index in range(5)])
+    assert sessions.recent_events("a") == [click(2), click(3), click(4)]
+    assert session.event_count == 5
+    assert session.recent_bytes == sum(len(encoded) for encoded in session.recent_events)
+    assert sessions.recent_events("unknown") == []
+
+
+def test_memory_stays_flat_as_sessions_come_and_go():
+    sessions = store(max_sessions=10, events_per_session=20)
+    usage = []
+    for index in range(2000):
+        session = sessions.touch(f"s{index}", URL, "app.test")
+        sessions.add_events(session, [click(event) for event in range(50)])
+        if index % 500 == 499:
+            usage.append(sessions.stats()["approx_memory_bytes"])
+    assert len(set(usage)) == 1
+    assert sessions.stats()["buffered_events"] == 10 * 20
+
+
+def test_idle_sessions_are_evicted_and_ended(mongo, monkeypatch):
+    monkeypatch.setattr(live, "LIVE_WORKER_ID", "w1")
+    now = datetime.utcnow()
+    asyncio.run(mongo.live_sessions.insert_many([
+        {"sessionId": "idle", "status": "active", "lastUpdate": now - timedelta(minutes=5)},
+        # Idle here, but another worker is still receiving its events
+        {"sessionId": "elsewhere", "status": "active", "lastUpdate": now},
+    ]))
+    sessions = store(idle_ttl=60)
+    for session_id in ["idle", "elsewhere", "busy"]:
+        session = sessions.touch(session_id, URL, "app.test")
+        session.aggregator.ready = True
+        sessions.add_events(session, [{"type": "network", "url": URL, "status": 200, "duration": 80, "method": "GET"}])
+    for session_id in ["idle", "elsewhere"]:
+        sessions.get(session_id).last_seen -= 120
+
+    asyncio.run(sessions.evict_idle())
+    assert [session_id for session_id in ["idle", "elsewhere", "busy"] if sessions.get(session_id)] == ["busy"]
+    docs = {doc["sessionId"]: doc for doc in asyncio.run(mongo.live_sessions.find().to_list(None))}
+    assert docs["idle"]["status"] == "ended"
+    assert docs["elsewhere"]["status"] == "active"
+    # The evicted sessions' statistics are saved for whichever worker sees them next
+    assert docs["idle"]["aggregates"]["w1"]["requests"] == 1
+    stats = sessions.stats()
+    assert (stats["sessions_evicted"], stats["sessions_ended"]) == (2, 1)
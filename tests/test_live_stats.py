@@ -0,0 +1,155 @@
+import asyncio
+import random
+
+import pytest
+
+import live
+from live import LatencySketch, SessionAggregator
+
+NOW = 1_000_000.0
+
+
+def sketch_of(values):
+    sketch = LatencySketch()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def network(url="https://api.test/users/42", status=200, duration=100, method="GET"):
+    return {"type": "network", "url": url, "status": status, "duration": duration, "method": method}
+
+
+def aggregator(max_endpoints=10, top_slow=3, slow_ms=1000):
+    return SessionAggregator(max_endpoints=max_endpoints, top_slow=top_slow, slow_ms=slow_ms)
+
+
+@pytest.mark.parametrize("q", [0.5, 0.9, 0.95, 0.99])
+def test_quantiles_are_within_the_accuracy_bound(q):
+    random.seed(3)
+    values = [random.lognormvariate(5, 1.2) for _ in range(5000)]
+    estimate = sketch_of(values).quantile(q)
+    exact = exact_quantile(values, q)
+    # Rounding to 0.1ms on top of the relative bound
+    assert abs(estimate - exact) <= exact * LatencySketch.ACCURACY + 0.05
+
+
+def test_small_and_empty_sketches():
+    assert LatencySketch().quantile(0.5) is None
+    assert LatencySketch().summary() == {"count": 0, "mean": None, "p50": None, "p95": None, "p99": None, "max": None}
+    # Sub-millisecond values share the lowest bucket
+    assert sketch_of([0, 0.4, 1]).quantile(0.99) == 1.0
+    # Estimates never exceed the largest value seen
+    assert sketch_of([250]).quantile(1.0) == 250
+
+
+def test_merging_matches_one_sketch_of_everything():
+    random.seed(5)
+    left = [random.uniform(1, 500) for _ in range(300)]
+    right = [random.uniform(200, 3000) for _ in range(700)]
+    merged = sketch_of(left)
+    merged.merge_state(sketch_of(right).state())
+    combined = sketch_of(left + right)
+    assert merged.buckets == combined.buckets
+    assert merged.count == 1000
+    assert merged.max == combined.max
+    assert merged.summary() == combined.summary()
+
+
+def test_rolling_error_rate_uses_recent_slots():
+    stats = aggregator()
+    # Five minutes ago: all failures, about to age out of the window
+    for _ in range(4):
+        stats.add(network(status=500), now=NOW - 290)
+    for _ in range(3):
+        stats.add(network(), now=NOW - 30)
+    stats.add(network(status=0), now=NOW)
+    assert stats.error_rate(60, now=NOW) == 0.25
+    assert stats.error_rate(300, now=NOW) == 0.625
+    assert stats.error_rate(300, now=NOW + 30) == 0.25
+    assert stats.error_rate(60, now=NOW + 600) is None
+
+
+def test_slots_are_reused_as_the_ring_wraps():
+    stats = aggregator()
+    stats.add(network(status=500), now=NOW)
+    ring = SessionAggregator.WINDOW_SLOT * SessionAggregator.WINDOW_SLOTS
+    # Lands in the same slot one full ring later and replaces the old counts
+    stats.add(network(), now=NOW + ring)
+    assert stats.error_rate(300, now=NOW + ring) == 0.0
+    assert stats.summary()["requests"]["error_rate"] == 0.5
+
+
+def test_id_segments_collapse_into_one_endpoint():
+    stats = aggregator()
+    stats.add(network("https://api.test/users/42?tab=1"), now=NOW)
+    stats.add(network("https://api.test/users/7", status=404), now=NOW)
+    stats.add(network("https://api.test/users/64b7f0c2a1d3e4f5a6b7c8d9"), now=NOW)
+    stats.add(network("https://api.test/users/7", method="delete"), now=NOW)
+    endpoints = {endpoint["endpoint"]: endpoint for endpoint in stats.endpoint_stats()}
+    assert sorted(endpoints) == ["DELETE api.test/users/:id", "GET api.test/users/:id"]
+    assert endpoints["GET api.test/users/:id"]["requests"] == 3
+    assert endpoints["GET api.test/users/:id"]["error_rate"] == 0.3333
+
+
+def test_endpoints_past_the_cap_share_the_other_bucket():
+    stats = aggregator(max_endpoints=2)
+    for path in ["a", "b", "c", "d", "a"]:
+        stats.add(network(f"https://api.test/{path}"), now=NOW)
+    requests = {endpoint["endpoint"]: endpoint["requests"] for endpoint in stats.endpoint_stats()}
+    assert requests == {"GET api.test/a": 2, "GET api.test/b": 1, SessionAggregator.OTHER_ENDPOINT: 2}
+
+
+def test_state_round_trip():
+    stats = aggregator()
+    for index, duration in enumerate([50, 1500, 2500, 1200, 4000]):
+        stats.add(network(f"https://api.test/items/{index}", status=500 if index == 2 else 200, duration=duration), now=NOW)
+    stats.add({"type": "error", "message": "boom"}, now=NOW)
+    restored = aggregator()
+    restored.merge_state(stats.state())
+    assert restored.summary() == stats.summary()
+    assert [request["duration"] for request in restored.slow_requests()] == [4000, 2500, 1500]
+
+
+def test_workers_sharing_a_session_add_up(mongo, monkeypatch):
+    url = "https://api.test/"
+
+    async def scenario():
+        buffer = live.LiveEventBuffer(
+            flush_interval=60, max_events=10_000, max_pending=10_000, bucket_size=4,
+            recent_events=2, stats_persist_interval=0, max_attempts=3
+        )
+        store = live.LiveSessionStore(max_sessions=10, events_per_session=10, idle_ttl=60, sweep_interval=60)
+        sessions = {}
+        # Two workers take turns persisting their statistics for the same session
+        for worker_id, status in [("w1", 200), ("w2", 500), ("w1", 200), ("w2", 200), ("w1", 404)]:
+            monkeypatch.setattr(live, "LIVE_WORKER_ID", worker_id)
+            session = sessions.get(worker_id)
+            if session is None:
+                session = sessions[worker_id] = live.LiveSessionState("s1", url, "api.test", 10)
+                await store.load_aggregate(session)
+            events = [network(status=status)]
+            store.add_events(session, events)
+            buffer.add(session, url, "api.test", events)
+            await buffer.flush()
+
+        monkeypatch.setattr(live, "LIVE_WORKER_ID", "w3")
+        merged = await live.load_session_aggregator("s1")
+        # A worker re-creating the session only takes back its own share
+        monkeypatch.setattr(live, "LIVE_WORKER_ID", "w1")
+        restored = live.LiveSessionState("s1", url, "api.test", 10)
+        await store.load_aggregate(restored)
+        return merged, restored.aggregator
+
+    merged, restored = asyncio.run(scenario())
+    assert merged.requests == 5
+    assert merged.failed_requests == 2
+    assert merged.status_codes == {"200": 3, "500": 1, "404": 1}
+    assert merged.endpoint_stats()[0]["latency_ms"]["count"] == 5
+    assert restored.requests == 3
+    assert restored.status_codes == {"200": 2, "404": 1}
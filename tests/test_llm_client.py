@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+import llm
+from backplane import LiveBackplane
+from llm import LLMClient, LLMProvider
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class ScriptedProvider(LLMProvider):
+    """Fails with the given errors first, then answers"""
+
+    def __init__(self, errors=(), chunks=("Hello", " world"), fail_after=None, delay=0):
+        self.errors = list(errors)
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.delay = delay
+        self.calls = 0
+        self.active = self.peak = 0
+
+    async def complete(self, api_key, model, messages, max_tokens, temperature):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.errors:
+                raise self.errors.pop(0)
+            return "".join(self.chunks)
+        finally:
+            self.active -= 1
+
+    async def stream(self, api_key, model, messages, max_tokens, temperature):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        for index, chunk in enumerate(self.chunks):
+            if index == self.fail_after:
+                raise asyncio.TimeoutError()
+            yield chunk
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    real_sleep = asyncio.sleep
+
+    async def sleep(seconds):
+        # Skip retry backoff, keep the provider's simulated latency
+        await real_sleep(min(seconds, 0.01))
+
+    monkeypatch.setattr(llm.asyncio, "sleep", sleep)
+
+
+def make_client(provider, max_concurrency=2, max_retries=2):
+    return LLMClient(provider, "model", max_concurrency=max_concurrency, timeout=1, max_retries=max_retries)
+
+
+def test_interfaces_require_their_methods():
+    with pytest.raises(TypeError):
+        LLMProvider()
+    with pytest.raises(TypeError):
+        LiveBackplane()
+
+    class PublishOnly(LiveBackplane):
+        async def publish(self, envelopes):
+            pass
+
+    with pytest.raises(TypeError):
+        PublishOnly()
+
+
+def test_transient_failures_are_retried():
+    provider = ScriptedProvider(errors=[asyncio.TimeoutError(), asyncio.TimeoutError()])
+    client = make_client(provider)
+    assert asyncio.run(client.complete("key", MESSAGES)) == "Hello world"
+    stats = client.stats()
+    assert (provider.calls, stats["retries"], stats["failures"]) == (3, 2, 0)
+
+
+def test_retries_give_up_and_other_errors_are_not_retried():
+    client = make_client(ScriptedProvider(errors=[asyncio.TimeoutError()] * 3), max_retries=1)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.complete("key", MESSAGES))
+
+    provider = ScriptedProvider(errors=[ValueError("bad request")])
+    client = make_client(provider)
+    with pytest.raises(ValueError):
+        asyncio.run(client.complete("key", MESSAGES))
+    assert provider.calls == 1
+    assert client.stats()["failures"] == 1
+
+
+def test_concurrency_is_capped():
+    provider = ScriptedProvider(delay=0.02)
+    client = make_client(provider, max_concurrency=2)
+
+    async def burst():
+        return await asyncio.gather(*[client.complete("key", MESSAGES) for _ in range(6)])
+
+    assert asyncio.run(burst()) == ["Hello world"] * 6
+    assert provider.peak == 2
+    assert client.stats()["in_flight"] == 0
+
+
+def test_stream_passes_chunks_and_retries_before_the_first():
+    deltas = []
+    client = make_client(ScriptedProvider(errors=[asyncio.TimeoutError()]))
+    assert asyncio.run(client.stream("key", MESSAGES, deltas.append)) == "Hello world"
+    assert deltas == ["Hello", " world"]
+    assert client.stats()["retries"] == 1
+
+
+def test_stream_failing_midway_is_not_retried():
+    deltas = []
+    provider = ScriptedProvider(fail_after=1)
+    client = make_client(provider)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(client.stream("key", MESSAGES, deltas.append))
+    # Retrying would send "Hello" twice
+    assert deltas == ["Hello"]
+    assert provider.calls == 1
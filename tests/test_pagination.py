@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import decode_cursor, encode_cursor, keyset_filter, paginate
+
+# Several documents share a timestamp, so the id has to break ties
+DOCS = [
+    {"id": f"a{index}", "url": "https://example.com/", "timestamp": datetime(2026, 10, 1 + index // 3)}
+    for index in range(8)
+]
+
+
+def test_cursor_round_trip():
+    moment = datetime(2026, 10, 17, 12, 30, 5, 123000)
+    cursor = encode_cursor(moment, "a1/b+c")
+    # Safe to pass in a query string
+    assert "/" not in cursor and "+" not in cursor
+    assert decode_cursor(cursor) == (moment, "a1/b+c")
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "bm90IGpzb24=", encode_cursor(datetime(2026, 1, 1), "x")[:-4], "WyJub3cuIl0="])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_keyset_filter_matches_strictly_after_the_cursor():
+    moment = datetime(2026, 10, 2)
+    assert keyset_filter("timestamp", "id", moment, "a4") == {"$or": [
+        {"timestamp": {"$lt": moment}},
+        {"timestamp": moment, "id": {"$lt": "a4"}},
+    ]}
+
+
+def test_paginate():
+    docs = sorted(DOCS, key=lambda doc: (doc["timestamp"], doc["id"]), reverse=True)
+    page = paginate(docs[:4], 3, "timestamp", "id")
+    assert [item["id"] for item in page["items"]] == ["a7", "a6", "a5"]
+    assert page["items"][0]["timestamp"] == "2026-10-03T00:00:00"
+    assert decode_cursor(page["next_cursor"]) == (datetime(2026, 10, 2), "a5")
+    # No extra document fetched means this is the last page
+    assert paginate(docs[:3], 3, "timestamp", "id")["next_cursor"] is None
+
+
+def test_pages_cover_every_document_once(mongo):
+    asyncio.run(mongo.analyses.insert_many([dict(doc) for doc in DOCS]))
+
+    async def walk():
+        seen, cursor = [], None
+        while True:
+            query = keyset_filter("timestamp", "id", *decode_cursor(cursor)) if cursor else {}
+            docs = await mongo.analyses.find(query, {"_id": 0}).sort([("timestamp", -1), ("id", -1)]).to_list(4)
+            page = paginate(docs, 3, "timestamp", "id")
+            seen.extend(item["id"] for item in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen
+
+    assert asyncio.run(walk()) == ["a7", "a6", "a5", "a4", "a3", "a2", "a1", "a0"]
+
+
+def test_history_pages(mongo):
+    asyncio.run(mongo.analyses.insert_many([dict(doc) for doc in DOCS]))
+    first = asyncio.run(server.get_history(url="https://example.com/", limit=5, cursor=None, changed_only=False))
+    rest = asyncio.run(server.get_history(
+        url="https://example.com/", limit=5, cursor=first["next_cursor"], changed_only=False
+    ))
+    assert [item["id"] for item in first["items"] + rest["items"]] == [f"a{index}" for index in range(7, -1, -1)]
+    assert rest["next_cursor"] is None
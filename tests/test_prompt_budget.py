@@ -0,0 +1,84 @@
+from llm import ANALYSIS_PROMPT_TEMPLATE, PromptBudgeter
+
+URL = "https://shop.test/"
+BROWSER_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept": "*/*", "sec-ch-ua": '"Chromium"', "Referer": URL}
+
+
+def budgeter(token_budget=6000):
+    return PromptBudgeter(token_budget, api_share=0.4, console_share=0.2, header_value_chars=20)
+
+
+def net(path, resource_type="image", status=200, method="GET", headers=None):
+    return {"url": f"https://shop.test{path}", "method": method, "resource_type": resource_type, "status": status,
+            "headers": headers or dict(BROWSER_HEADERS), "response_type": "image/png", "timing": {"responseEnd": 35}}
+
+
+def big_capture(images=400, logs=200):
+    requests = [net(f"/static/img/{name}.png") for name in ("hero", "logo", "banner", "footer")]
+    requests += [net(f"/assets/{index}/thumb-{index}.png") for index in range(images)]
+    requests += [
+        net("/api/orders/1", "fetch", headers={**BROWSER_HEADERS, "Authorization": "Bearer abc.def.ghi"}),
+        net("/api/orders/2", "fetch"),
+        net("/api/cart", "fetch", status=500, method="POST"),
+    ]
+    return {
+        "network_requests": requests,
+        "console_logs": [{"type": "log", "text": f"render {index}"} for index in range(logs)]
+                        + [{"type": "error", "text": "TypeError: x is undefined"}] * 3,
+        "api_map": [{"endpoint": f"GET shop.test/api/items/{index}", "count": index + 1, "example": "x" * 500}
+                    for index in range(100)],
+        "tech_stack": ["React", "Stripe"],
+        "security_observations": ["Missing CSP"],
+        "page_info": {"title": "Shop", "fingerprints": [{"name": "React"}] * 50},
+    }
+
+
+def test_prompt_fits_the_budget():
+    prompt, stats = budgeter(2000).build(big_capture(), URL)
+    assert 1500 < stats["prompt_tokens"] <= 2000
+    assert stats["full_prompt_tokens"] > 10 * stats["prompt_tokens"]
+    assert stats["request_groups_kept"] < stats["request_groups"]
+    assert stats["api_endpoints_kept"] < stats["api_endpoints"] == 100
+    assert "lower-ranked request groups omitted" in prompt
+    assert "fingerprints" not in prompt
+
+
+def test_everything_fits_a_generous_budget():
+    prompt, stats = budgeter(50_000).build(big_capture(images=3, logs=2), URL)
+    assert stats["request_groups_kept"] == stats["request_groups"]
+    assert stats["console_groups_kept"] == stats["console_groups"] == 3
+    assert "omitted" not in prompt
+
+
+def test_the_most_informative_requests_survive_truncation():
+    prompt, stats = budgeter(PromptBudgeter.estimate_tokens(ANALYSIS_PROMPT_TEMPLATE) + 150).build(big_capture(), URL)
+    assert 0 < stats["request_groups_kept"] < 5
+    # The failing API write outranks the order lookups, which outrank any image
+    assert "POST shop.test/api/cart" in prompt
+    assert "thumb" not in prompt
+
+
+def test_requests_are_grouped_by_path_template():
+    groups = budgeter().group_requests(big_capture(images=0)["network_requests"])
+    endpoints = [group["endpoint"] for group in groups]
+    assert endpoints[:2] == ["POST shop.test/api/cart", "GET shop.test/api/orders/:id"]
+    orders = groups[1]
+    assert orders["count"] == 2 and orders["status"] == {200: 2}
+
+
+def test_boilerplate_headers_are_dropped_and_secrets_redacted():
+    compact = budgeter().compact_headers({
+        **BROWSER_HEADERS, "Authorization": "Bearer abc.def.ghi", "Cookie": "session=1",
+        "X-Shop-Tenant": "tenant-" + "9" * 40,
+    })
+    assert compact == {
+        "authorization": "Bearer <redacted>",
+        "cookie": "<redacted>",
+        "x-shop-tenant": "tenant-9999999999999",
+    }
+
+
+def test_console_messages_are_deduplicated_errors_first():
+    logs = budgeter().group_console_logs(big_capture(logs=2)["console_logs"] + ["plain string"])
+    assert logs[0] == {"type": "error", "text": "TypeError: x is undefined", "count": 3}
+    assert [log["text"] for log in logs[1:]] == ["render 0", "render 1", "plain string"]
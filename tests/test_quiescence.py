@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from capture import QuiescenceDetector
+
+
+class CountingEvent(asyncio.Event):
+    def __init__(self):
+        super().__init__()
+        self.waits = 0
+
+    async def wait(self):
+        self.waits += 1
+        return await super().wait()
+
+
+def test_settles_once_idle():
+    detector = QuiescenceDetector(50, 1000)
+    result = asyncio.run(detector.wait(1000))
+    assert result["settled"] is True
+    assert 40 <= result["settle_ms"] < 500
+
+
+def test_blocking_request_holds_the_page_open_until_the_deadline():
+    detector = QuiescenceDetector(20, 10_000)
+    detector.handle_request_started("xhr")
+    result = asyncio.run(detector.wait(100))
+    assert result["settled"] is False
+    assert result["settle_ms"] >= 100
+
+
+def test_long_request_stops_blocking_without_busy_waiting():
+    detector = QuiescenceDetector(200, 50)
+    detector._changed = CountingEvent()
+    detector.handle_request_started("long-poll")
+    # Started long before the cutoff, so only the idle window is left to wait for
+    detector._in_flight["long-poll"] = time.monotonic() - 10
+    result = asyncio.run(detector.wait(2000))
+    assert result["settled"] is True
+    assert detector._changed.waits <= 3
+
+
+def test_request_done_is_activity():
+    async def scenario():
+        detector = QuiescenceDetector(100, 10_000)
+        detector.handle_request_started("fetch")
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, detector.handle_request_done, "fetch")
+        return await detector.wait(2000)
+
+    result = asyncio.run(scenario())
+    assert result["settled"] is True
+    assert result["settle_ms"] >= 140
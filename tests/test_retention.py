@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import config
+import diffing
+import retention
+import server
+
+NOW = datetime(2026, 10, 17, 12)
+URL = "https://example.com/"
+
+
+class RecordingCaptureStore:
+    def __init__(self):
+        self.deleted = []
+
+    async def delete(self, reference):
+        self.deleted.append(reference["path"])
+
+
+def analysis(index, timestamp, version):
+    return {
+        "id": f"a{index}",
+        "url": URL,
+        "timestamp": timestamp,
+        "tech_stack": [f"React {version}"],
+        "api_map": [],
+        "ai_analysis": "report",
+        "page_info": {
+            "title": "Example",
+            "status": 200,
+            "fingerprints": [{"name": "React", "version": version}],
+            "security_findings": [],
+            "response_headers": {"content-type": "text/html"}
+        },
+        "capture": {"storage": "local", "path": f"a{index}.har.gz"}
+    }
+
+
+async def insert_chain(db, versions):
+    """Analyses two per day, oldest first, each diffed against the one before it"""
+    previous = None
+    docs = []
+    for index, version in enumerate(versions):
+        day, slot = divmod(len(versions) - 1 - index, 2)
+        doc = analysis(index, NOW - timedelta(days=40 + day, hours=2 + 6 * slot), version)
+        if previous:
+            doc["diff"] = diffing.diff_analyses(previous, doc)
+            doc["incremental"] = {"base_id": previous["id"], "llm": "changes"}
+        await db.analyses.insert_one(dict(doc))
+        docs.append(doc)
+        previous = doc
+    return docs
+
+
+def run_downsample(monkeypatch):
+    monkeypatch.setattr(retention, "capture_store", RecordingCaptureStore())
+    policy = retention.AnalysisRetention(
+        compact_after_days=0, downsample_after_days=30, retention_days=0, interval=3600, batch_size=2
+    )
+    return asyncio.run(policy.run_once(NOW))
+
+
+def test_retention_is_disabled_by_default():
+    assert config.ANALYSIS_COMPACT_AFTER_DAYS == 0
+    assert config.ANALYSIS_DOWNSAMPLE_AFTER_DAYS == 0
+    assert config.ANALYSIS_RETENTION_DAYS == 0
+
+
+def test_disabled_retention_touches_nothing(mongo, monkeypatch):
+    docs = asyncio.run(insert_chain(mongo, ["18.0.0", "18.0.0", "18.0.0"]))
+    policy = retention.AnalysisRetention(0, 0, -5, interval=3600, batch_size=10)
+    assert asyncio.run(policy.run_once(NOW)) == {"compacted": 0, "downsampled": 0, "expired": 0}
+    assert asyncio.run(mongo.analyses.count_documents({})) == len(docs)
+
+
+def test_downsampling_keeps_history_chain_intact(mongo, monkeypatch):
+    # Three days of two analyses each; the stack changes once, on the newest day's first run
+    asyncio.run(insert_chain(mongo, ["18.0.0", "18.0.0", "18.0.0", "18.0.0", "18.1.0", "18.1.0"]))
+    counts = run_downsample(monkeypatch)
+    assert counts["downsampled"] == 2
+
+    page = asyncio.run(server.get_history(url=URL, limit=20, cursor=None, changed_only=False))
+    items = page["items"]
+    ids = [item["id"] for item in items]
+    assert ids == ["a5", "a4", "a3", "a1"]
+
+    # Every diff points at the next older analysis still stored, and the oldest has none
+    for newer, older in zip(items, items[1:]):
+        assert newer["diff"]["base_id"] == older["id"]
+        assert newer["incremental"].get("base_id") in (None, *ids)
+    assert "diff" not in items[-1]
+    # a3's report was built on a2, which is gone
+    assert "base_id" not in items[2]["incremental"]
+
+    # The version change survives, whichever analysis it is now attributed to
+    changed = [item for item in items if item.get("diff", {}).get("changed")]
+    assert [item["id"] for item in changed] == ["a4"]
+    assert changed[0]["diff"]["tech_stack"]["changed"] == [{"name": "React", "from": "18.0.0", "to": "18.1.0"}]
+
+
+def test_expiry_drops_diffs_based_on_expired_analyses(mongo, monkeypatch):
+    asyncio.run(insert_chain(mongo, ["1.0.0", "1.0.0", "1.0.0", "1.0.0"]))
+    monkeypatch.setattr(retention, "capture_store", RecordingCaptureStore())
+    # Cutoffs fall on midnight, so this expires the day of a0 and a1 but not of a2 and a3
+    policy = retention.AnalysisRetention(0, 0, retention_days=40, interval=3600, batch_size=10)
+    assert asyncio.run(policy.run_once(NOW))["expired"] == 2
+
+    remaining = asyncio.run(mongo.analyses.find({}, {"_id": 0}).sort("timestamp", 1).to_list(None))
+    assert [doc["id"] for doc in remaining] == ["a2", "a3"]
+    assert "diff" not in remaining[0]
+    assert remaining[1]["diff"]["base_id"] == "a2"
+    assert retention.capture_store.deleted == ["a0.har.gz", "a1.har.gz"]
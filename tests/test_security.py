@@ -0,0 +1,192 @@
+import time
+
+import pytest
+
+from security import SECURITY_HEADER_RULES, SecurityReport, analyze_security, parse_csp, security_observation
+
+PAGE = "https://example.com/"
+
+SAFE_HEADERS = {
+    "strict-transport-security": "max-age=31536000; includeSubDomains",
+    "content-security-policy": "default-src 'self'; frame-ancestors 'none'",
+    "x-frame-options": "DENY",
+    "x-content-type-options": "nosniff",
+}
+
+
+def request(url=PAGE, headers=None, resource_type="document", status=200):
+    headers = {"content-type": "text/html"} if headers is None else headers
+    return {"url": url, "resource_type": resource_type, "status": status, "response_headers": headers}
+
+
+def rules(findings):
+    return sorted((finding["rule"], finding["severity"]) for finding in findings)
+
+
+def messages(findings):
+    return [finding["message"] for finding in findings]
+
+
+def run_header(header, value, url=PAGE, **extra):
+    report = SecurityReport()
+    record = request(url, {header: value, **extra})
+    for rule in SECURITY_HEADER_RULES[header]:
+        rule(report, value, record)
+    return report.findings()
+
+
+def test_well_configured_page_has_no_findings():
+    assert analyze_security(PAGE, [request(headers=SAFE_HEADERS)], {}) == []
+
+
+def test_missing_document_headers():
+    findings = analyze_security(PAGE, [request()], {})
+    assert rules(findings) == [
+        ("clickjacking", "medium"), ("csp", "medium"), ("hsts", "medium"), ("x-content-type-options", "low")
+    ]
+
+
+def test_documents_without_captured_headers_are_skipped():
+    assert analyze_security(PAGE, [request(headers={})], {}) == []
+
+
+def test_plain_http_page():
+    findings = analyze_security("http://example.com/", [request("http://example.com/", SAFE_HEADERS)], {})
+    # HSTS is meaningless over HTTP, so only the HTTPS finding shows up
+    assert rules(findings) == [("https", "high")]
+
+
+def test_only_first_party_documents_need_headers():
+    records = [
+        request(headers=SAFE_HEADERS),
+        request("https://ads.tracker.net/frame", resource_type="document"),
+        request("https://cdn.example.com/app.js", resource_type="script"),
+        request("https://example.com/missing", status=404),
+    ]
+    assert analyze_security(PAGE, records, {}) == []
+    # Subdomains of the page's site count as first party
+    assert analyze_security(PAGE, [request(headers=SAFE_HEADERS), request("https://www.example.com/")], {})
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("max-age=31536000", []),
+    ("max-age=\"15552000\"; preload", []),
+    ("max-age=3600", [("hsts", "low")]),
+    ("includeSubDomains", [("hsts", "medium")]),
+])
+def test_hsts(value, expected):
+    assert rules(run_header("strict-transport-security", value)) == expected
+    # Ignored when sent over plain HTTP
+    assert run_header("strict-transport-security", value, url="http://example.com/") == []
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("default-src 'self'", []),
+    ("script-src 'self' 'nonce-abc' 'unsafe-inline'", []),
+    ("script-src 'self' 'unsafe-inline'", ["Content-Security-Policy allows inline scripts ('unsafe-inline')"]),
+    ("default-src 'self' 'unsafe-eval'", ["Content-Security-Policy allows eval ('unsafe-eval')"]),
+    ("script-src https:", ["Content-Security-Policy allows scripts from any origin"]),
+    ("img-src *", ["Content-Security-Policy does not restrict scripts"]),
+    # script-src takes precedence over default-src
+    ("default-src *; script-src 'self'", []),
+])
+def test_csp(value, expected):
+    assert messages(run_header("content-security-policy", value)) == expected
+
+
+def test_parse_csp_keeps_the_first_directive():
+    assert parse_csp("Script-Src 'self'; script-src *;; img-src data:") == {"script-src": ["'self'"], "img-src": ["data:"]}
+
+
+def test_report_only_csp():
+    assert rules(run_header("content-security-policy-report-only", "default-src 'self'")) == [("csp", "low")]
+    enforced = run_header("content-security-policy-report-only", "default-src 'self'",
+                          **{"content-security-policy": "default-src 'self'"})
+    assert enforced == []
+
+
+@pytest.mark.parametrize("header, value, expected", [
+    ("x-frame-options", "sameorigin", []),
+    ("x-frame-options", "ALLOW-FROM https://a.test", [("x-frame-options", "low")]),
+    ("x-content-type-options", "nosniff", []),
+    ("x-content-type-options", "sniff", [("x-content-type-options", "low")]),
+    ("referrer-policy", "strict-origin-when-cross-origin", []),
+    ("referrer-policy", "unsafe-url", [("referrer-policy", "low")]),
+    ("server", "nginx", []),
+    ("server", "nginx/1.25.3", [("version-disclosure", "low")]),
+    ("x-powered-by", "PHP/8.2.1", [("version-disclosure", "low")]),
+])
+def test_single_value_headers(header, value, expected):
+    assert rules(run_header(header, value)) == expected
+
+
+def test_set_cookie():
+    value = "\n".join([
+        "session=abc; Path=/; Secure; HttpOnly; SameSite=Lax",
+        "theme=dark; Path=/",
+        "tracking=1; SameSite=None; HttpOnly",
+    ])
+    assert messages(run_header("set-cookie", value)) == [
+        "Cookie 'tracking' is SameSite=None without Secure",
+        "Cookie 'theme' is set without the Secure flag",
+        "Cookie 'tracking' is set without the Secure flag",
+        "Cookie 'theme' is readable by scripts (no HttpOnly)",
+    ]
+    # Secure can't be set over plain HTTP, so it isn't asked for
+    assert rules(run_header("set-cookie", "theme=dark; HttpOnly", url="http://example.com/")) == []
+
+
+@pytest.mark.parametrize("origin, credentials, expected", [
+    ("https://app.example.com", "true", []),
+    ("*", "true", [("cors", "high")]),
+    ("*", None, [("cors", "info")]),
+    ("null", None, [("cors", "medium")]),
+])
+def test_cors(origin, credentials, expected):
+    extra = {"access-control-allow-credentials": credentials} if credentials else {}
+    assert rules(run_header("access-control-allow-origin", origin, **extra)) == expected
+
+
+def test_mixed_content():
+    records = [
+        request(headers=SAFE_HEADERS),
+        request("http://cdn.example.com/app.js", resource_type="script"),
+        request("http://cdn.example.com/logo.png", resource_type="image"),
+        request("http://cdn.example.com/photo.png", resource_type="image"),
+    ]
+    findings = analyze_security(PAGE, records, {})
+    assert rules(findings) == [("mixed-content", "high"), ("mixed-content", "low")]
+    media = next(finding for finding in findings if finding["severity"] == "low")
+    assert media["count"] == 2
+    assert media["example"] == "http://cdn.example.com/logo.png"
+
+
+def test_tls():
+    now = time.time()
+    tls = {
+        "https://old.example.com": {"protocol": "TLS 1.0", "validTo": now + 365 * 86400},
+        "https://expiring.example.com": {"protocol": "TLS 1.3", "validTo": now + 5 * 86400 + 60},
+        "https://expired.example.com": {"protocol": "TLS 1.3", "validTo": now - 86400},
+        "https://fine.example.com": {"protocol": "TLS 1.3", "validTo": now + 365 * 86400},
+        "https://unknown.example.com": None,
+    }
+    findings = analyze_security(PAGE, [request(headers=SAFE_HEADERS)], tls)
+    assert messages(findings) == [
+        "TLS certificate for https://expired.example.com has expired",
+        "https://old.example.com negotiates an outdated protocol (TLS 1.0)",
+        "TLS certificate for https://expiring.example.com expires in 5 days",
+    ]
+
+
+def test_report_aggregates_and_orders_findings():
+    report = SecurityReport()
+    report.add("cors", "info", "CORS allows any origin", "https://a.test/1")
+    report.add("csp", "medium", "Missing CSP", "https://a.test/1")
+    report.add("cors", "info", "CORS allows any origin", "https://a.test/2")
+    report.merge([{"rule": "tls", "severity": "high", "message": "Expired", "count": 2, "example": "https://a.test"},
+                  {"rule": "csp", "severity": "medium", "message": "Missing CSP", "count": 3, "example": "https://b.test"}])
+    findings = report.findings()
+    assert [(finding["rule"], finding["count"]) for finding in findings] == [("tls", 2), ("csp", 4), ("cors", 2)]
+    assert findings[2]["example"] == "https://a.test/1"
+    assert security_observation(findings[1]) == "[medium] Missing CSP (seen 4 times)"
+    assert security_observation({**findings[0], "count": 1}) == "[high] Expired"